@@ -0,0 +1,109 @@
+from fastapi import APIRouter, HTTPException, Query, WebSocket
+from typing import Any, Awaitable, Dict, List, Optional
+import asyncio
+
+from backend.app.services.alerts import alert_index
+from backend.app.services.realtime import is_valid_symbol
+
+router = APIRouter(prefix="/api/alerts", tags=["alerts"])
+
+# Triggered alert batches buffered per stream client before the oldest are dropped
+_CLIENT_QUEUE_SIZE = 256
+
+async def _execute(command: Awaitable[Any]) -> Any:
+    """Await an alert change, which a follower worker runs on the ingest owner"""
+    try:
+        return await command
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+def _check_symbol(symbol: str) -> None:
+    if not is_valid_symbol(symbol):
+        raise HTTPException(status_code=400, detail=f"Invalid symbol: {symbol!r}")
+
+@router.get("")
+async def list_alerts(
+    symbol: Optional[str] = Query(None, description="Only alerts for this symbol")
+) -> Dict[str, Any]:
+    """List active alerts"""
+    
+    alerts = alert_index.active(symbol)
+    return {"alerts": alerts, "count": len(alerts)}
+
+@router.post("")
+async def create_alert(
+    symbol: str = Query(..., description="Symbol to watch"),
+    price: float = Query(..., description="Alert price level")
+) -> Dict[str, Any]:
+    """Register an alert at a price level"""
+    
+    _check_symbol(symbol)
+    return await _execute(alert_index.create(symbol, price))
+
+@router.post("/measured-move")
+async def create_measured_move_alerts(
+    symbol: str = Query(..., description="Symbol to watch"),
+    stop: float = Query(..., description="Stop price (point 0)"),
+    entry: float = Query(..., description="Entry price (point 1)")
+) -> Dict[str, Any]:
+    """Register the stop and the 1x and 2x risk targets of a Measured Move as alerts"""
+    
+    _check_symbol(symbol)
+    if stop == entry:
+        raise HTTPException(status_code=400, detail="Stop and entry must differ")
+    
+    return await _execute(alert_index.create_measured_move(symbol, stop, entry))
+
+@router.delete("/measured-move/{measurement_id}")
+async def delete_measured_move_alerts(measurement_id: int) -> Dict[str, Any]:
+    """Remove all alerts of a Measured Move"""
+    
+    removed = await _execute(alert_index.delete_measurement(measurement_id))
+    if not removed:
+        raise HTTPException(status_code=404, detail=f"No active alerts for measurement {measurement_id}")
+    return {"removed": removed, "count": len(removed)}
+
+@router.delete("/{alert_id}")
+async def delete_alert(alert_id: int) -> Dict[str, Any]:
+    """Remove an alert"""
+    
+    alert = await _execute(alert_index.delete(alert_id))
+    if alert is None:
+        raise HTTPException(status_code=404, detail=f"Alert {alert_id} not found")
+    return alert
+
+@router.websocket("/stream")
+async def alert_stream(websocket: WebSocket, symbol: Optional[str] = None):
+    """Push triggered alerts, optionally for one symbol, as they happen
+    
+    Each client has a bounded queue; a client that falls behind loses its
+    oldest undelivered batches instead of slowing down tick processing.
+    """
+    
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_CLIENT_QUEUE_SIZE)
+    
+    async def deliver(events: List[Dict[str, Any]]) -> None:
+        selected = [event for event in events if symbol is None or event["symbol"] == symbol]
+        if not selected:
+            return
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(selected)
+    
+    async def send() -> None:
+        while True:
+            events = await queue.get()
+            await websocket.send_json({"type": "alerts", "alerts": events})
+    
+    alert_index.add_listener(deliver)
+    sender = None
+    try:
+        await websocket.accept()
+        sender = asyncio.create_task(send())
+        # Sending happens in the background; this loop only notices the client leaving
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        alert_index.remove_listener(deliver)
+        if sender is not None:
+            sender.cancel()
@@ -1,36 +1,127 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, WebSocket
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional
 from datetime import datetime
+from itertools import islice
 import asyncio
+import logging
 
-from backend.app.database import get_db, create_tables
+from backend.app.api.responses import (
+    CACHE_CONTROL_IMMUTABLE,
+    CACHE_CONTROL_REVALIDATE,
+    FastJSONResponse,
+    cache_headers,
+    etag_matches,
+    make_etag,
+    not_modified,
+)
+from backend.app.api.streaming import STREAM_MEDIA_TYPES, stream_chunks
+from backend.app.config import TICK_STREAM_MAX_SYMBOLS
+from backend.app.database import get_db
+from backend.app.models.bar_batch import BarBatch
 from backend.app.services.data_cache import data_cache_service
-from backend.app.services.market_data import market_data_provider
+from backend.app.services.health import health_monitor
+from backend.app.services.market_data import market_data_provider, TIMEFRAME_DURATIONS
+from backend.app.services.realtime import is_valid_symbol, realtime_hub
+from backend.app.services.resilience import UpstreamError
+from backend.app.services.trading_calendar import calendar_for
 
-router = APIRouter(prefix="/api/market-data", tags=["market-data"])
+logger = logging.getLogger(__name__)
 
-# Initialize database tables
-create_tables()
+router = APIRouter(prefix="/api/market-data", tags=["market-data"])
 
 # Startup and shutdown events are handled in main.py via lifespan context
 
+def _kline_etag(
+    symbol: str,
+    timeframe: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    layout: str
+) -> str:
+    """ETag for a K-line range in a response layout, derived from the series' cache version"""
+    version = data_cache_service.get_cache_version(symbol, timeframe)
+    return make_etag("kline", symbol, timeframe, start_time, end_time, layout, version)
+
+def _kline_cache_control(
+    symbol: str,
+    timeframe: str,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    bar_count: int
+) -> str:
+    """Closed ranges holding every bar the trading calendar allows never change; others must revalidate
+    
+    A partial range stays revalidating, so a later backfill, eviction or
+    cache clear reaches clients holding a copy of it.
+    """
+    bar_duration = TIMEFRAME_DURATIONS.get(timeframe)
+    if start_time is None or end_time is None or bar_duration is None or end_time + bar_duration > datetime.now():
+        return CACHE_CONTROL_REVALIDATE
+    expected = islice(calendar_for(symbol).bars(start_time, end_time, timeframe), bar_count + 1)
+    if sum(1 for _ in expected) == bar_count:
+        return CACHE_CONTROL_IMMUTABLE
+    return CACHE_CONTROL_REVALIDATE
+
 @router.get("/kline/{symbol}")
 async def get_kline_data(
     symbol: str,
+    request: Request,
     timeframe: str = Query("1m", description="Timeframe (1m, 5m, 15m, 1h, 1d)"),
     start_time: Optional[str] = Query(None, description="Start time (ISO format)"),
     end_time: Optional[str] = Query(None, description="End time (ISO format)"),
     use_cache: bool = Query(True, description="Use cached data if available"),
+    since: Optional[str] = Query(None, description="Only bars changed since a cache version or ISO timestamp"),
+    stream: Optional[str] = Query(None, description="Stream stored bars as 'ndjson' or 'binary' frames"),
+    layout: Literal["rows", "columns"] = Query("rows", description="Bars as 'rows' of objects or 'columns' of arrays"),
     db: Session = Depends(get_db)
-) -> Dict[str, Any]:
-    """Get K-line (candlestick) data for a symbol"""
+) -> Response:
+    """Get K-line (candlestick) data for a symbol
+    
+    Responses carry an ETag derived from the series' cache version;
+    requests with a matching If-None-Match get an empty 304. The version is
+    also returned in the X-Cache-Version header for use with `since`.
+    
+    With `stream`, the range is read from the local store in chunks and
+    written as it is read, so very large ranges use constant memory and the
+    first bars arrive before the whole range is read. Streams do not fetch
+    missing bars from the provider; load deep history with a backfill first.
+    
+    With layout=columns, data is an object of time, open, high, low, close
+    and volume arrays serialized straight from the bar columns.
+    """
     
     try:
         # Parse datetime strings if provided
         start_dt = datetime.fromisoformat(start_time) if start_time else None
         end_dt = datetime.fromisoformat(end_time) if end_time else None
         
+        if since is not None:
+            if since.isdigit():
+                return await _get_kline_changes(symbol, timeframe, int(since), start_dt, end_dt)
+            # A timestamp selects the bars at or after it: the forming bar and newer ones
+            since_dt = datetime.fromisoformat(since)
+            start_dt = max(start_dt, since_dt) if start_dt else since_dt
+        
+        if stream is not None:
+            if stream not in STREAM_MEDIA_TYPES:
+                raise HTTPException(status_code=400, detail=f"Unknown stream format: {stream}")
+            return StreamingResponse(
+                stream_chunks(data_cache_service.iter_kline_chunks(symbol, timeframe, start_dt, end_dt), stream),
+                media_type=STREAM_MEDIA_TYPES[stream],
+                headers={
+                    "X-Cache-Version": str(data_cache_service.get_cache_version(symbol, timeframe)),
+                    "Cache-Control": CACHE_CONTROL_REVALIDATE
+                }
+            )
+        
+        # Answer revalidations of a fresh series without querying the cache
+        if use_cache and data_cache_service.is_cache_fresh(symbol, timeframe):
+            etag = _kline_etag(symbol, timeframe, start_dt, end_dt, layout)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+        
         # Get data from cache service
         data = await data_cache_service.get_kline_data(
             symbol=symbol,
@@ -40,24 +131,216 @@ async def get_kline_data(
             use_cache=use_cache
         )
         
-        return {
+        # The version may have moved if the cache was refreshed above
+        etag = _kline_etag(symbol, timeframe, start_dt, end_dt, layout)
+        cache_control = _kline_cache_control(symbol, timeframe, start_dt, end_dt, len(data))
+        if etag_matches(request, etag):
+            return not_modified(etag, cache_control)
+        
+        headers = cache_headers(etag, cache_control)
+        headers["X-Cache-Version"] = str(data_cache_service.get_cache_version(symbol, timeframe))
+        
+        return FastJSONResponse({
             "symbol": symbol,
             "timeframe": timeframe,
-            "data": data,
+            "data": BarBatch.of(data).to_columns() if layout == "columns" else data,
             "count": len(data)
-        }
+        }, headers=headers)
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid datetime format: {e}")
+    except UpstreamError as e:
+        # Overloaded or failing upstream: ask the client to retry later
+        raise HTTPException(status_code=503, detail=f"Market data provider unavailable: {e}", headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get market data: {e}")
 
-@router.get("/latest-price/{symbol}")
-async def get_latest_price(
+async def _get_kline_changes(
     symbol: str,
-    db: Session = Depends(get_db)
-) -> Dict[str, Any]:
-    """Get the latest price for a symbol"""
+    timeframe: str,
+    since_version: int,
+    start_time: Optional[datetime],
+    end_time: Optional[datetime]
+) -> Response:
+    """Delta response with the bars changed after a cache version
+    
+    Falls back to the full range, flagged with "full": true, when the version
+    is too old for the change index to answer. A stale series is refreshed
+    first, as a full read would, so polling clients see new bars.
+    """
+    
+    await data_cache_service.refresh_if_stale(symbol, timeframe, start_time, end_time)
+    version = data_cache_service.get_cache_version(symbol, timeframe)
+    data = data_cache_service.get_kline_changes(symbol, timeframe, since_version, start_time, end_time)
+    full = data is None
+    if full:
+        data = await data_cache_service.get_kline_data(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_time=start_time,
+            end_time=end_time
+        )
+        version = data_cache_service.get_cache_version(symbol, timeframe)
+    
+    return FastJSONResponse({
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "since": since_version,
+        "version": version,
+        "full": full,
+        "data": data,
+        "count": len(data)
+    }, headers={"X-Cache-Version": str(version), "Cache-Control": CACHE_CONTROL_REVALIDATE})
+
+@router.get("/indicators/{symbol}")
+async def get_indicators(
+    symbol: str,
+    timeframe: str = Query("1m", description="Timeframe (1m, 5m, 15m, 1h, 1d)"),
+    start_time: Optional[str] = Query(None, description="Start time (ISO format)"),
+    end_time: Optional[str] = Query(None, description="End time (ISO format)")
+) -> Response:
+    """EMA20 and MA16 of closing prices, computed in the analytics process pool"""
+    
+    from backend.app.services.analytics import AnalyticsBusyError, AnalyticsTimeoutError, analytics_pool
+    
+    try:
+        start_dt = datetime.fromisoformat(start_time) if start_time else None
+        end_dt = datetime.fromisoformat(end_time) if end_time else None
+        
+        data = await data_cache_service.get_kline_data(
+            symbol=symbol,
+            timeframe=timeframe,
+            start_time=start_dt,
+            end_time=end_dt
+        )
+        bars = BarBatch.of(data)
+        values = await analytics_pool.indicators(bars.closes)
+        
+        return FastJSONResponse({
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "data": [
+                {"time": time, "ema20": ema20, "ma16": ma16}
+                for time, ema20, ma16 in zip(bars.iso_times(), values["ema20"], values["ma16"])
+            ],
+            "count": len(data)
+        }, headers={"Cache-Control": CACHE_CONTROL_REVALIDATE})
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime format: {e}")
+    except AnalyticsBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except AnalyticsTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute indicators: {e}")
+
+@router.get("/resample/{symbol}")
+async def get_resampled_kline_data(
+    symbol: str,
+    timeframe: str = Query(..., description="Target timeframe (5m, 15m, 1h, 1d)"),
+    source_timeframe: str = Query("1m", description="Cached timeframe the bars are built from"),
+    start_time: Optional[str] = Query(None, description="Start time (ISO format)"),
+    end_time: Optional[str] = Query(None, description="End time (ISO format)")
+) -> Response:
+    """K-line data for a timeframe built from shorter cached bars in the analytics process pool"""
+    
+    from backend.app.services.analytics import AnalyticsBusyError, AnalyticsTimeoutError, analytics_pool
+    
+    source_duration = TIMEFRAME_DURATIONS.get(source_timeframe)
+    target_duration = TIMEFRAME_DURATIONS.get(timeframe)
+    if source_duration is None or target_duration is None or target_duration % source_duration or target_duration <= source_duration:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot resample {source_timeframe} bars into {timeframe} bars"
+        )
+    
+    try:
+        start_dt = datetime.fromisoformat(start_time) if start_time else None
+        end_dt = datetime.fromisoformat(end_time) if end_time else None
+        
+        data = await data_cache_service.get_kline_data(
+            symbol=symbol,
+            timeframe=source_timeframe,
+            start_time=start_dt,
+            end_time=end_dt
+        )
+        bars = await analytics_pool.resample(data, target_duration)
+        
+        return FastJSONResponse({
+            "symbol": symbol,
+            "timeframe": timeframe,
+            "source_timeframe": source_timeframe,
+            "data": bars,
+            "count": len(bars)
+        }, headers={"Cache-Control": CACHE_CONTROL_REVALIDATE})
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime format: {e}")
+    except AnalyticsBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except AnalyticsTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to resample market data: {e}")
+
+@router.get("/scan/resample")
+async def scan_resampled_kline_data(
+    symbols: str = Query(..., description="Comma-separated symbols"),
+    timeframe: str = Query(..., description="Target timeframe (5m, 15m, 1h, 1d)"),
+    source_timeframe: str = Query("1m", description="Cached timeframe the bars are built from"),
+    start_time: Optional[str] = Query(None, description="Start time (ISO format)"),
+    end_time: Optional[str] = Query(None, description="End time (ISO format)")
+) -> Response:
+    """Cached bars of many symbols resampled to a longer timeframe, for backtests and screens
+    
+    Only cached bars are read; missing ranges are not fetched from the
+    provider. Large scans run on the DuckDB engine when it is installed.
+    """
+    
+    symbol_list = [symbol for symbol in symbols.split(",") if symbol]
+    source_duration = TIMEFRAME_DURATIONS.get(source_timeframe)
+    target_duration = TIMEFRAME_DURATIONS.get(timeframe)
+    if source_duration is None or target_duration is None or target_duration % source_duration or target_duration <= source_duration:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot resample {source_timeframe} bars into {timeframe} bars"
+        )
+    try:
+        start_dt = datetime.fromisoformat(start_time) if start_time else None
+        end_dt = datetime.fromisoformat(end_time) if end_time else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime format: {e}")
+    
+    try:
+        # The engine is chosen from the series summaries on the loop; only the scan runs in a thread
+        engine = data_cache_service.choose_scan_engine(symbol_list, source_timeframe, start_dt, end_dt)
+        engine, series = await asyncio.to_thread(
+            data_cache_service.resample_kline_data_with_engine,
+            symbol_list,
+            source_timeframe,
+            target_duration,
+            start_dt,
+            end_dt,
+            engine
+        )
+        
+        return FastJSONResponse({
+            "timeframe": timeframe,
+            "source_timeframe": source_timeframe,
+            "engine": engine.name,
+            "series": {symbol: batch.to_dicts() for symbol, batch in series.items()},
+            "count": sum(len(batch) for batch in series.values())
+        }, headers={"Cache-Control": CACHE_CONTROL_REVALIDATE})
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to scan market data: {e}")
+
+@router.get("/latest-price/{symbol}")
+async def get_latest_price(symbol: str) -> Dict[str, Any]:
+    """Get the latest price for a symbol from the in-memory last-price table"""
     
     try:
         price = data_cache_service.get_latest_price(symbol)
@@ -77,23 +360,53 @@ async def get_latest_price(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get latest price: {e}")
 
+@router.get("/latest-prices")
+async def get_latest_prices(
+    symbols: str = Query(..., description="Comma-separated symbols")
+) -> Dict[str, Any]:
+    """Get the latest prices for many symbols in one call
+    
+    Symbols without any known price are returned with a null price.
+    """
+    
+    symbol_list = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    
+    try:
+        prices = data_cache_service.get_latest_prices(symbol_list)
+        
+        return {
+            "prices": prices,
+            "count": len(prices),
+            "timestamp": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get latest prices: {e}")
+
+# For now, return some common Chinese market symbols
+# This would be populated from the actual market data provider
+SYMBOLS = [
+    {"code": "000001", "name": "平安银行", "market": "SZ"},
+    {"code": "000002", "name": "万科A", "market": "SZ"},
+    {"code": "600000", "name": "浦发银行", "market": "SH"},
+    {"code": "600036", "name": "招商银行", "market": "SH"},
+]
+SYMBOLS_ETAG = make_etag("symbols", SYMBOLS)
+SYMBOLS_CACHE_CONTROL = "public, max-age=3600"
+
 @router.get("/symbols")
-async def get_available_symbols() -> Dict[str, Any]:
+async def get_available_symbols(request: Request) -> Response:
     """Get list of available symbols"""
     
-    # For now, return some common Chinese market symbols
-    # This would be populated from the actual market data provider
-    symbols = [
-        {"code": "000001", "name": "平安银行", "market": "SZ"},
-        {"code": "000002", "name": "万科A", "market": "SZ"},
-        {"code": "600000", "name": "浦发银行", "market": "SH"},
-        {"code": "600036", "name": "招商银行", "market": "SH"},
-    ]
+    if etag_matches(request, SYMBOLS_ETAG):
+        return not_modified(SYMBOLS_ETAG, SYMBOLS_CACHE_CONTROL)
     
-    return {
-        "symbols": symbols,
-        "count": len(symbols)
-    }
+    return FastJSONResponse({
+        "symbols": SYMBOLS,
+        "count": len(SYMBOLS)
+    }, headers=cache_headers(SYMBOLS_ETAG, SYMBOLS_CACHE_CONTROL))
 
 @router.get("/timeframes")
 async def get_available_timeframes() -> Dict[str, Any]:
@@ -112,19 +425,191 @@ async def get_available_timeframes() -> Dict[str, Any]:
         "count": len(timeframes)
     }
 
+@router.websocket("/ticks")
+async def tick_stream(websocket: WebSocket, symbols: str, format: str = "json"):
+    """Push ticks of the given symbols, coalesced into one message per batch window
+    
+    JSON clients get {"type": "ticks", "ticks": [...]} text messages; with
+    format=binary each message is a delta-encoded frame (see tick_stream).
+    A client that falls behind loses its oldest frames instead of slowing
+    down the others. The connection is refused unless it names 1 to
+    TICK_STREAM_MAX_SYMBOLS valid symbols.
+    """
+    
+    from backend.app.services.tick_stream import TickSubscription, tick_batcher
+    
+    subscription = TickSubscription(
+        {symbol.strip() for symbol in symbols.split(",") if symbol.strip()},
+        binary=format == "binary"
+    )
+    if not 0 < len(subscription.symbols) <= TICK_STREAM_MAX_SYMBOLS or not all(map(is_valid_symbol, subscription.symbols)):
+        await websocket.close(code=1008)
+        return
+    
+    async def send() -> None:
+        while True:
+            frame = await subscription.queue.get()
+            if subscription.binary:
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+    
+    tick_batcher.add(subscription)
+    subscribed = []
+    sender = None
+    try:
+        await websocket.accept()
+        for symbol in subscription.symbols:
+            try:
+                await realtime_hub.subscribe(symbol)
+                subscribed.append(symbol)
+            except Exception as e:
+                logger.warning("Could not subscribe to %s for tick stream: %s", symbol, e)
+        sender = asyncio.create_task(send())
+        # Sending happens in the background; this loop only notices the client leaving
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        tick_batcher.remove(subscription)
+        if sender is not None:
+            sender.cancel()
+        for symbol in subscribed:
+            try:
+                await realtime_hub.unsubscribe(symbol)
+            except Exception as e:
+                logger.warning("Could not unsubscribe from %s: %s", symbol, e)
+
+@router.post("/backfill")
+async def start_backfill(
+    symbols: str = Query(..., description="Comma-separated symbols"),
+    timeframe: str = Query("1m", description="Timeframe (1m, 5m, 15m, 1h, 1d)"),
+    start_time: str = Query(..., description="Start time (ISO format)"),
+    end_time: Optional[str] = Query(None, description="End time (ISO format, defaults to now)")
+) -> Dict[str, Any]:
+    """Start backfill jobs loading a historical range for each symbol"""
+    
+    from backend.app.services.backfill import backfill_manager
+    
+    symbol_list = [symbol.strip() for symbol in symbols.split(",") if symbol.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols given")
+    
+    try:
+        start_dt = datetime.fromisoformat(start_time)
+        end_dt = datetime.fromisoformat(end_time) if end_time else datetime.now()
+        jobs = [backfill_manager.create(symbol, timeframe, start_dt, end_dt) for symbol in symbol_list]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {"jobs": jobs, "count": len(jobs)}
+
+@router.get("/backfill")
+async def list_backfills() -> Dict[str, Any]:
+    """Recent backfill jobs with their progress"""
+    
+    from backend.app.services.backfill import backfill_manager
+    
+    jobs = backfill_manager.list()
+    return {"jobs": jobs, "count": len(jobs)}
+
+@router.get("/backfill/{job_id}")
+async def get_backfill(job_id: int) -> Dict[str, Any]:
+    """Progress of a backfill job"""
+    
+    from backend.app.services.backfill import backfill_manager
+    
+    job = backfill_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backfill job {job_id} not found")
+    return job
+
+@router.post("/backfill/{job_id}/resume")
+async def resume_backfill(job_id: int) -> Dict[str, Any]:
+    """Continue a failed or cancelled backfill job from its checkpoint"""
+    
+    from backend.app.services.backfill import backfill_manager
+    
+    job = backfill_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backfill job {job_id} not found")
+    if job["status"] != "completed" and not backfill_manager.start(job_id):
+        raise HTTPException(status_code=409, detail=f"Backfill job {job_id} is running in another worker")
+    return backfill_manager.get(job_id)
+
+@router.delete("/backfill/{job_id}")
+async def cancel_backfill(job_id: int) -> Dict[str, Any]:
+    """Stop a backfill job, keeping its checkpoint"""
+    
+    from backend.app.services.backfill import backfill_manager
+    
+    job = await backfill_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Backfill job {job_id} not found")
+    return job
+
+@router.get("/cache/series")
+async def list_cached_series(
+    symbol: Optional[str] = Query(None, description="Only this symbol's series")
+) -> Dict[str, Any]:
+    """Series cached locally, with their time range, bar count, last close and last write"""
+    
+    try:
+        summaries = data_cache_service.list_series_summaries(symbol)
+        
+        return {
+            "series": [summary.to_dict() for summary in summaries],
+            "count": len(summaries),
+            "total_bars": sum(summary.bar_count for summary in summaries)
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list cached series: {e}")
+
+@router.get("/cache/gaps/{symbol}")
+async def get_cache_gaps(
+    symbol: str,
+    timeframe: str = Query("1m", description="Timeframe (1m, 5m, 15m, 1h, 1d)"),
+    start_time: str = Query(..., description="Start time (ISO format)"),
+    end_time: str = Query(..., description="End time (ISO format)")
+) -> Dict[str, Any]:
+    """Runs of cached bars missing during trading sessions
+    
+    Lunch breaks, nights, weekends and holidays are not reported. Gaps can
+    be filled with a backfill over the same range.
+    """
+    
+    if timeframe not in TIMEFRAME_DURATIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown timeframe: {timeframe}")
+    try:
+        start_dt = datetime.fromisoformat(start_time)
+        end_dt = datetime.fromisoformat(end_time)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid datetime format: {e}")
+    
+    gaps = data_cache_service.find_gaps(symbol, timeframe, start_dt, end_dt)
+    return {
+        "symbol": symbol,
+        "timeframe": timeframe,
+        "calendar": calendar_for(symbol).name,
+        "gaps": [{"start": start.isoformat(), "end": end.isoformat()} for start, end in gaps],
+        "count": len(gaps)
+    }
+
 @router.post("/cache/clear")
 async def clear_cache(
-    symbol: Optional[str] = Query(None, description="Symbol to clear (all if not specified)"),
+    symbol: Optional[str] = Query(None, description="Symbols to clear, comma-separated (all if not specified)"),
+    timeframe: Optional[str] = Query(None, description="Only clear this timeframe's bars"),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """Clear cached data"""
+    """Clear cached data from the database and in-memory cache tiers"""
     
     try:
-        # This would implement cache clearing logic
-        # For now, just return success
+        symbols = [item.strip() for item in symbol.split(",") if item.strip()] if symbol else None
+        deleted = data_cache_service.invalidate(symbols, timeframe)
         
         return {
             "message": f"Cache cleared for {symbol if symbol else 'all symbols'}",
+            "deleted": deleted,
             "timestamp": datetime.now().isoformat()
         }
         
@@ -133,18 +618,16 @@ async def clear_cache(
 
 @router.get("/health")
 async def health_check() -> Dict[str, Any]:
-    """Health check for market data service"""
+    """Health check for market data service
+    
+    Reads the health monitor's background-maintained snapshot; it never
+    calls the provider or writes to the cache.
+    """
     
     try:
-        # Check if market data provider is connected
-        is_connected = market_data_provider.is_connected
-        
-        # Get sample data to test the pipeline
-        if is_connected:
-            sample_data = await data_cache_service.get_kline_data("000001", "1m", use_cache=False)
-            data_available = len(sample_data) > 0
-        else:
-            data_available = False
+        snapshot = health_monitor.snapshot()
+        is_connected = snapshot["provider_connected"]
+        data_available = snapshot["database_ok"]
         
         status = "healthy" if is_connected and data_available else "degraded"
         
@@ -160,4 +643,38 @@ async def health_check() -> Dict[str, Any]:
             "status": "unhealthy",
             "error": str(e),
             "timestamp": datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+
+@router.get("/provider/metrics")
+async def provider_metrics() -> Dict[str, Any]:
+    """Upstream concurrency limit, circuit state, and call latency and error counters"""
+    return market_data_provider.stats()
+
+@router.get("/health/live")
+async def liveness_check() -> Dict[str, Any]:
+    """Liveness probe: constant time, no I/O"""
+    return {"status": "alive"}
+
+@router.get("/health/ready")
+async def readiness_check() -> Response:
+    """Readiness probe from the background-maintained provider, database and queue status"""
+    
+    readiness = health_monitor.readiness()
+    return FastJSONResponse(
+        {"status": "ready" if readiness["ready"] else "not_ready", **readiness},
+        status_code=200 if readiness["ready"] else 503
+    )
+
+@router.get("/health/deep")
+async def deep_health_check() -> Response:
+    """Deep check that fetches sample data from the provider, rate limited
+    
+    The provider is called at most once per configured interval and its data
+    is not written to the cache.
+    """
+    
+    result = await health_monitor.deep_check()
+    return FastJSONResponse(
+        {"status": "healthy" if result["provider_ok"] else "unhealthy", **result},
+        status_code=200 if result["provider_ok"] else 503
+    )
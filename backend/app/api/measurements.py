@@ -0,0 +1,47 @@
+from fastapi import APIRouter
+from pydantic import BaseModel, Field, field_validator
+from typing import Any, Dict, List, Literal, Optional
+from datetime import datetime
+
+from backend.app.services.measurements import measurement_service
+
+router = APIRouter(prefix="/api/measurements", tags=["measurements"])
+
+class Measurement(BaseModel):
+    """A Measure (two prices or two bar times) or a Measured Move (stop and entry)"""
+    
+    id: Optional[str] = None
+    type: Literal["measure", "measured_move"]
+    symbol: str
+    timeframe: str = "1m"
+    stop: Optional[float] = None
+    entry: Optional[float] = None
+    start_price: Optional[float] = None
+    end_price: Optional[float] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    
+    @field_validator("start_time", "end_time")
+    @classmethod
+    def to_local_time(cls, value: Optional[datetime]) -> Optional[datetime]:
+        """Bars are stored in naive local time, so offsets are converted to it"""
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+class MeasurementBatch(BaseModel):
+    measurements: List[Measurement] = Field(..., max_length=1000)
+
+@router.post("/batch")
+async def evaluate_measurements(batch: MeasurementBatch) -> Dict[str, Any]:
+    """Evaluate many measurements in one round trip
+    
+    Measured Moves return points 0-3 for long or short and the distance from
+    the latest price to each target. Measures return the price change and,
+    when anchored to bar times, the high, low and amplitude between them.
+    Invalid measurements are answered with an error entry in place.
+    """
+    
+    result = await measurement_service.evaluate([item.model_dump() for item in batch.measurements])
+    result["timestamp"] = datetime.now().isoformat()
+    return result
@@ -0,0 +1,101 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up
+    orjson = None
+
+from backend.app.models.bar_batch import BarBatch
+
+# Cache-Control policies for market data responses
+CACHE_CONTROL_REVALIDATE = "no-cache"
+CACHE_CONTROL_IMMUTABLE = "public, max-age=31536000, immutable"
+
+def _encode_batch(batch: BarBatch) -> bytes:
+    """A BarBatch as the JSON array of its bar objects, encoded one column at a time
+
+    Each column is encoded by orjson in a single call and the values are
+    spliced into the row objects, so no per-bar dictionary is built and the
+    bytes are the ones orjson would produce for to_dicts(). No encoded value
+    contains a comma: times are ISO strings and the rest are numbers.
+    """
+    if not len(batch):
+        return b"[]"
+    columns = [
+        batch.iso_times(),
+        batch.opens.tolist(),
+        batch.highs.tolist(),
+        batch.lows.tolist(),
+        batch.closes.tolist(),
+        batch.volumes.tolist()
+    ]
+    row = b'{"time":%b,"open":%b,"high":%b,"low":%b,"close":%b,"volume":%b}'
+    if batch.ids is not None:
+        # The prefix is used as a format string, so % in the names is escaped
+        symbol, timeframe = (orjson.dumps(name).replace(b"%", b"%%") for name in (batch.symbol, batch.timeframe))
+        row = b'{"id":%b,"symbol":' + symbol + b',"timeframe":' + timeframe + b"," + row[1:]
+        columns.insert(0, batch.ids.tolist())
+    encoded = [orjson.dumps(column)[1:-1].split(b",") for column in columns]
+    return b"[" + b",".join(row % values for values in zip(*encoded)) + b"]"
+
+def _encode_default(value: Any) -> Any:
+    """orjson fallback: BarBatch values are spliced in as pre-encoded JSON"""
+    if isinstance(value, BarBatch):
+        return orjson.Fragment(_encode_batch(value))
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _encode_default_json(value: Any) -> Any:
+    """json fallback: BarBatch values as their bar dictionaries"""
+    if isinstance(value, BarBatch):
+        return value.to_dicts()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when it is installed
+
+    Produces JSON equivalent to FastAPI's default JSONResponse (compact
+    separators, UTF-8 without ASCII escaping). The bytes may differ where
+    the encoders differ: orjson writes 1e16 for 1e+16, null for NaN, and
+    encodes datetimes natively. Returning it from an endpoint also skips
+    the response model validation pass FastAPI would otherwise run over the
+    payload. BarBatch values may be embedded anywhere in the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_encode_default)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_encode_default_json
+        ).encode("utf-8")
+
+def make_etag(*parts: Any) -> str:
+    """Build a strong ETag from the values that identify a response's content"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check whether the request's If-None-Match header matches an ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    # If-None-Match uses weak comparison, so W/ prefixes added by proxies still match
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+def cache_headers(etag: str, cache_control: str) -> Dict[str, str]:
+    """Headers that let clients revalidate or reuse a response"""
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+def not_modified(etag: str, cache_control: Optional[str] = CACHE_CONTROL_REVALIDATE) -> Response:
+    """Empty 304 response for a matching conditional request"""
+    return Response(status_code=304, headers=cache_headers(etag, cache_control))
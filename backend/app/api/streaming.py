@@ -0,0 +1,98 @@
+from typing import Any, AsyncIterator, Callable, Dict, List
+import json
+import logging
+import struct
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional speed-up
+    orjson = None
+
+from backend.app.models.bar_batch import BarBatch, from_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+# Media types of the streamed K-line formats
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+# Binary frames are a little-endian uint32 payload length followed by the
+# payload: a run of fixed-size bar records. A zero-length frame ends the
+# stream, so clients can tell a complete range from a dropped connection.
+FRAME_HEADER = struct.Struct("<I")
+
+# One bar: milliseconds since 1970-01-01 in the store's naive wall-clock
+# time, open, high, low and close as float64, volume as int64
+BAR_RECORD = struct.Struct("<qddddq")
+
+def _dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+def encode_ndjson(bars: BarBatch) -> bytes:
+    """One JSON bar per line, in the same shape as the /kline response's data items"""
+    return b"".join(_dumps(bar) + b"\n" for bar in bars.to_dicts())
+
+def encode_binary(bars: BarBatch) -> bytes:
+    """One length-prefixed frame holding a record per bar, packed from the batch's columns"""
+    payload = b"".join(
+        BAR_RECORD.pack(*fields)
+        for fields in zip(bars.times, bars.opens, bars.highs, bars.lows, bars.closes, bars.volumes)
+    )
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+def decode_binary(data: bytes) -> List[Dict[str, Any]]:
+    """Bars of a complete binary stream, as time/open/high/low/close/volume dictionaries
+
+    Raises ValueError if the stream is truncated or lacks its end frame.
+    """
+    bars = []
+    offset = 0
+    while offset + FRAME_HEADER.size <= len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        if length == 0:
+            return bars
+        if offset + length > len(data) or length % BAR_RECORD.size:
+            break
+        for timestamp, open_price, high, low, close, volume in BAR_RECORD.iter_unpack(data[offset:offset + length]):
+            bars.append({
+                "time": from_epoch_ms(timestamp).isoformat(),
+                "open": open_price,
+                "high": high,
+                "low": low,
+                "close": close,
+                "volume": volume
+            })
+        offset += length
+    raise ValueError("Truncated K-line stream")
+
+STREAM_ENCODERS: Dict[str, Callable[[BarBatch], bytes]] = {
+    "ndjson": encode_ndjson,
+    "binary": encode_binary
+}
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "binary": BINARY_MEDIA_TYPE
+}
+
+async def stream_chunks(chunks: AsyncIterator[BarBatch], stream_format: str) -> AsyncIterator[bytes]:
+    """Encode bar chunks one at a time as they are read
+
+    The chunk queries run in worker threads; each chunk is encoded on the
+    event loop, which is bounded by the chunk size.
+
+    The response has already started when a later chunk fails, so errors end
+    the stream early; binary clients see the missing end frame.
+    """
+    encode = STREAM_ENCODERS[stream_format]
+    try:
+        async for bars in chunks:
+            yield encode(bars)
+    except Exception:
+        logger.exception("K-line stream aborted")
+        return
+    if stream_format == "binary":
+        yield FRAME_HEADER.pack(0)
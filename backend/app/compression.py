@@ -0,0 +1,93 @@
+from typing import List
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+def _accepted_encodings(accept_encoding: str) -> List[str]:
+    """Parse an Accept-Encoding header, dropping codings refused with q=0"""
+    encodings = []
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                pass
+        if coding:
+            encodings.append(coding.lower())
+    return encodings
+
+class BrotliResponder(IdentityResponder):
+    """Compress response bodies with brotli, flushing after each streamed chunk"""
+    content_encoding = "br"
+    
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = 4) -> None:
+        super().__init__(app, minimum_size)
+        self.compressor = brotli.Compressor(quality=quality)
+    
+    def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        compressed = self.compressor.process(body)
+        if more_body:
+            return compressed + self.compressor.flush()
+        return compressed + self.compressor.finish()
+
+class CompressionMiddleware:
+    """Compress responses above a size threshold with brotli or gzip
+    
+    Brotli is preferred when the client accepts it and the optional brotli
+    package is installed; otherwise gzip is used. Responses that already
+    carry a Content-Encoding and event streams are passed through untouched.
+    
+    Every response gets Vary: Accept-Encoding. For clients offered a
+    compressed body, strong ETags are made weak: the same validator then
+    stands for the br, gzip and identity bodies, which are not byte-for-byte
+    equal as a strong ETag requires. If-None-Match compares weakly, so
+    revalidation keeps working.
+    """
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        encodings = _accepted_encodings(Headers(scope=scope).get("Accept-Encoding", ""))
+        responder: ASGIApp
+        if brotli is not None and "br" in encodings:
+            responder = BrotliResponder(self.app, self.minimum_size, quality=self.brotli_quality)
+        elif "gzip" in encodings:
+            responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.gzip_level)
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+        compressing = type(responder) is not IdentityResponder
+        
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if compressing and not responder.content_encoding_set and etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+            await send(message)
+        
+        await responder(scope, receive, send_with_validators)
@@ -0,0 +1,135 @@
+from datetime import date
+import os
+from typing import List, Tuple
+
+def _env_list(name: str, default: str = "") -> List[str]:
+    """Read a comma-separated environment variable as a list of non-empty items"""
+    return [item.strip() for item in os.getenv(name, default).split(",") if item.strip()]
+
+def _parse_watchlist(entries: List[str], default_timeframes: List[str]) -> List[Tuple[str, str]]:
+    """Expand watchlist entries into (symbol, timeframe) pairs
+    
+    Entries are either SYMBOL, which is watched on every default timeframe,
+    or SYMBOL:TIMEFRAME for a single series.
+    """
+    watchlist = []
+    for entry in entries:
+        symbol, _, timeframe = entry.partition(":")
+        for series in [(symbol, timeframe)] if timeframe else [(symbol, tf) for tf in default_timeframes]:
+            if series not in watchlist:
+                watchlist.append(series)
+    return watchlist
+
+# Symbols preloaded at startup and kept warm by the prefetch scheduler,
+# e.g. WATCHLIST="000001,600000:5m" with WATCHLIST_TIMEFRAMES="1m,5m"
+WATCHLIST_TIMEFRAMES = _env_list("WATCHLIST_TIMEFRAMES", "1m")
+WATCHLIST = _parse_watchlist(_env_list("WATCHLIST"), WATCHLIST_TIMEFRAMES)
+
+# Number of recent bars loaded per watchlist series
+PREFETCH_LOOKBACK_BARS = int(os.getenv("PREFETCH_LOOKBACK_BARS", "500"))
+
+# How long after each bar close the scheduler rolls the cache forward, so
+# the provider has finalized the bar
+PREFETCH_DELAY_SECONDS = float(os.getenv("PREFETCH_DELAY_SECONDS", "2"))
+
+# Longest time startup waits for the watchlist warm-up before serving traffic
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "30"))
+
+# Concurrent calls to the upstream market data provider: the limit starts at
+# UPSTREAM_CONCURRENCY and adapts between 1 and UPSTREAM_MAX_CONCURRENCY with
+# upstream latency and errors; at most UPSTREAM_MAX_QUEUE calls may wait
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", "4"))
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "16"))
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "100"))
+UPSTREAM_LATENCY_TARGET_SECONDS = float(os.getenv("UPSTREAM_LATENCY_TARGET_SECONDS", "2"))
+
+# Upstream rate limit (calls per second, burst size), per-call timeout and retry attempts
+UPSTREAM_RATE_PER_SECOND = float(os.getenv("UPSTREAM_RATE_PER_SECOND", "20"))
+UPSTREAM_BURST = int(os.getenv("UPSTREAM_BURST", "20"))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", "10"))
+UPSTREAM_RETRY_ATTEMPTS = int(os.getenv("UPSTREAM_RETRY_ATTEMPTS", "3"))
+
+# Consecutive upstream failures that open the circuit, and how long it stays open
+UPSTREAM_CIRCUIT_FAILURES = int(os.getenv("UPSTREAM_CIRCUIT_FAILURES", "5"))
+UPSTREAM_CIRCUIT_RESET_SECONDS = float(os.getenv("UPSTREAM_CIRCUIT_RESET_SECONDS", "30"))
+
+# How often the health monitor refreshes provider, database and queue status
+HEALTH_CHECK_INTERVAL_SECONDS = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", "5"))
+
+# Minimum time between two deep health checks that call the provider
+DEEP_HEALTH_MIN_INTERVAL_SECONDS = float(os.getenv("DEEP_HEALTH_MIN_INTERVAL_SECONDS", "60"))
+
+# Size budget of the K-line cache in bars, and how evictions pick victims ("lru" or "lfu")
+CACHE_MAX_BARS = int(os.getenv("CACHE_MAX_BARS", "5000000"))
+CACHE_EVICTION_POLICY = os.getenv("CACHE_EVICTION_POLICY", "lru")
+CACHE_EVICTION_INTERVAL_SECONDS = float(os.getenv("CACHE_EVICTION_INTERVAL_SECONDS", "60"))
+
+# Multi-process mode for several uvicorn workers on one host: one process owns
+# the upstream subscriptions and background jobs, the others follow it over a
+# Unix socket. Ownership is held by an exclusive lock on INGEST_LOCK_PATH.
+MULTI_PROCESS = os.getenv("MULTI_PROCESS", "false").lower() in ("1", "true", "yes")
+COHERENCE_SOCKET_PATH = os.getenv("COHERENCE_SOCKET_PATH", "./data/ingest.sock")
+INGEST_LOCK_PATH = os.getenv("INGEST_LOCK_PATH", "./data/ingest.lock")
+
+# Process pool for CPU-bound analytics (indicators, resampling): worker count,
+# maximum queued jobs before new ones are rejected, and per-job timeout
+ANALYTICS_WORKERS = int(os.getenv("ANALYTICS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+ANALYTICS_MAX_PENDING = int(os.getenv("ANALYTICS_MAX_PENDING", "32"))
+ANALYTICS_TIMEOUT_SECONDS = float(os.getenv("ANALYTICS_TIMEOUT_SECONDS", "10"))
+
+# Historical backfill: bars per upstream request and chunks fetched in parallel per job
+BACKFILL_CHUNK_BARS = int(os.getenv("BACKFILL_CHUNK_BARS", "5000"))
+BACKFILL_PARALLELISM = int(os.getenv("BACKFILL_PARALLELISM", "4"))
+# Seconds without a heartbeat after which a running job's worker is presumed
+# dead and another worker may resume the job
+BACKFILL_LEASE_SECONDS = float(os.getenv("BACKFILL_LEASE_SECONDS", "30"))
+
+# Rows read from the store per chunk when streaming K-line ranges
+KLINE_STREAM_CHUNK_ROWS = int(os.getenv("KLINE_STREAM_CHUNK_ROWS", "5000"))
+
+# Tick streaming: window in which ticks are coalesced into one frame per
+# client, and the price precision of binary frames
+TICK_BATCH_WINDOW_MS = float(os.getenv("TICK_BATCH_WINDOW_MS", "40"))
+TICK_PRICE_DECIMALS = int(os.getenv("TICK_PRICE_DECIMALS", "2"))
+# Most symbols one tick stream client may follow
+TICK_STREAM_MAX_SYMBOLS = int(os.getenv("TICK_STREAM_MAX_SYMBOLS", "50"))
+
+# Extra exchange holidays as comma-separated ISO dates, added to the yearly
+# lists in trading_calendar.CN_EXCHANGE_HOLIDAYS; weekends are always closed
+MARKET_HOLIDAYS = [date.fromisoformat(day) for day in _env_list("MARKET_HOLIDAYS")]
+
+# Ticks per second per symbol emitted by the mock market data provider
+MOCK_TICK_RATE = float(os.getenv("MOCK_TICK_RATE", "1"))
+
+# Replay recorded ticks instead of the mock random walk: "db" replays the
+# realtime_data table, any other value is the path of a tick archive
+# (NDJSON, optionally .gz). REPLAY_SPEED is a multiple of real time; 0
+# replays as fast as possible. Replayed ticks are not written back to
+# realtime_data.
+REPLAY_SOURCE = os.getenv("REPLAY_SOURCE", "")
+REPLAY_SPEED = float(os.getenv("REPLAY_SPEED", "1"))
+
+# What a "db" replay loads: comma-separated symbols and the ISO start and
+# end times of the window, all required so the table is never read whole
+REPLAY_SYMBOLS = _env_list("REPLAY_SYMBOLS")
+REPLAY_START = os.getenv("REPLAY_START", "")
+REPLAY_END = os.getenv("REPLAY_END", "")
+
+# Warm-restart snapshot of in-memory state (cache versions and freshness,
+# last prices, access stats, alerts): file path, and seconds between
+# periodic snapshots (0 writes one only at shutdown)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "./data/state.snap")
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv("SNAPSHOT_INTERVAL_SECONDS", "60"))
+
+# Analytic range scans (multi-symbol reads and resampling). "auto" runs a
+# scan estimated at SCAN_ENGINE_MIN_ROWS bars or more on DuckDB, when it is
+# installed, and smaller ones on SQLite; "sqlite" and "duckdb" pick one
+# engine for every scan. SCAN_ENGINE_THREADS caps DuckDB's worker threads
+# (0 uses all cores). After a failed DuckDB scan or connection, scans run on
+# SQLite for SCAN_ENGINE_RETRY_SECONDS before DuckDB is tried again.
+# DuckDB's sqlite extension is loaded but never downloaded, so install it
+# ahead of time: python -c "import duckdb; duckdb.execute('INSTALL sqlite')"
+SCAN_ENGINE = os.getenv("SCAN_ENGINE", "auto").lower()
+SCAN_ENGINE_MIN_ROWS = int(os.getenv("SCAN_ENGINE_MIN_ROWS", "200000"))
+SCAN_ENGINE_THREADS = int(os.getenv("SCAN_ENGINE_THREADS", "0"))
+SCAN_ENGINE_RETRY_SECONDS = float(os.getenv("SCAN_ENGINE_RETRY_SECONDS", "60"))
@@ -1,54 +1,175 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from contextlib import contextmanager
-from typing import Generator
+from typing import Generator, List
+import asyncio
+import logging
 import os
+import zlib
 
 from backend.app.models.market_data import Base
 
+logger = logging.getLogger(__name__)
+
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/paviewer.db")
 
-# Create engine with appropriate settings for SQLite
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        DATABASE_URL,
-        poolclass=StaticPool,
+# Number of SQLite files market data is spread across; 1 keeps everything in DATABASE_URL
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "1"))
+
+@contextmanager
+def _managed_session(factory: sessionmaker) -> Generator[Session, None, None]:
+    """Session that commits on success and rolls back on error"""
+    session = factory()
+    try:
+        yield session
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+def shard_url(index: int, database_url: str = DATABASE_URL) -> str:
+    """SQLite URL of a shard, stored next to the main database file"""
+    base, extension = os.path.splitext(database_url)
+    return f"{base}.shard{index}{extension or '.db'}"
+
+def create_sqlite_engine(url: str) -> Engine:
+    """Engine for a SQLite database file, the main one or a shard
+    
+    Uses a connection pool and WAL journaling, so writer threads, readers
+    on the event loop and worker threads each get their own connection and
+    a commit or rollback in one never touches another's transaction.
+    In-memory databases exist per connection and share a single one.
+    """
+    if url.endswith(":memory:") or url in ("sqlite://", "sqlite:///"):
+        return create_engine(
+            url,
+            poolclass=StaticPool,
+            connect_args={"check_same_thread": False},
+            echo=False
+        )
+    
+    sqlite_engine = create_engine(
+        url,
         connect_args={
             "check_same_thread": False,
             "timeout": 20
         },
         echo=False  # Set to True for SQL debugging
     )
+    
+    @event.listens_for(sqlite_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+    
+    return sqlite_engine
+
+# Create engine with appropriate settings for SQLite
+if DATABASE_URL.startswith("sqlite"):
+    engine = create_sqlite_engine(DATABASE_URL)
 else:
     engine = create_engine(DATABASE_URL)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+class ShardRouter:
+    """Routes symbols to database shards
+    
+    Symbols are assigned to shards by a stable hash, so every process maps
+    a symbol to the same file. Each shard has its own engine and an asyncio
+    lock that serializes its writer; writes to different shards proceed in
+    parallel. With a single shard everything uses the main engine.
+    """
+    
+    def __init__(self, engines: List[Engine]):
+        self.engines = engines
+        self._session_factories = [
+            SessionLocal if shard_engine is engine else sessionmaker(autocommit=False, autoflush=False, bind=shard_engine)
+            for shard_engine in engines
+        ]
+        self.write_locks = [asyncio.Lock() for _ in engines]
+    
+    @classmethod
+    def from_config(cls, shard_count: int = SHARD_COUNT, database_url: str = DATABASE_URL) -> "ShardRouter":
+        """Router for the configured shard count; sharding requires SQLite"""
+        if shard_count <= 1:
+            return cls([engine])
+        if not database_url.startswith("sqlite"):
+            logger.warning("SHARD_COUNT=%d ignored: sharding is only supported for SQLite", shard_count)
+            return cls([engine])
+        return cls([create_sqlite_engine(shard_url(index, database_url)) for index in range(shard_count)])
+    
+    @property
+    def shard_count(self) -> int:
+        return len(self.engines)
+    
+    @property
+    def is_sharded(self) -> bool:
+        return len(self.engines) > 1
+    
+    def shard_for(self, symbol: str) -> int:
+        """Shard index holding a symbol's data"""
+        if not self.is_sharded:
+            return 0
+        return zlib.crc32(symbol.encode()) % len(self.engines)
+    
+    @contextmanager
+    def session(self, symbol: str) -> Generator[Session, None, None]:
+        """Session on the shard holding a symbol"""
+        with self.shard_session(self.shard_for(symbol)) as session:
+            yield session
+    
+    @contextmanager
+    def shard_session(self, index: int) -> Generator[Session, None, None]:
+        """Session on a shard by index"""
+        with _managed_session(self._session_factories[index]) as session:
+            yield session
+    
+    def create_all(self) -> None:
+        for shard_engine in self.engines:
+            if shard_engine is not engine:
+                with shard_engine.connect() as connection:
+                    connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
+                Base.metadata.create_all(bind=shard_engine)
+    
+    def drop_all(self) -> None:
+        for shard_engine in self.engines:
+            if shard_engine is not engine:
+                Base.metadata.drop_all(bind=shard_engine)
+
+# Global instance
+shard_router = ShardRouter.from_config()
+
 def create_tables():
     """Create all database tables"""
     # Ensure data directory exists
     os.makedirs("data", exist_ok=True)
+    if DATABASE_URL.startswith("sqlite"):
+        with engine.connect() as connection:
+            # Only takes effect on a new, empty database; lets cache eviction
+            # return freed pages to the OS with PRAGMA incremental_vacuum
+            connection.exec_driver_sql("PRAGMA auto_vacuum = INCREMENTAL")
     Base.metadata.create_all(bind=engine)
+    shard_router.create_all()
 
 def drop_tables():
     """Drop all database tables (for testing)"""
     Base.metadata.drop_all(bind=engine)
+    shard_router.drop_all()
 
 @contextmanager
 def get_db_session() -> Generator[Session, None, None]:
     """Get database session with automatic cleanup"""
-    session = SessionLocal()
-    try:
+    with _managed_session(SessionLocal) as session:
         yield session
-        session.commit()
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
 
 def get_db() -> Generator[Session, None, None]:
     """FastAPI dependency for database sessions"""
@@ -56,4 +177,4 @@ def get_db() -> Generator[Session, None, None]:
     try:
         yield session
     finally:
-        session.close()
\ No newline at end of file
+        session.close()
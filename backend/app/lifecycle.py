@@ -0,0 +1,82 @@
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+from datetime import datetime
+import logging
+import time
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+class StartupPipeline:
+    """Runs named startup and shutdown phases and records how long each took
+    
+    The report is exposed at /health/startup so the cost of a restart, and
+    the time from process import to serving the first request, can be
+    tracked across deploys.
+    """
+    
+    def __init__(self, process_started: float):
+        self.process_started = process_started
+        self.phases: Dict[str, float] = {}
+        self.failed_phase: Optional[str] = None
+        self.ready_at: Optional[datetime] = None
+        self.time_to_ready: Optional[float] = None
+        self.time_to_first_request: Optional[float] = None
+    
+    @property
+    def is_ready(self) -> bool:
+        return self.ready_at is not None
+    
+    @asynccontextmanager
+    async def phase(self, name: str) -> AsyncIterator[None]:
+        """Time one phase; failures are recorded and re-raised"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.failed_phase = name
+            logger.exception("Phase %s failed", name)
+            raise
+        finally:
+            self.phases[name] = round((time.perf_counter() - started) * 1000, 2)
+            logger.info("Phase %s took %.2f ms", name, self.phases[name])
+    
+    def mark_ready(self) -> None:
+        """Record that startup finished and the app can serve traffic
+        
+        The first request is measured again after every startup, so an app
+        restarted in the same process reports its own first request.
+        """
+        self.ready_at = datetime.now()
+        self.time_to_first_request = None
+        self.time_to_ready = round((time.perf_counter() - self.process_started) * 1000, 2)
+        logger.info("Ready %.2f ms after import", self.time_to_ready)
+    
+    def mark_request(self) -> None:
+        """Record the first request served after startup"""
+        if self.is_ready and self.time_to_first_request is None:
+            self.time_to_first_request = round((time.perf_counter() - self.process_started) * 1000, 2)
+    
+    def report(self) -> Dict[str, Any]:
+        """Per-phase timings in milliseconds"""
+        return {
+            "ready": self.is_ready,
+            "ready_at": self.ready_at.isoformat() if self.ready_at else None,
+            "failed_phase": self.failed_phase,
+            "phases_ms": dict(self.phases),
+            "time_to_ready_ms": self.time_to_ready,
+            "time_to_first_request_ms": self.time_to_first_request
+        }
+
+class FirstRequestMiddleware:
+    """Records when the first HTTP request arrives after startup"""
+    
+    def __init__(self, app: ASGIApp, pipeline: StartupPipeline):
+        self.app = app
+        self.pipeline = pipeline
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and self.pipeline.time_to_first_request is None:
+            self.pipeline.mark_request()
+        await self.app(scope, receive, send)
@@ -0,0 +1,277 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Union
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from backend.app.services.tick_stream import decode_frame
+
+# Real-time latency target from the development roadmap
+LATENCY_TARGET_MS = 500
+
+API_PREFIX = "/api/market-data"
+
+Frame = Union[bytes, str]
+StreamFactory = Callable[[Sequence[str]], Any]
+
+class LatencyStats:
+    """Latency samples of one operation, reported as percentiles in milliseconds"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+        self.errors = 0
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        samples = sorted(self.samples)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not samples:
+                return None
+            return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 2)
+
+        return {
+            "count": len(samples),
+            "errors": self.errors,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 2) if samples else None
+        }
+
+def _frame_ticks(frame: Frame) -> List[Dict[str, Any]]:
+    """Ticks of one tick stream message, JSON or binary"""
+    if isinstance(frame, bytes):
+        return decode_frame(frame)
+    return json.loads(frame)["ticks"]
+
+class ChartClient:
+    """One simulated chart: a tick stream subscription plus the requests a chart page makes
+
+    The client subscribes to its symbol's ticks, loads history for the first
+    timeframe, then polls the latest price every poll interval and switches
+    to the next timeframe (reloading its history) every switch_every polls.
+    Request latencies go to per-operation stats; the delay between a tick's
+    timestamp and its arrival goes to tick_delays.
+    """
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        stream: StreamFactory,
+        symbol: str,
+        timeframes: Sequence[str],
+        operations: Dict[str, LatencyStats],
+        tick_delays: LatencyStats,
+        poll_interval: float = 1.0,
+        switch_every: int = 5
+    ):
+        self.http = http
+        self.stream = stream
+        self.symbol = symbol
+        self.timeframes = list(timeframes)
+        self.operations = operations
+        self.tick_delays = tick_delays
+        self.poll_interval = poll_interval
+        self.switch_every = switch_every
+
+    async def _request(self, operation: str, path: str, **params: Any) -> None:
+        stats = self.operations.setdefault(operation, LatencyStats())
+        started = time.perf_counter()
+        try:
+            response = await self.http.get(API_PREFIX + path, params=params)
+        except httpx.HTTPError:
+            stats.errors += 1
+            return
+        stats.observe(time.perf_counter() - started)
+        if response.status_code >= 400:
+            stats.errors += 1
+
+    async def _read_ticks(self, frames: AsyncIterator[Frame]) -> None:
+        async for frame in frames:
+            received = datetime.now()
+            for tick in _frame_ticks(frame):
+                delay = (received - datetime.fromisoformat(tick["timestamp"])).total_seconds()
+                self.tick_delays.observe(max(delay, 0.0))
+
+    async def run(self, until: float) -> None:
+        """Act as a chart until the monotonic deadline"""
+        # Spread clients out so they do not poll in lockstep
+        await asyncio.sleep(random.uniform(0, self.poll_interval))
+        async with self.stream([self.symbol]) as frames:
+            reader = asyncio.create_task(self._read_ticks(frames))
+            try:
+                timeframe = 0
+                await self._request("history", f"/kline/{self.symbol}", timeframe=self.timeframes[timeframe])
+                polls = 0
+                while time.monotonic() < until:
+                    await asyncio.sleep(self.poll_interval)
+                    polls += 1
+                    if polls % self.switch_every == 0:
+                        timeframe = (timeframe + 1) % len(self.timeframes)
+                        await self._request("switch_timeframe", f"/kline/{self.symbol}", timeframe=self.timeframes[timeframe])
+                    await self._request("latest_price", f"/latest-price/{self.symbol}")
+            finally:
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+
+def _local_stream(binary: bool) -> StreamFactory:
+    """Tick stream subscriptions registered directly on the in-process tick batcher"""
+    from backend.app.services.realtime import realtime_hub
+    from backend.app.services.tick_stream import TickSubscription, tick_batcher
+
+    @asynccontextmanager
+    async def stream(symbols: Sequence[str]) -> AsyncIterator[AsyncIterator[Frame]]:
+        subscription = TickSubscription(set(symbols), binary=binary)
+        tick_batcher.add(subscription)
+        subscribed = []
+        try:
+            for symbol in symbols:
+                await realtime_hub.subscribe(symbol)
+                subscribed.append(symbol)
+
+            async def frames() -> AsyncIterator[Frame]:
+                while True:
+                    yield await subscription.queue.get()
+
+            yield frames()
+        finally:
+            tick_batcher.remove(subscription)
+            for symbol in subscribed:
+                await realtime_hub.unsubscribe(symbol)
+
+    return stream
+
+def _remote_stream(url: str, binary: bool) -> StreamFactory:
+    """Tick stream subscriptions over the server's WebSocket endpoint"""
+    import websockets
+
+    base = "ws" + url[len("http"):] if url.startswith("http") else url
+
+    @asynccontextmanager
+    async def stream(symbols: Sequence[str]) -> AsyncIterator[AsyncIterator[Frame]]:
+        query = f"symbols={','.join(symbols)}&format={'binary' if binary else 'json'}"
+        async with websockets.connect(f"{base.rstrip('/')}{API_PREFIX}/ticks?{query}") as connection:
+            yield connection
+
+    return stream
+
+async def run_load(
+    clients: int = 10,
+    duration: float = 30.0,
+    url: Optional[str] = None,
+    symbols: Sequence[str] = ("000001", "000002", "600000", "600036"),
+    timeframes: Sequence[str] = ("1m", "5m", "15m"),
+    tick_rate: Optional[float] = None,
+    poll_interval: float = 1.0,
+    switch_every: int = 5,
+    binary: bool = False
+) -> Dict[str, Any]:
+    """Run simulated chart clients for a duration and report latencies as a dictionary
+
+    Without a url the app runs in-process (lifespan included) behind an
+    ASGI transport, and tick_rate sets the mock provider's ticks per second
+    per symbol. With a url the clients talk to a running server over HTTP
+    and WebSocket; its tick rate is the server's MOCK_TICK_RATE setting.
+    Clients are spread round-robin over the symbols.
+    """
+    operations: Dict[str, LatencyStats] = {}
+    tick_delays = LatencyStats()
+
+    async def drive(http: httpx.AsyncClient, stream: StreamFactory) -> float:
+        started = time.monotonic()
+        until = started + duration
+        await asyncio.gather(*(
+            ChartClient(
+                http,
+                stream,
+                symbols[index % len(symbols)],
+                timeframes,
+                operations,
+                tick_delays,
+                poll_interval=poll_interval,
+                switch_every=switch_every
+            ).run(until)
+            for index in range(clients)
+        ))
+        return time.monotonic() - started
+
+    if url is None:
+        # Imported here so running against a server does not load the app
+        from backend.app.main import app
+        from backend.app.services.market_data import market_data_provider
+
+        mock = getattr(market_data_provider, "provider", market_data_provider)
+        previous_rate = getattr(mock, "tick_rate", None)
+        if tick_rate is not None and previous_rate is not None:
+            mock.tick_rate = tick_rate
+        try:
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadgen") as http:
+                    elapsed = await drive(http, _local_stream(binary))
+        finally:
+            if previous_rate is not None:
+                mock.tick_rate = previous_rate
+    else:
+        async with httpx.AsyncClient(base_url=url) as http:
+            elapsed = await drive(http, _remote_stream(url, binary))
+
+    requests = sum(len(stats.samples) for stats in operations.values())
+    errors = sum(stats.errors for stats in operations.values())
+    ticks = tick_delays.snapshot()
+    return {
+        "target": url or "in-process",
+        "clients": clients,
+        "duration_seconds": round(elapsed, 2),
+        "tick_rate": tick_rate if url is None else None,
+        "stream_format": "binary" if binary else "json",
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else None,
+        "operations": {operation: stats.snapshot() for operation, stats in operations.items()},
+        "ticks": ticks,
+        "latency_target_ms": LATENCY_TARGET_MS,
+        "within_target": ticks["p99_ms"] is not None and ticks["p99_ms"] <= LATENCY_TARGET_MS
+    }
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m backend.app.loadgen",
+        description="Simulate chart clients against PAViewer and print latency percentiles as JSON"
+    )
+    parser.add_argument("--clients", type=int, default=10, help="Number of simulated chart clients")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--url", help="Base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--symbols", default="000001,000002,600000,600036", help="Comma-separated symbols")
+    parser.add_argument("--timeframes", default="1m,5m,15m", help="Comma-separated timeframes to switch between")
+    parser.add_argument("--tick-rate", type=float, help="Mock ticks per second per symbol (in-process only)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between latest-price polls")
+    parser.add_argument("--switch-every", type=int, default=5, help="Polls between timeframe switches")
+    parser.add_argument("--binary", action="store_true", help="Use binary tick frames")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(
+        clients=args.clients,
+        duration=args.duration,
+        url=args.url,
+        symbols=[symbol for symbol in args.symbols.split(",") if symbol],
+        timeframes=[timeframe for timeframe in args.timeframes.split(",") if timeframe],
+        tick_rate=args.tick_rate,
+        poll_interval=args.poll_interval,
+        switch_every=args.switch_every,
+        binary=args.binary
+    ))
+    json.dump(report, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
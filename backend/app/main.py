@@ -1,12 +1,211 @@
+import time
+
+# Taken before any other import so startup timings include module loading
+_PROCESS_STARTED = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from datetime import timedelta
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from backend.app.api.alerts import router as alerts_router
 from backend.app.api.market_data import router as market_data_router
+from backend.app.api.measurements import router as measurements_router
+from backend.app.compression import CompressionMiddleware
+from backend.app.config import (
+    WATCHLIST,
+    PREFETCH_LOOKBACK_BARS,
+    PREFETCH_DELAY_SECONDS,
+    WARMUP_TIMEOUT_SECONDS,
+    CACHE_MAX_BARS,
+    CACHE_EVICTION_POLICY,
+    CACHE_EVICTION_INTERVAL_SECONDS,
+    MULTI_PROCESS,
+    COHERENCE_SOCKET_PATH,
+    INGEST_LOCK_PATH,
+)
+from backend.app.database import create_tables
+from backend.app.lifecycle import FirstRequestMiddleware, StartupPipeline
+from backend.app.services.data_cache import data_cache_service
+from backend.app.services.health import health_monitor
+from backend.app.services.market_data import market_data_provider
+from backend.app.services.realtime import realtime_hub
+
+# Background services (analytics pool, backfills, eviction, snapshots, the
+# tick batcher) are imported in the lifespan phases that start them, so
+# their import cost shows up in the phase timings instead of module loading
+
+startup_pipeline = StartupPipeline(_PROCESS_STARTED)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Measured startup and shutdown sequence
+    
+    Startup: schema check, restore of the warm-restart snapshot, provider
+    connect, tick write queue, then the ingest jobs (watchlist cache
+    warm-up, tick subscriptions, interrupted backfills, the cache evictor
+    and periodic snapshots), the analytics process pool and the health
+    monitor. In multi-process mode the worker first joins the coherence
+    group, and only the elected ingest owner runs the ingest jobs; a
+    follower starts them if it is promoted later. Shutdown stops the
+    background tasks, backfills and the analytics pool, drains the tick
+    write queue, writes a final snapshot if this process owns ingest and
+    disconnects the provider.
+    """
+    pipeline = startup_pipeline
+    scheduler = None
+    evictor = None
+    coherence = None
+    
+    async def start_ingest() -> None:
+        nonlocal scheduler, evictor
+        
+        # A promoted follower takes over the symbols it subscribed through the owner
+        await realtime_hub.resubscribe()
+        
+        if WATCHLIST:
+            async with pipeline.phase("cache_warm_up"):
+                # Only needed with a watchlist, so imported here
+                from backend.app.services.prefetch import PrefetchScheduler
+                
+                scheduler = PrefetchScheduler(
+                    data_cache_service,
+                    WATCHLIST,
+                    lookback_bars=PREFETCH_LOOKBACK_BARS,
+                    delay=timedelta(seconds=PREFETCH_DELAY_SECONDS)
+                )
+                try:
+                    await asyncio.wait_for(scheduler.warm_up(), WARMUP_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Serve traffic anyway; the scheduler keeps refreshing in the background
+                    pass
+                scheduler.start(warm_up=False)
+            
+            async with pipeline.phase("realtime_subscribe"):
+                # Feed the last-price table from the tick stream of watched symbols
+                for symbol in dict.fromkeys(symbol for symbol, _ in WATCHLIST):
+                    await realtime_hub.subscribe(symbol)
+        
+        from backend.app.services.alerts import alert_index
+        
+        if len(alert_index):
+            async with pipeline.phase("alert_subscribe"):
+                # Alerts restored from the snapshot need their symbols' ticks
+                await alert_index.watch()
+        
+        async with pipeline.phase("backfill_resume"):
+            from backend.app.services.backfill import backfill_manager
+            
+            backfill_manager.resume_incomplete()
+        
+        async with pipeline.phase("cache_evictor_start"):
+            from backend.app.services.eviction import CacheEvictor
+            
+            evictor = CacheEvictor(
+                data_cache_service,
+                max_bars=CACHE_MAX_BARS,
+                policy=CACHE_EVICTION_POLICY,
+                interval=CACHE_EVICTION_INTERVAL_SECONDS,
+                protected=set(WATCHLIST)
+            )
+            evictor.start()
+        
+        from backend.app.services.snapshot import snapshot_manager
+        
+        snapshot_manager.start()
+    
+    async with pipeline.phase("schema_check"):
+        create_tables()
+        # Fill the series summaries of a database written before they existed
+        data_cache_service.rebuild_series_summaries(only_if_missing=True)
+    
+    async with pipeline.phase("snapshot_restore"):
+        from backend.app.services.snapshot import snapshot_manager
+        
+        snapshot_manager.restore()
+    
+    if MULTI_PROCESS:
+        async with pipeline.phase("coherence_join"):
+            from backend.app.services.alerts import alert_index
+            from backend.app.services.coherence import CoherenceBus
+            
+            coherence = CoherenceBus(data_cache_service, COHERENCE_SOCKET_PATH, INGEST_LOCK_PATH)
+            coherence.on_promote = start_ingest
+            # Alerts live in the ingest owner; followers keep a replica
+            alert_index.join(coherence)
+            # Followers subscribe through the owner and get its ticks relayed
+            realtime_hub.join(coherence)
+            realtime_hub.add_listener(coherence.publish_tick, relayed=False)
+            await coherence.start()
+    
+    async with pipeline.phase("provider_connect"):
+        if not market_data_provider.is_connected:
+            await market_data_provider.connect()
+    
+    async with pipeline.phase("write_queue_start"):
+        data_cache_service.tick_write_queue.start()
+    
+    if coherence is None or coherence.is_owner:
+        await start_ingest()
+    
+    async with pipeline.phase("analytics_pool_start"):
+        from backend.app.services.analytics import analytics_pool
+        
+        analytics_pool.start()
+    
+    async with pipeline.phase("health_monitor_start"):
+        health_monitor.start()
+    
+    pipeline.mark_ready()
+    health_monitor.started = True
+    
+    yield
+    
+    health_monitor.started = False
+    await health_monitor.stop()
+    
+    from backend.app.services.tick_stream import tick_batcher
+    
+    await tick_batcher.stop()
+    
+    async with pipeline.phase("analytics_pool_stop"):
+        await analytics_pool.stop()
+    
+    if evictor:
+        await evictor.stop()
+    
+    if scheduler:
+        async with pipeline.phase("scheduler_stop"):
+            await scheduler.stop()
+    
+    async with pipeline.phase("backfill_stop"):
+        from backend.app.services.backfill import backfill_manager
+        
+        await backfill_manager.stop()
+    
+    async with pipeline.phase("write_queue_drain"):
+        await data_cache_service.tick_write_queue.drain()
+    
+    await snapshot_manager.stop()
+    if coherence is None or coherence.is_owner:
+        async with pipeline.phase("snapshot_save"):
+            await snapshot_manager.save_async(clean=True)
+    
+    if coherence:
+        async with pipeline.phase("coherence_leave"):
+            await coherence.stop()
+            realtime_hub.remove_listener(coherence.publish_tick)
+    
+    async with pipeline.phase("provider_disconnect"):
+        await market_data_provider.disconnect()
 
 app = FastAPI(
     title="PAViewer API",
     description="Price Action Viewer - Trading Analysis API",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -17,8 +216,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress market data responses above 1 KiB (brotli when available, else gzip)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+app.add_middleware(FirstRequestMiddleware, pipeline=startup_pipeline)
+
 # Include routers
 app.include_router(market_data_router)
+app.include_router(alerts_router)
+app.include_router(measurements_router)
 
 @app.get("/")
 async def root():
@@ -26,4 +232,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/health/startup")
+async def startup_report():
+    """Per-phase startup timings and the outcome of the snapshot restore"""
+    from backend.app.services.snapshot import snapshot_manager
+    
+    return {**startup_pipeline.report(), "snapshot": snapshot_manager.last_restore}
@@ -0,0 +1,196 @@
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from backend.app.models.values import Bar
+
+# Bar times are stored as milliseconds since this naive epoch, in the same
+# wall-clock time as the datetimes in the database
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+def to_epoch_ms(timestamp: Union[str, datetime]) -> int:
+    """Milliseconds since 1970-01-01 of a naive datetime or ISO string"""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return (timestamp - _EPOCH) // _MILLISECOND
+
+def from_epoch_ms(value: int) -> datetime:
+    return _EPOCH + value * _MILLISECOND
+
+class BarBatch(Sequence[Dict[str, Any]]):
+    """Bars of one series stored as columns
+
+    Times are an int64 array of epoch milliseconds, prices float64 arrays and
+    volumes an int64 array, so a batch holds no per-bar Python objects.
+    Batches read from the cache also carry the row ids and the series'
+    symbol and timeframe.
+
+    A batch is a read-only sequence of bar dictionaries in the API shape,
+    built on access, so code written for List[Dict] keeps working; hot paths
+    read the columns instead.
+    """
+
+    __slots__ = ("times", "opens", "highs", "lows", "closes", "volumes", "ids", "symbol", "timeframe")
+
+    def __init__(
+        self,
+        times: Optional[array] = None,
+        opens: Optional[array] = None,
+        highs: Optional[array] = None,
+        lows: Optional[array] = None,
+        closes: Optional[array] = None,
+        volumes: Optional[array] = None,
+        ids: Optional[array] = None,
+        symbol: Optional[str] = None,
+        timeframe: Optional[str] = None
+    ):
+        self.times = times if times is not None else array("q")
+        self.opens = opens if opens is not None else array("d")
+        self.highs = highs if highs is not None else array("d")
+        self.lows = lows if lows is not None else array("d")
+        self.closes = closes if closes is not None else array("d")
+        self.volumes = volumes if volumes is not None else array("q")
+        self.ids = ids
+        self.symbol = symbol
+        self.timeframe = timeframe
+
+    @classmethod
+    def from_dicts(cls, bars: Iterable[Dict[str, Any]]) -> 'BarBatch':
+        """Batch from market data dictionaries with time/open/high/low/close/volume keys"""
+        batch = cls()
+        for bar in bars:
+            batch.append(bar["time"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+        return batch
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Any]) -> 'BarBatch':
+        """Batch from K-line rows (ORM instances or Core result rows) of one series"""
+        return cls(
+            array("q", [(row.timestamp - _EPOCH) // _MILLISECOND for row in rows]),
+            array("d", [row.open_price for row in rows]),
+            array("d", [row.high_price for row in rows]),
+            array("d", [row.low_price for row in rows]),
+            array("d", [row.close_price for row in rows]),
+            array("q", [row.volume for row in rows]),
+            ids=array("q", [row.id for row in rows]),
+            symbol=rows[0].symbol if rows else None,
+            timeframe=rows[0].timeframe if rows else None
+        )
+
+    @classmethod
+    def of(cls, bars: Sequence[Dict[str, Any]]) -> 'BarBatch':
+        """The bars as a batch, converting only if they are not one already"""
+        return bars if isinstance(bars, BarBatch) else cls.from_dicts(bars)
+
+    def append(
+        self,
+        time: Union[str, datetime],
+        open_price: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: int
+    ) -> None:
+        self.times.append(to_epoch_ms(time))
+        self.opens.append(float(open_price))
+        self.highs.append(float(high))
+        self.lows.append(float(low))
+        self.closes.append(float(close))
+        self.volumes.append(int(volume))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return BarBatch(
+                self.times[index],
+                self.opens[index],
+                self.highs[index],
+                self.lows[index],
+                self.closes[index],
+                self.volumes[index],
+                ids=self.ids[index] if self.ids is not None else None,
+                symbol=self.symbol,
+                timeframe=self.timeframe
+            )
+        bar = {
+            "time": from_epoch_ms(self.times[index]).isoformat(),
+            "open": self.opens[index],
+            "high": self.highs[index],
+            "low": self.lows[index],
+            "close": self.closes[index],
+            "volume": self.volumes[index]
+        }
+        if self.ids is not None:
+            bar = {"id": self.ids[index], "symbol": self.symbol, "timeframe": self.timeframe, **bar}
+        return bar
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, BarBatch):
+            return self.to_dicts() == other.to_dicts()
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"<BarBatch({self.symbol}, {self.timeframe}, {len(self)} bars)>"
+
+    def bar(self, index: int) -> Bar:
+        """One bar as an immutable Bar value, without building a dictionary"""
+        return Bar(
+            from_epoch_ms(self.times[index]),
+            self.opens[index],
+            self.highs[index],
+            self.lows[index],
+            self.closes[index],
+            self.volumes[index]
+        )
+
+    def bars(self) -> Iterator[Bar]:
+        """All bars as Bar values, zipped from the columns"""
+        return map(Bar._make, zip(
+            map(from_epoch_ms, self.times), self.opens, self.highs, self.lows, self.closes, self.volumes
+        ))
+
+    def time_at(self, index: int) -> datetime:
+        return from_epoch_ms(self.times[index])
+
+    def iso_times(self) -> List[str]:
+        return [from_epoch_ms(value).isoformat() for value in self.times]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """All bars as API dictionaries, built column-wise"""
+        columns = [
+            self.iso_times(),
+            self.opens.tolist(),
+            self.highs.tolist(),
+            self.lows.tolist(),
+            self.closes.tolist(),
+            self.volumes.tolist()
+        ]
+        if self.ids is None:
+            return [
+                {"time": time, "open": o, "high": h, "low": l, "close": c, "volume": v}
+                for time, o, h, l, c, v in zip(*columns)
+            ]
+        symbol = self.symbol
+        timeframe = self.timeframe
+        return [
+            {"id": bar_id, "symbol": symbol, "timeframe": timeframe, "time": time, "open": o, "high": h, "low": l, "close": c, "volume": v}
+            for bar_id, time, o, h, l, c, v in zip(self.ids.tolist(), *columns)
+        ]
+
+    def to_columns(self) -> Dict[str, List[Any]]:
+        """Bars as one list per field, for the columnar response layout"""
+        return {
+            "time": self.iso_times(),
+            "open": self.opens.tolist(),
+            "high": self.highs.tolist(),
+            "low": self.lows.tolist(),
+            "close": self.closes.tolist(),
+            "volume": self.volumes.tolist()
+        }
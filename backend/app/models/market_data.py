@@ -34,16 +34,21 @@ class KLineData(Base):
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert model to dictionary for API responses"""
+        return KLineData.row_to_dict(self)
+    
+    @staticmethod
+    def row_to_dict(row: Any) -> Dict[str, Any]:
+        """Convert a K-line row (ORM instance or Core result row) to an API dictionary"""
         return {
-            "id": self.id,
-            "symbol": self.symbol,
-            "timeframe": self.timeframe,
-            "time": self.timestamp.isoformat() if self.timestamp else None,
-            "open": self.open_price,
-            "high": self.high_price,
-            "low": self.low_price,
-            "close": self.close_price,
-            "volume": self.volume
+            "id": row.id,
+            "symbol": row.symbol,
+            "timeframe": row.timeframe,
+            "time": row.timestamp.isoformat() if row.timestamp else None,
+            "open": row.open_price,
+            "high": row.high_price,
+            "low": row.low_price,
+            "close": row.close_price,
+            "volume": row.volume
         }
     
     @classmethod
@@ -52,14 +57,21 @@ class KLineData(Base):
         return cls(
             symbol=symbol,
             timeframe=timeframe,
-            timestamp=datetime.fromisoformat(data["time"]) if isinstance(data["time"], str) else data["time"],
-            open_price=float(data["open"]),
-            high_price=float(data["high"]),
-            low_price=float(data["low"]),
-            close_price=float(data["close"]),
-            volume=int(data["volume"])
+            **cls.values_from_market_data(data)
         )
     
+    @staticmethod
+    def values_from_market_data(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a market data dictionary to K-line column values"""
+        return {
+            "timestamp": datetime.fromisoformat(data["time"]) if isinstance(data["time"], str) else data["time"],
+            "open_price": float(data["open"]),
+            "high_price": float(data["high"]),
+            "low_price": float(data["low"]),
+            "close_price": float(data["close"]),
+            "volume": int(data["volume"])
+        }
+    
     def __repr__(self):
         return f"<KLineData({self.symbol}, {self.timeframe}, {self.timestamp}, O:{self.open_price}, H:{self.high_price}, L:{self.low_price}, C:{self.close_price})>"
 
@@ -102,4 +114,78 @@ class RealtimeData(Base):
         )
     
     def __repr__(self):
-        return f"<RealtimeData({self.symbol}, P:{self.price}, V:{self.volume}, {self.timestamp})>"
\ No newline at end of file
+        return f"<RealtimeData({self.symbol}, P:{self.price}, V:{self.volume}, {self.timestamp})>"
+
+
+class BackfillJob(Base):
+    """Historical backfill of one series, with its resume checkpoint"""
+    __tablename__ = "backfill_jobs"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    symbol = Column(String(20), nullable=False)
+    timeframe = Column(String(10), nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    
+    # The range is fetched in chunks of chunk_bars bars; every chunk before
+    # next_chunk is stored, so a resumed job starts there
+    chunk_bars = Column(Integer, nullable=False)
+    chunks_total = Column(Integer, nullable=False)
+    next_chunk = Column(Integer, nullable=False, default=0)
+    bars_written = Column(BigInteger, nullable=False, default=0)
+    
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, completed, failed, cancelled
+    error = Column(String(500))
+    
+    # Lease of the worker process running the job, renewed by heartbeats
+    owner_pid = Column(Integer)
+    heartbeat_at = Column(DateTime)
+    
+    # Metadata
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert model to dictionary for API responses"""
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "start_time": self.start_time.isoformat(),
+            "end_time": self.end_time.isoformat(),
+            "chunk_bars": self.chunk_bars,
+            "chunks_total": self.chunks_total,
+            "chunks_done": self.next_chunk,
+            "bars_written": self.bars_written,
+            "status": self.status,
+            "error": self.error,
+            "owner_pid": self.owner_pid,
+            "heartbeat_at": self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    def __repr__(self):
+        return f"<BackfillJob({self.id}, {self.symbol}, {self.timeframe}, {self.status}, {self.next_chunk}/{self.chunks_total})>"
+
+class SeriesSummary(Base):
+    """Aggregates of one cached K-line series, maintained by the cache writer
+    
+    Stored on the series' shard and updated in the same transaction as its
+    bars, so range, size, last close and freshness questions are answered
+    without scanning kline_data.
+    """
+    __tablename__ = "series_summary"
+    
+    symbol = Column(String(20), primary_key=True)
+    timeframe = Column(String(10), primary_key=True)
+    first_time = Column(DateTime, nullable=False)
+    last_time = Column(DateTime, nullable=False)
+    bar_count = Column(BigInteger, nullable=False)
+    last_close = Column(Float, nullable=False)
+    
+    # Last time the cache writer stored or re-confirmed bars of the series
+    updated_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<SeriesSummary({self.symbol}, {self.timeframe}, {self.bar_count} bars, {self.first_time} - {self.last_time})>"
@@ -0,0 +1,135 @@
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Union
+
+def _as_datetime(value: Union[str, datetime]) -> datetime:
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+class Tick(NamedTuple):
+    """One trade on the real-time path
+
+    An immutable tuple: it has no per-instance __dict__, so it takes a
+    fraction of the memory of the equivalent dictionary and its fields are
+    read by position. Ticks cross process and network boundaries as
+    dictionaries (to_dict/from_dict) and are stored as realtime_data rows.
+    """
+
+    symbol: str
+    price: float
+    volume: int
+    timestamp: datetime
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Tick':
+        """Tick from wire or provider data; a missing timestamp means now"""
+        timestamp = data.get("timestamp")
+        return cls(
+            data["symbol"],
+            float(data["price"]),
+            int(data.get("volume", 0)),
+            _as_datetime(timestamp) if timestamp is not None else datetime.now()
+        )
+
+    @classmethod
+    def of(cls, value: Union['Tick', Dict[str, Any]]) -> 'Tick':
+        """The value as a Tick, converting only if it is not one already"""
+        return value if isinstance(value, Tick) else cls.from_dict(value)
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'Tick':
+        """Tick from a realtime_data row (ORM instance or Core result row)"""
+        return cls(row.symbol, row.price, row.volume, row.timestamp)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Wire format, with an ISO timestamp"""
+        return {
+            "symbol": self.symbol,
+            "price": self.price,
+            "volume": self.volume,
+            "timestamp": self.timestamp.isoformat()
+        }
+
+    def to_row(self) -> Dict[str, Any]:
+        """Column values of a realtime_data row"""
+        return {
+            "symbol": self.symbol,
+            "price": self.price,
+            "volume": self.volume,
+            "timestamp": self.timestamp
+        }
+
+class Bar(NamedTuple):
+    """One K-line bar on in-memory paths, immutable like Tick"""
+
+    time: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: int
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'Bar':
+        """Bar from a market data dictionary with time/open/high/low/close/volume keys"""
+        return cls(
+            _as_datetime(data["time"]),
+            float(data["open"]),
+            float(data["high"]),
+            float(data["low"]),
+            float(data["close"]),
+            int(data["volume"])
+        )
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'Bar':
+        """Bar from a kline_data row (ORM instance or Core result row)"""
+        return cls(row.timestamp, row.open_price, row.high_price, row.low_price, row.close_price, row.volume)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Wire format, with an ISO time"""
+        return {
+            "time": self.time.isoformat(),
+            "open": self.open,
+            "high": self.high,
+            "low": self.low,
+            "close": self.close,
+            "volume": self.volume
+        }
+
+    def to_values(self) -> Dict[str, Any]:
+        """K-line column values, as KLineData.values_from_market_data returns them"""
+        return {
+            "timestamp": self.time,
+            "open_price": self.open,
+            "high_price": self.high,
+            "low_price": self.low,
+            "close_price": self.close,
+            "volume": self.volume
+        }
+
+class SeriesInfo(NamedTuple):
+    """Aggregates of one cached series, as stored in series_summary"""
+
+    symbol: str
+    timeframe: str
+    first_time: datetime
+    last_time: datetime
+    bar_count: int
+    last_close: float
+    updated_at: datetime
+
+    @classmethod
+    def from_row(cls, row: Any) -> 'SeriesInfo':
+        """SeriesInfo from a series_summary row (ORM instance or Core result row)"""
+        return cls(row.symbol, row.timeframe, row.first_time, row.last_time, row.bar_count, row.last_close, row.updated_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Wire format, with ISO times"""
+        return {
+            "symbol": self.symbol,
+            "timeframe": self.timeframe,
+            "first_time": self.first_time.isoformat(),
+            "last_time": self.last_time.isoformat(),
+            "bar_count": self.bar_count,
+            "last_close": self.last_close,
+            "updated_at": self.updated_at.isoformat()
+        }
@@ -0,0 +1,324 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import count
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+from backend.app.models.values import Tick
+from backend.app.services.measurements import measured_move_levels
+from backend.app.services.realtime import realtime_hub
+
+if TYPE_CHECKING:
+    from backend.app.services.coherence import CoherenceBus
+
+logger = logging.getLogger(__name__)
+
+AlertListener = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+class AlertIndex:
+    """Price-level alerts kept in a sorted index per symbol
+
+    Each symbol holds its alert prices in a sorted list, with alert ids in a
+    parallel list. A tick moving the price from p to q triggers exactly the
+    levels between them, found with two binary searches, so evaluating a
+    tick costs O(log n + k) for n levels and k crossings regardless of how
+    many alerts are registered. Alerts fire once and are then removed.
+    Triggered alerts are delivered to the registered async listeners.
+
+    When the workers of a multi-process deployment share alerts, the ingest
+    owner's index is the only one that changes or evaluates ticks. Follower
+    indexes are replicas: the create and delete coroutines run on the owner
+    through the coherence bus, and the owner broadcasts every change and
+    trigger so followers can list alerts and push triggers to their own
+    stream clients.
+
+    The owner holds one tick stream reference per symbol with active
+    alerts, taken with the symbol's first alert and released when its last
+    one is removed or triggered.
+    """
+
+    def __init__(self):
+        self._prices: Dict[str, List[float]] = {}
+        self._ids: Dict[str, List[int]] = {}
+        self._alerts: Dict[int, Dict[str, Any]] = {}
+        self._last_prices: Dict[str, float] = {}
+        self._listeners: List[AlertListener] = []
+        self._watched: Set[str] = set()
+        self._next_id = count(1)
+        self._next_measurement_id = count(1)
+        self.coherence: Optional['CoherenceBus'] = None
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def add_listener(self, listener: AlertListener) -> None:
+        """Register an async callback that receives each batch of triggered alerts"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: AlertListener) -> None:
+        """Unregister an alert callback"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def add(
+        self,
+        symbol: str,
+        price: float,
+        kind: str = "level",
+        measurement_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Register an alert at a price level"""
+        alert = {
+            "id": next(self._next_id),
+            "symbol": symbol,
+            "price": float(price),
+            "kind": kind,
+            "measurement_id": measurement_id,
+            "created_at": datetime.now().isoformat()
+        }
+        self._insert(alert)
+        return alert
+
+    def _insert(self, alert: Dict[str, Any]) -> None:
+        symbol = alert["symbol"]
+        prices = self._prices.setdefault(symbol, [])
+        position = bisect_right(prices, alert["price"])
+        prices.insert(position, alert["price"])
+        self._ids.setdefault(symbol, []).insert(position, alert["id"])
+        self._alerts[alert["id"]] = alert
+
+    def add_measured_move(self, symbol: str, stop: float, entry: float) -> Dict[str, Any]:
+        """Register the stop and both risk targets of a Measured Move as one measurement"""
+        measurement_id = next(self._next_measurement_id)
+        levels = measured_move_levels(float(stop), float(entry))
+        alerts = [
+            self.add(symbol, levels[kind], kind, measurement_id)
+            for kind in ("stop", "target_1r", "target_2r")
+        ]
+        return {"measurement_id": measurement_id, "symbol": symbol, "levels": levels, "alerts": alerts}
+
+    def get(self, alert_id: int) -> Optional[Dict[str, Any]]:
+        return self._alerts.get(alert_id)
+
+    def active(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Active alerts, ordered by price within each symbol"""
+        symbols = [symbol] if symbol is not None else sorted(self._ids)
+        return [self._alerts[alert_id] for sym in symbols for alert_id in self._ids.get(sym, [])]
+
+    def remove(self, alert_id: int) -> Optional[Dict[str, Any]]:
+        """Remove an alert; returns it, or None if it is not active"""
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return None
+        prices = self._prices[alert["symbol"]]
+        ids = self._ids[alert["symbol"]]
+        # Equal prices are adjacent, so the id is found next to its price
+        position = bisect_left(prices, alert["price"])
+        while ids[position] != alert_id:
+            position += 1
+        del prices[position]
+        del ids[position]
+        if not ids:
+            del self._prices[alert["symbol"]]
+            del self._ids[alert["symbol"]]
+        return alert
+
+    def remove_measurement(self, measurement_id: int) -> List[Dict[str, Any]]:
+        """Remove every alert of a measurement"""
+        alert_ids = [
+            alert_id for alert_id, alert in self._alerts.items()
+            if alert["measurement_id"] == measurement_id
+        ]
+        return [self.remove(alert_id) for alert_id in alert_ids]
+
+    def crossed(self, symbol: str, previous: float, price: float) -> List[Dict[str, Any]]:
+        """Remove and return the alerts crossed by a move from previous to price
+
+        A level equal to the new price counts as crossed; a level equal to
+        the previous price was already reached by the previous tick.
+        """
+        prices = self._prices.get(symbol)
+        if not prices or price == previous:
+            return []
+        if price > previous:
+            low, high = bisect_right(prices, previous), bisect_right(prices, price)
+        else:
+            low, high = bisect_left(prices, price), bisect_left(prices, previous)
+        if low == high:
+            return []
+
+        triggered_ids = self._ids[symbol][low:high]
+        del prices[low:high]
+        del self._ids[symbol][low:high]
+        if not prices:
+            del self._prices[symbol]
+            del self._ids[symbol]
+
+        triggered = [self._alerts.pop(alert_id) for alert_id in triggered_ids]
+        # Report in the order the price passed through the levels
+        return triggered if price > previous else triggered[::-1]
+
+    def snapshot_state(self) -> Dict[str, Any]:
+        """Active alerts and last prices, for warm restarts"""
+        return {"alerts": list(self._alerts.values()), "last_prices": dict(self._last_prices)}
+
+    def restore_state(self, state: Dict[str, Any], clean: bool) -> None:
+        """Re-register saved alerts under their ids
+
+        Ids issued afterwards continue after the highest restored one. The
+        saved last prices are kept, so levels crossed while the process was
+        down trigger on the first tick after the restart.
+        """
+        for alert in state["alerts"]:
+            if alert["id"] not in self._alerts:
+                self._insert(dict(alert))
+        for symbol, price in state["last_prices"].items():
+            self._last_prices.setdefault(symbol, price)
+        self._advance_ids()
+
+    def _advance_ids(self) -> None:
+        """Issue new ids after the highest registered ones"""
+        if self._alerts:
+            self._next_id = count(max(next(self._next_id), max(self._alerts) + 1))
+        measurement_ids = [alert["measurement_id"] for alert in self._alerts.values() if alert["measurement_id"] is not None]
+        if measurement_ids:
+            self._next_measurement_id = count(max(next(self._next_measurement_id), max(measurement_ids) + 1))
+
+    @property
+    def is_replica(self) -> bool:
+        """True in a follower worker, whose index mirrors the ingest owner's"""
+        return self.coherence is not None and not self.coherence.is_owner
+
+    def join(self, coherence: 'CoherenceBus') -> None:
+        """Share alerts with the other workers of the coherence group"""
+        self.coherence = coherence
+        coherence.handle_calls("alerts", self._apply_command)
+        coherence.handle_records("alerts", self._apply_record)
+        coherence.add_sync_source(lambda: {"type": "alerts", "reset": True, "added": list(self._alerts.values())})
+        # Take or release the tick streams when this worker becomes owner or follower
+        coherence.add_connect_callback(self.watch)
+
+    async def create(self, symbol: str, price: float) -> Dict[str, Any]:
+        """Register an alert at a price level and make sure its symbol's ticks are streamed"""
+        return await self._execute({"op": "add", "symbol": symbol, "price": price})
+
+    async def create_measured_move(self, symbol: str, stop: float, entry: float) -> Dict[str, Any]:
+        """Register a Measured Move's alerts and make sure its symbol's ticks are streamed"""
+        return await self._execute({"op": "measured_move", "symbol": symbol, "stop": stop, "entry": entry})
+
+    async def delete(self, alert_id: int) -> Optional[Dict[str, Any]]:
+        """Remove an alert; returns it, or None if it is not active"""
+        return await self._execute({"op": "remove", "alert_id": alert_id})
+
+    async def delete_measurement(self, measurement_id: int) -> List[Dict[str, Any]]:
+        """Remove every alert of a measurement"""
+        return await self._execute({"op": "remove_measurement", "measurement_id": measurement_id})
+
+    async def _execute(self, command: Dict[str, Any]) -> Any:
+        if self.is_replica:
+            return await self.coherence.call("alerts", command)
+        return await self._apply_command(command)
+
+    async def _apply_command(self, command: Dict[str, Any]) -> Any:
+        """Owner side: apply a create or delete command and broadcast the change"""
+        op = command["op"]
+        if op == "add":
+            result = self.add(command["symbol"], command["price"])
+            added, removed = [result], []
+        elif op == "measured_move":
+            result = self.add_measured_move(command["symbol"], command["stop"], command["entry"])
+            added, removed = result["alerts"], []
+        elif op == "remove":
+            result = self.remove(command["alert_id"])
+            added, removed = [], [result] if result is not None else []
+        elif op == "remove_measurement":
+            result = self.remove_measurement(command["measurement_id"])
+            added, removed = [], result
+        else:
+            raise ValueError(f"Unknown alert command {op!r}")
+
+        self._broadcast(added=added, removed=[alert["id"] for alert in removed])
+        await self.watch()
+        return result
+
+    def _broadcast(self, **record: Any) -> None:
+        if self.coherence is not None:
+            self.coherence.broadcast({"type": "alerts", **record})
+
+    async def _apply_record(self, record: Dict[str, Any]) -> None:
+        """Follower side: mirror a change broadcast by the owner and deliver its triggers"""
+        if record.get("reset"):
+            self._prices.clear()
+            self._ids.clear()
+            self._alerts.clear()
+        for alert in record.get("added", ()):
+            if alert["id"] not in self._alerts:
+                self._insert(dict(alert))
+        for alert_id in record.get("removed", ()):
+            self.remove(alert_id)
+        # Ids continue after the replica's if this worker is promoted to owner
+        self._advance_ids()
+        if record.get("triggered"):
+            await self._deliver(record["triggered"])
+
+    async def on_tick(self, tick: Tick) -> None:
+        """Tick stream listener: trigger the levels crossed since the symbol's previous tick
+
+        Replicas only track the price; the owner reports what triggered.
+        """
+        symbol = tick.symbol
+        price = tick.price
+        previous = self._last_prices.get(symbol)
+        self._last_prices[symbol] = price
+        if previous is None or self.is_replica:
+            return
+
+        triggered = self.crossed(symbol, previous, price)
+        if not triggered:
+            return
+
+        triggered_at = datetime.now().isoformat()
+        events = [
+            {**alert, "trigger_price": price, "triggered_at": triggered_at}
+            for alert in triggered
+        ]
+        self._broadcast(removed=[alert["id"] for alert in triggered], triggered=events)
+        await self._deliver(events)
+        await self.watch()
+
+    async def watch(self) -> None:
+        """Hold a tick stream reference for each symbol with alerts and release the others
+
+        Only the owner evaluates ticks, so a replica holds none. A symbol
+        that cannot be subscribed is retried on the next change; its alerts
+        stay registered and are evaluated once ticks arrive.
+        """
+        wanted = set() if self.is_replica else set(self._ids)
+        # The sets change before each await, so concurrent calls agree
+        for symbol in sorted(wanted - self._watched):
+            self._watched.add(symbol)
+            try:
+                await realtime_hub.subscribe(symbol)
+            except Exception as e:
+                self._watched.discard(symbol)
+                logger.warning("Could not subscribe to %s for alerts: %s", symbol, e)
+        for symbol in sorted(self._watched - wanted):
+            self._watched.discard(symbol)
+            try:
+                await realtime_hub.unsubscribe(symbol)
+            except Exception as e:
+                logger.warning("Could not unsubscribe from %s: %s", symbol, e)
+
+    async def _deliver(self, events: List[Dict[str, Any]]) -> None:
+        for listener in list(self._listeners):
+            try:
+                await listener(events)
+            except Exception:
+                logger.exception("Alert listener %r failed", listener)
+
+# Global instance
+alert_index = AlertIndex()
+
+# Evaluate alerts on every tick of the stream
+realtime_hub.add_listener(alert_index.on_tick)
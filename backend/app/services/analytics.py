@@ -0,0 +1,306 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, MutableSequence, Optional, Sequence, Tuple, Union
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+
+from backend.app.config import ANALYTICS_WORKERS, ANALYTICS_MAX_PENDING, ANALYTICS_TIMEOUT_SECONDS
+from backend.app.models.bar_batch import BarBatch
+
+logger = logging.getLogger(__name__)
+
+# Typecodes of a bar's columns as BarBatch stores them: epoch milliseconds,
+# open, high, low, close and volume. Every column item is 8 bytes wide, so
+# columns are laid out back to back in a shared block
+_BAR_TYPECODES = "qddddq"
+_ITEM_SIZE = 8
+
+NAN = float("nan")
+
+class AnalyticsBusyError(RuntimeError):
+    """Raised when too many analytics jobs are already queued"""
+
+class AnalyticsTimeoutError(TimeoutError):
+    """Raised when an analytics job does not finish within its timeout"""
+
+def ema_into(values: Sequence[float], period: int, out: MutableSequence[float]) -> None:
+    """Exponential moving average, seeded with the simple average of the first period values
+
+    Positions before the first full period are NaN.
+    """
+    alpha = 2.0 / (period + 1)
+    total = 0.0
+    current = NAN
+    for index in range(len(values)):
+        value = values[index]
+        if index < period - 1:
+            total += value
+            out[index] = NAN
+        elif index == period - 1:
+            current = (total + value) / period
+            out[index] = current
+        else:
+            current += alpha * (value - current)
+            out[index] = current
+
+def sma_into(values: Sequence[float], period: int, out: MutableSequence[float]) -> None:
+    """Simple moving average over a sliding window; NaN before the first full window"""
+    total = 0.0
+    for index in range(len(values)):
+        total += values[index]
+        if index >= period:
+            total -= values[index - period]
+        out[index] = total / period if index >= period - 1 else NAN
+
+def resample_into(bars: Sequence[Sequence[float]], bucket: float, out: Sequence[MutableSequence[float]]) -> int:
+    """Merge time-ordered bars into buckets of bucket time units; returns the number of buckets
+
+    bars and out are (time, open, high, low, close, volume) column sequences.
+    Each bucket starts at its floored time, opens with its first bar, closes
+    with its last and sums volumes.
+    """
+    times, opens, highs, lows, closes, volumes = bars
+    out_times, out_opens, out_highs, out_lows, out_closes, out_volumes = out
+    count = 0
+    for index in range(len(times)):
+        start = times[index] - times[index] % bucket
+        if count and out_times[count - 1] == start:
+            last = count - 1
+            out_highs[last] = max(out_highs[last], highs[index])
+            out_lows[last] = min(out_lows[last], lows[index])
+            out_closes[last] = closes[index]
+            out_volumes[last] += volumes[index]
+        else:
+            out_times[count] = start
+            out_opens[count] = opens[index]
+            out_highs[count] = highs[index]
+            out_lows[count] = lows[index]
+            out_closes[count] = closes[index]
+            out_volumes[count] = volumes[index]
+            count += 1
+    return count
+
+def _column_views(buf: memoryview, length: int, typecodes: str) -> List[memoryview]:
+    """Views of consecutive columns of a shared block, each typed by its typecode"""
+    size = length * _ITEM_SIZE
+    return [buf[index * size:(index + 1) * size].cast(typecode) for index, typecode in enumerate(typecodes)]
+
+def _indicators_job(shm_name: str, length: int, ema_period: int, ma_period: int) -> None:
+    """Worker side: closes in column 0, EMA written to column 1 and SMA to column 2"""
+    shm = SharedMemory(name=shm_name, track=False)
+    try:
+        closes, ema, ma = columns = _column_views(shm.buf, length, "ddd")
+        try:
+            ema_into(closes, ema_period, ema)
+            sma_into(closes, ma_period, ma)
+        finally:
+            for column in columns:
+                column.release()
+    finally:
+        shm.close()
+
+def _resample_job(shm_name: str, length: int, bucket_ms: int) -> int:
+    """Worker side: bar columns 0-5 are resampled into columns 6-11"""
+    shm = SharedMemory(name=shm_name, track=False)
+    try:
+        columns = _column_views(shm.buf, length, _BAR_TYPECODES * 2)
+        try:
+            return resample_into(columns[:len(_BAR_TYPECODES)], bucket_ms, columns[len(_BAR_TYPECODES):])
+        finally:
+            for column in columns:
+                column.release()
+    finally:
+        shm.close()
+
+def _lower_priority() -> None:
+    """Worker initializer: yield the CPU to the serving process"""
+    try:
+        os.nice(5)
+    except OSError:
+        pass
+
+class AnalyticsPool:
+    """Runs CPU-bound analytics in a pool of worker processes
+
+    Jobs exchange 8-byte array columns through one shared memory block per
+    job instead of pickling them: the caller copies the input arrays in with
+    one memcpy each, the worker fills the output columns in place and only
+    job parameters and a small return value are pickled. Workers run at
+    lower priority so the event loop and the tick stream keep precedence.
+
+    At most max_pending jobs may be queued or running; further submissions
+    fail fast with AnalyticsBusyError. Only max_workers jobs are handed to
+    the pool at a time, the rest wait in this process, so a job's timeout
+    runs from when a worker takes it, not from when it was queued. A job
+    exceeding its timeout raises AnalyticsTimeoutError and the pool is
+    replaced with its workers terminated, so a hung job cannot keep a CPU
+    busy; the other running jobs fail with AnalyticsTimeoutError too, while
+    waiting jobs go to the new pool. Inputs shorter than
+    inline_threshold are computed in the calling process, where the round
+    trip to a worker would cost more than the work.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = ANALYTICS_WORKERS,
+        max_pending: int = ANALYTICS_MAX_PENDING,
+        timeout: float = ANALYTICS_TIMEOUT_SECONDS,
+        inline_threshold: int = 2048
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.inline_threshold = inline_threshold
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._generation = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs queued or running in the pool"""
+        return self._pending
+
+    @property
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def start(self) -> None:
+        """Create the process pool; workers are spawned on demand"""
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                # Forking a process that runs an event loop and threads is unsafe
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_lower_priority
+            )
+
+    async def stop(self) -> None:
+        """Cancel queued jobs and wait for the workers to exit"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+        self._slots = None
+
+    def _restart(self) -> None:
+        """Replace the pool, terminating its workers so a hung job stops running"""
+        if self._executor is not None:
+            executor, self._executor = self._executor, None
+            self._generation += 1
+            # shutdown() forgets the worker processes, so take them first
+            processes = list((executor._processes or {}).values())
+            executor.shutdown(wait=False, cancel_futures=True)
+            for process in processes:
+                process.terminate()
+            self.start()
+
+    async def run_job(
+        self,
+        job: Callable[..., Any],
+        columns: Sequence[Union[array, Sequence[float]]],
+        output_typecodes: str,
+        *args: Any
+    ) -> Tuple[List[array], Any]:
+        """Run job(shm_name, length, *args) in a worker over shared columns
+
+        All input columns must have the same length and 8-byte items; arrays
+        are copied as they are and other sequences as float64. Returns one
+        array per output typecode, read from the columns that follow the
+        inputs in the shared block, and the job's return value.
+        """
+        if self._executor is None:
+            raise RuntimeError("Analytics pool is not running")
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise AnalyticsBusyError(f"{self._pending} analytics jobs already pending")
+
+        length = len(columns[0])
+        size = length * _ITEM_SIZE
+        total_columns = len(columns) + len(output_typecodes)
+        shm = SharedMemory(create=True, size=max(total_columns * size, 1))
+        self._pending += 1
+        try:
+            for index, column in enumerate(columns):
+                if not isinstance(column, array):
+                    column = array("d", column)
+                shm.buf[index * size:(index + 1) * size] = memoryview(column).cast("B")
+
+            async with self._slots:
+                if self._executor is None:
+                    raise RuntimeError("Analytics pool is not running")
+                generation = self._generation
+                future = asyncio.get_running_loop().run_in_executor(self._executor, job, shm.name, length, *args)
+                try:
+                    result = await asyncio.wait_for(future, self.timeout)
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    logger.warning("Analytics job %s timed out after %.1fs", job.__name__, self.timeout)
+                    if generation == self._generation:
+                        self._restart()
+                    raise AnalyticsTimeoutError(f"{job.__name__} exceeded {self.timeout}s")
+                except (asyncio.CancelledError, BrokenProcessPool):
+                    # Jobs running in a pool replaced after another job timed
+                    # out are cancelled or lose their worker
+                    if generation != self._generation and not asyncio.current_task().cancelling():
+                        raise AnalyticsTimeoutError(f"{job.__name__} was dropped when the pool was replaced after a timeout") from None
+                    raise
+
+            outputs = []
+            for index, typecode in enumerate(output_typecodes, len(columns)):
+                output = array(typecode)
+                output.frombytes(shm.buf[index * size:(index + 1) * size])
+                outputs.append(output)
+            self.completed += 1
+            return outputs, result
+        finally:
+            self._pending -= 1
+            shm.close()
+            shm.unlink()
+
+    async def indicators(
+        self,
+        closes: Union[array, Sequence[float]],
+        ema_period: int = 20,
+        ma_period: int = 16
+    ) -> Dict[str, List[Optional[float]]]:
+        """EMA and simple moving average of closing prices, None where undefined"""
+        if len(closes) < self.inline_threshold:
+            ema = [NAN] * len(closes)
+            ma = [NAN] * len(closes)
+            ema_into(closes, ema_period, ema)
+            sma_into(closes, ma_period, ma)
+        else:
+            (ema, ma), _ = await self.run_job(_indicators_job, [closes], "dd", ema_period, ma_period)
+
+        return {
+            f"ema{ema_period}": [None if math.isnan(value) else value for value in ema],
+            f"ma{ma_period}": [None if math.isnan(value) else value for value in ma]
+        }
+
+    async def resample(self, bars: Sequence[Dict[str, Any]], bucket: timedelta) -> BarBatch:
+        """Merge time-ordered bars, as returned by the cache, into bars of a longer duration"""
+        batch = BarBatch.of(bars)
+        columns = (batch.times, batch.opens, batch.highs, batch.lows, batch.closes, batch.volumes)
+        bucket_ms = bucket // timedelta(milliseconds=1)
+
+        if len(batch) < self.inline_threshold:
+            out = [array(column.typecode, column) for column in columns]
+            count = resample_into(columns, bucket_ms, out)
+        else:
+            out, count = await self.run_job(_resample_job, columns, _BAR_TYPECODES, bucket_ms)
+
+        return BarBatch(*(column[:count] for column in out), symbol=batch.symbol)
+
+# Global instance
+analytics_pool = AnalyticsPool()
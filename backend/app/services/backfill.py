@@ -0,0 +1,257 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import math
+import os
+import time
+
+from sqlalchemy import or_
+
+from backend.app.config import BACKFILL_CHUNK_BARS, BACKFILL_LEASE_SECONDS, BACKFILL_PARALLELISM
+from backend.app.database import get_db_session
+from backend.app.models.market_data import BackfillJob
+from backend.app.services.data_cache import DataCacheService, data_cache_service
+from backend.app.services.market_data import TIMEFRAME_DURATIONS, align_to_bar
+
+logger = logging.getLogger(__name__)
+
+class BackfillManager:
+    """Loads deep history into the cache in chunks
+
+    A job splits its range into chunks of chunk_bars bars and fetches up to
+    parallelism chunks at a time through the cache's refresh path, so each
+    chunk is written as soon as it arrives and memory use does not grow with
+    the range. Chunks may finish out of order; the stored checkpoint is the
+    first chunk not yet written with all earlier ones done. Jobs interrupted
+    by a restart resume from their checkpoint, and re-fetched chunks are
+    harmless because cache writes upsert by timestamp.
+
+    Workers sharing the database run each job at most once at a time: the
+    running worker holds a lease on the job (its pid and a heartbeat renewed
+    every third of lease_seconds) and only jobs without a live lease are
+    resumed. A job whose lease is taken over, or that another worker
+    cancelled, stops at its next heartbeat.
+    """
+
+    def __init__(
+        self,
+        cache: DataCacheService,
+        chunk_bars: int = BACKFILL_CHUNK_BARS,
+        parallelism: int = BACKFILL_PARALLELISM,
+        lease_seconds: float = BACKFILL_LEASE_SECONDS
+    ):
+        self.cache = cache
+        self.chunk_bars = chunk_bars
+        self.parallelism = parallelism
+        self.lease_seconds = lease_seconds
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._progress: Dict[int, Dict[str, Any]] = {}
+
+    def create(self, symbol: str, timeframe: str, start_time: datetime, end_time: datetime) -> Dict[str, Any]:
+        """Record a backfill job and start it"""
+        if timeframe not in TIMEFRAME_DURATIONS:
+            raise ValueError(f"Unknown timeframe: {timeframe}")
+        start_time = align_to_bar(start_time, timeframe)
+        if end_time <= start_time:
+            raise ValueError("end_time must be after start_time")
+
+        # end_time is inclusive, so a bar starting exactly at it is included
+        bars = (end_time - start_time) // TIMEFRAME_DURATIONS[timeframe] + 1
+        with get_db_session() as session:
+            job = BackfillJob(
+                symbol=symbol,
+                timeframe=timeframe,
+                start_time=start_time,
+                end_time=end_time,
+                chunk_bars=self.chunk_bars,
+                chunks_total=math.ceil(bars / self.chunk_bars),
+                next_chunk=0,
+                bars_written=0,
+                status="pending"
+            )
+            session.add(job)
+            session.flush()
+            job_id = job.id
+
+        self.start(job_id)
+        return self.get(job_id)
+
+    def start(self, job_id: int) -> bool:
+        """Run or resume a job in the background from its checkpoint
+
+        Returns False if another live worker holds the job's lease.
+        """
+        if job_id in self._tasks:
+            return True
+        if not self._claim(job_id):
+            return False
+        self._tasks[job_id] = asyncio.create_task(self.run(job_id))
+        return True
+
+    def _claim(self, job_id: int) -> bool:
+        """Take the job's lease unless another worker renewed it within lease_seconds"""
+        now = datetime.now()
+        with get_db_session() as session:
+            claimed = session.query(BackfillJob).filter(
+                BackfillJob.id == job_id,
+                or_(
+                    BackfillJob.owner_pid.is_(None),
+                    # A pid is unique among live processes, so this one's lease is stale
+                    BackfillJob.owner_pid == os.getpid(),
+                    BackfillJob.heartbeat_at < now - timedelta(seconds=self.lease_seconds)
+                )
+            ).update({"owner_pid": os.getpid(), "heartbeat_at": now}, synchronize_session=False)
+        return claimed == 1
+
+    def _renew(self, job_id: int) -> bool:
+        """Renew this worker's lease of a running job; False if it was lost or the job cancelled"""
+        with get_db_session() as session:
+            renewed = session.query(BackfillJob).filter(
+                BackfillJob.id == job_id,
+                BackfillJob.owner_pid == os.getpid(),
+                BackfillJob.status == "running"
+            ).update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+        return renewed == 1
+
+    def _release(self, job_id: int) -> None:
+        with get_db_session() as session:
+            session.query(BackfillJob).filter(
+                BackfillJob.id == job_id,
+                BackfillJob.owner_pid == os.getpid()
+            ).update({"owner_pid": None, "heartbeat_at": None}, synchronize_session=False)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Stored job state merged with the live progress of a running job"""
+        with get_db_session() as session:
+            job = session.get(BackfillJob, job_id)
+            if job is None:
+                return None
+            result = job.to_dict()
+        result["progress"] = round(result["chunks_done"] / result["chunks_total"], 4) if result["chunks_total"] else 1.0
+        result.update(self._progress.get(job_id, {}))
+        return result
+
+    def list(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        with get_db_session() as session:
+            job_ids = [row[0] for row in session.query(BackfillJob.id).order_by(BackfillJob.id.desc()).limit(limit)]
+        return [self.get(job_id) for job_id in job_ids]
+
+    def resume_incomplete(self) -> int:
+        """Restart jobs left pending or running by a worker that is gone; returns how many"""
+        with get_db_session() as session:
+            job_ids = [
+                row[0] for row in session.query(BackfillJob.id).filter(BackfillJob.status.in_(["pending", "running"]))
+            ]
+        return sum(self.start(job_id) for job_id in job_ids)
+
+    async def cancel(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """Stop a job; its checkpoint is kept so it can be resumed"""
+        task = self._tasks.pop(job_id, None)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        job = self.get(job_id)
+        if job is not None and job["status"] in ("pending", "running"):
+            self._update(job_id, status="cancelled")
+            job = self.get(job_id)
+        return job
+
+    async def stop(self) -> None:
+        """Cancel running jobs at shutdown, leaving them to resume on the next start"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _update(self, job_id: int, **values: Any) -> None:
+        with get_db_session() as session:
+            session.query(BackfillJob).filter(BackfillJob.id == job_id).update(
+                {**values, "updated_at": datetime.now()}
+            )
+
+    def _chunk_range(self, job: Dict[str, Any], index: int) -> Tuple[datetime, datetime]:
+        """Inclusive time range of a chunk; chunks do not overlap"""
+        chunk_span = TIMEFRAME_DURATIONS[job["timeframe"]] * job["chunk_bars"]
+        chunk_start = datetime.fromisoformat(job["start_time"]) + chunk_span * index
+        chunk_end = min(chunk_start + chunk_span - timedelta(microseconds=1), datetime.fromisoformat(job["end_time"]))
+        return chunk_start, chunk_end
+
+    async def run(self, job_id: int) -> None:
+        """Fetch the job's remaining chunks with bounded parallelism"""
+        job = self.get(job_id)
+        if job is None:
+            return
+
+        next_chunk = job["chunks_done"]
+        stored_bars = job["bars_written"]
+        # Bars of chunks written ahead of the checkpoint, by chunk index
+        done: Dict[int, int] = {}
+        chunks = iter(range(next_chunk, job["chunks_total"]))
+        started = time.monotonic()
+        self._update(job_id, status="running", error=None)
+
+        async def worker() -> None:
+            nonlocal next_chunk, stored_bars
+            for index in chunks:
+                chunk_start, chunk_end = self._chunk_range(job, index)
+                data = await self.cache.refresh_kline_data(job["symbol"], job["timeframe"], chunk_start, chunk_end)
+
+                done[index] = len(data)
+                while next_chunk in done:
+                    stored_bars += done.pop(next_chunk)
+                    next_chunk += 1
+                self._update(job_id, next_chunk=next_chunk, bars_written=stored_bars)
+
+                # Live progress also counts chunks finished ahead of the checkpoint
+                chunks_done = next_chunk + len(done)
+                bars_written = stored_bars + sum(done.values())
+                elapsed = time.monotonic() - started
+                self._progress[job_id] = {
+                    "chunks_done": chunks_done,
+                    "bars_written": bars_written,
+                    "progress": round(chunks_done / job["chunks_total"], 4),
+                    "bars_per_second": round((bars_written - job["bars_written"]) / elapsed, 1) if elapsed else None,
+                    "eta_seconds": round(elapsed / (chunks_done - job["chunks_done"]) * (job["chunks_total"] - chunks_done), 1)
+                }
+
+        async def heartbeat() -> None:
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                if not self._renew(job_id):
+                    logger.info("Backfill %d was cancelled or taken over elsewhere; stopping", job_id)
+                    for task in workers:
+                        task.cancel()
+                    return
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.parallelism, job["chunks_total"] - next_chunk))]
+        renewer = asyncio.create_task(heartbeat())
+        try:
+            await asyncio.gather(*workers)
+        except asyncio.CancelledError:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+        except Exception as e:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            logger.warning("Backfill %d of %s %s failed: %s", job_id, job["symbol"], job["timeframe"], e)
+            self._update(job_id, status="failed", error=str(e)[:500] or type(e).__name__)
+        else:
+            self._update(job_id, status="completed")
+            logger.info("Backfill %d of %s %s stored %d bars", job_id, job["symbol"], job["timeframe"], stored_bars)
+        finally:
+            renewer.cancel()
+            self._release(job_id)
+            self._progress.pop(job_id, None)
+            self._tasks.pop(job_id, None)
+
+# Global instance
+backfill_manager = BackfillManager(data_cache_service)
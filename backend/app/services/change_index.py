@@ -0,0 +1,57 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+
+SeriesKey = Tuple[str, str]
+
+class ChangeIndex:
+    """Log of which bar timestamps changed at which cache version, per series
+    
+    The cache writer records every batch of inserted or updated bars under the
+    version it assigned. Readers ask for the bars changed after a version they
+    already hold. Each series keeps a bounded number of batches and
+    timestamps; once older batches are trimmed, or for versions from before
+    this process started, the index cannot answer and the caller must
+    resend the full series.
+    """
+    
+    def __init__(self, floor_version: int, max_batches: int = 1024, max_timestamps: int = 100_000):
+        self.floor_version = floor_version
+        self.max_batches = max_batches
+        self.max_timestamps = max_timestamps
+        self._versions: Dict[SeriesKey, List[int]] = {}
+        self._timestamps: Dict[SeriesKey, List[List[datetime]]] = {}
+        self._sizes: Dict[SeriesKey, int] = {}
+        self._floors: Dict[SeriesKey, int] = {}
+    
+    def record(self, key: SeriesKey, version: int, timestamps: List[datetime]) -> None:
+        """Record the bars changed by one write"""
+        versions = self._versions.setdefault(key, [])
+        batches = self._timestamps.setdefault(key, [])
+        versions.append(version)
+        batches.append(timestamps)
+        self._sizes[key] = self._sizes.get(key, 0) + len(timestamps)
+        
+        # Large writes such as backfills would otherwise grow the log without bound
+        while len(versions) > 1 and (len(versions) > self.max_batches or self._sizes[key] > self.max_timestamps):
+            # Versions up to the trimmed batch can no longer be resolved
+            self._floors[key] = versions.pop(0)
+            self._sizes[key] -= len(batches.pop(0))
+    
+    def changed_since(self, key: SeriesKey, version: int) -> Optional[List[datetime]]:
+        """Timestamps changed after a version, or None if the version is too old to answer"""
+        if version < self._floors.get(key, self.floor_version):
+            return None
+        
+        versions = self._versions.get(key, [])
+        changed = set()
+        for batch in self._timestamps.get(key, [])[bisect_right(versions, version):]:
+            changed.update(batch)
+        return sorted(changed)
+    
+    def discard(self, key: SeriesKey, version: int) -> None:
+        """Forget a series' history, e.g. after its cached bars were deleted"""
+        self._versions.pop(key, None)
+        self._timestamps.pop(key, None)
+        self._sizes.pop(key, None)
+        self._floors[key] = version
@@ -0,0 +1,307 @@
+from itertools import count
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import asyncio
+import json
+import logging
+import os
+
+from backend.app.models.values import Tick
+from backend.app.services.data_cache import DataCacheService
+
+try:
+    import fcntl
+except ImportError:  # POSIX only; multi-process mode is unavailable elsewhere
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class CoherenceBus:
+    """Keeps the caches of several worker processes on one host coherent
+    
+    One process is elected ingest owner by holding an exclusive lock on a
+    lock file. It alone subscribes upstream and runs the background jobs,
+    and it serves a Unix socket the other workers connect to. Changes travel
+    as newline-delimited JSON records: the owner sends ticks and its cache
+    changes to every follower, and followers send their own cache changes
+    to the owner, which applies them and relays them to the other followers.
+    The data itself lives in the shared database, so records only carry
+    what the in-memory tiers need.
+    
+    Services whose state lives in the owner register a call handler, which
+    followers invoke through call(), and a record handler for the records
+    the owner broadcasts to keep their replicas current. Sync sources give
+    the records a newly connected follower needs to rebuild its replicas,
+    and connect callbacks run in a follower each time it reaches an owner.
+    
+    When the owner exits its lock is released and the first follower to
+    notice takes over. Followers that reconnect, or fall too far behind and
+    get dropped, clear their in-memory tiers since they may have missed
+    changes.
+    """
+    
+    def __init__(
+        self,
+        cache: DataCacheService,
+        socket_path: str,
+        lock_path: str,
+        reconnect_interval: float = 0.5,
+        max_buffer: int = 1 << 20
+    ):
+        self.cache = cache
+        self.socket_path = socket_path
+        self.lock_path = lock_path
+        self.reconnect_interval = reconnect_interval
+        self.max_buffer = max_buffer
+        self.role: Optional[str] = None
+        self.on_promote: Optional[Callable[[], Awaitable[None]]] = None
+        self.dropped_followers = 0
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._followers: Set[asyncio.StreamWriter] = set()
+        self._owner: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._call_handlers: Dict[str, Callable[[Any], Awaitable[Any]]] = {}
+        self._record_handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]] = {}
+        self._sync_sources: List[Callable[[], Dict[str, Any]]] = []
+        self._connect_callbacks: List[Callable[[], Awaitable[None]]] = []
+        self._callback_tasks: Set[asyncio.Task] = set()
+        self._pending_calls: Dict[int, asyncio.Future] = {}
+        self._call_ids = count(1)
+    
+    @property
+    def is_owner(self) -> bool:
+        return self.role == "owner"
+    
+    @property
+    def follower_count(self) -> int:
+        return len(self._followers)
+    
+    def handle_calls(self, kind: str, handler: Callable[[Any], Awaitable[Any]]) -> None:
+        """Register the owner-side handler run by call(kind, args)"""
+        self._call_handlers[kind] = handler
+    
+    def handle_records(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[None]]) -> None:
+        """Register the follower-side handler of broadcast records of a type"""
+        self._record_handlers[kind] = handler
+    
+    def add_sync_source(self, source: Callable[[], Dict[str, Any]]) -> None:
+        """Register a callback giving a record sent to each follower as it connects"""
+        self._sync_sources.append(source)
+    
+    def add_connect_callback(self, callback: Callable[[], Awaitable[None]]) -> None:
+        """Register a coroutine run in the background whenever this follower connects to an owner"""
+        self._connect_callbacks.append(callback)
+    
+    def try_acquire_ownership(self) -> bool:
+        """Take the ingest lock without blocking; True if this process holds it"""
+        if self._lock_fd is not None:
+            return True
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+    
+    async def start(self) -> None:
+        """Join the group as owner if the lock is free, otherwise as follower"""
+        if fcntl is None:
+            raise RuntimeError("Multi-process mode needs POSIX file locks and Unix sockets")
+        
+        for path in (self.socket_path, self.lock_path):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._loop = asyncio.get_running_loop()
+        self.cache.add_change_listener(self.publish)
+        
+        if self.try_acquire_ownership():
+            await self._serve()
+        else:
+            self.role = "follower"
+            self._task = asyncio.create_task(self._follow())
+        logger.info("Joined worker group as %s (pid %d)", self.role, os.getpid())
+    
+    async def _serve(self) -> None:
+        # Holding the lock means no other owner is alive, so a socket file
+        # left behind by a crashed owner can be removed
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_follower, path=self.socket_path)
+        self.role = "owner"
+    
+    async def _handle_follower(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Apply and relay changes sent by one follower until it disconnects"""
+        self._followers.add(writer)
+        for source in self._sync_sources:
+            writer.write(self._encode(source()))
+        try:
+            async for line in reader:
+                change = json.loads(line)
+                if change["type"] == "call":
+                    await self._answer(change, writer)
+                    continue
+                self.cache.apply_change(change)
+                self._send(change, exclude=writer)
+        except (ConnectionError, ValueError) as e:
+            logger.warning("Dropping follower connection: %s", e)
+        finally:
+            self._followers.discard(writer)
+            writer.close()
+    
+    async def _follow(self) -> None:
+        """Receive changes from the owner; take over when it goes away"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path)
+            except OSError:
+                writer = None
+            
+            if writer is not None:
+                self._owner = writer
+                # Run in the background, since they may call() the owner,
+                # whose replies are read by the loop below
+                for callback in self._connect_callbacks:
+                    task = asyncio.create_task(callback())
+                    self._callback_tasks.add(task)
+                    task.add_done_callback(self._callback_tasks.discard)
+                try:
+                    async for line in reader:
+                        await self._receive(json.loads(line))
+                except (ConnectionError, ValueError) as e:
+                    logger.warning("Connection to ingest owner failed: %s", e)
+                finally:
+                    self._owner = None
+                    writer.close()
+                    self._fail_pending_calls()
+                # Changes may have been missed while disconnected
+                self.cache.apply_change({"type": "invalidate", "symbols": None, "timeframe": None})
+            
+            if self.try_acquire_ownership():
+                await self._serve()
+                logger.info("Promoted to ingest owner (pid %d)", os.getpid())
+                if self.on_promote is not None:
+                    await self.on_promote()
+                return
+            await asyncio.sleep(self.reconnect_interval)
+    
+    async def _receive(self, change: Dict[str, Any]) -> None:
+        """Follower side: apply one record from the owner to the cache, then to its handler"""
+        kind = change["type"]
+        if kind == "reply":
+            future = self._pending_calls.pop(change["id"], None)
+            if future is not None and not future.done():
+                if "error" in change:
+                    future.set_exception(RuntimeError(change["error"]))
+                else:
+                    future.set_result(change["result"])
+            return
+        self.cache.apply_change(change)
+        if kind in self._record_handlers:
+            await self._record_handlers[kind](change)
+    
+    async def _answer(self, request: Dict[str, Any], writer: asyncio.StreamWriter) -> None:
+        """Owner side: run a follower's call and send the result back to it"""
+        reply: Dict[str, Any] = {"type": "reply", "id": request["id"]}
+        try:
+            reply["result"] = await self._call_handlers[request["kind"]](request["args"])
+        except Exception as e:
+            logger.exception("Call %s from a follower failed", request["kind"])
+            reply["error"] = str(e)
+        writer.write(self._encode(reply))
+    
+    def _fail_pending_calls(self) -> None:
+        for future in self._pending_calls.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Lost the connection to the ingest owner"))
+        self._pending_calls.clear()
+    
+    async def call(self, kind: str, args: Any) -> Any:
+        """Run a registered call handler in the ingest owner and return its result"""
+        if self.is_owner:
+            return await self._call_handlers[kind](args)
+        if self._owner is None:
+            raise ConnectionError("Not connected to the ingest owner")
+        call_id = next(self._call_ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending_calls[call_id] = future
+        self._owner.write(self._encode({"type": "call", "id": call_id, "kind": kind, "args": args}))
+        try:
+            return await future
+        finally:
+            self._pending_calls.pop(call_id, None)
+    
+    def broadcast(self, record: Dict[str, Any]) -> None:
+        """Owner side: send a record to every follower's record handler"""
+        if self.is_owner:
+            self._send(record)
+    
+    def publish(self, change: Dict[str, Any]) -> None:
+        """Cache change listener: send a local change to the rest of the group"""
+        if self._loop is not None and not self._on_loop():
+            # Writes made in worker threads (eviction) are sent from the loop,
+            # since the transports are not thread-safe
+            self._loop.call_soon_threadsafe(self.publish, change)
+            return
+        if self.is_owner:
+            self._send(change)
+        elif self._owner is not None:
+            self._owner.write(self._encode(change))
+    
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+    
+    async def publish_tick(self, tick: Tick) -> None:
+        """Tick stream listener: fan ticks out to the followers"""
+        if self.is_owner and self._followers:
+            self._send({"type": "tick", "tick": tick.to_dict()})
+    
+    def _send(self, change: Dict[str, Any], exclude: Optional[asyncio.StreamWriter] = None) -> None:
+        """Write a change to every follower, encoded once"""
+        line = self._encode(change)
+        for writer in list(self._followers):
+            if writer is exclude:
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                # A follower that cannot keep up is dropped; it resyncs on reconnect
+                logger.warning("Dropping follower that fell %d bytes behind", self.max_buffer)
+                self._followers.discard(writer)
+                writer.close()
+                self.dropped_followers += 1
+                continue
+            writer.write(line)
+    
+    @staticmethod
+    def _encode(change: Dict[str, Any]) -> bytes:
+        return json.dumps(change, default=str, separators=(",", ":")).encode() + b"\n"
+    
+    async def stop(self) -> None:
+        """Leave the group and release ownership"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._fail_pending_calls()
+        
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._followers):
+                writer.close()
+            self._followers.clear()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.role = None
@@ -1,16 +1,64 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Sequence, Tuple, TypeVar, Union
 from datetime import datetime, timedelta
+import asyncio
+import logging
+import time
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from sqlalchemy.engine import Row
+from sqlalchemy import and_, delete, desc, func, insert, select, update
 
-from backend.app.database import get_db_session
-from backend.app.models.market_data import KLineData, RealtimeData
-from backend.app.services.market_data import market_data_provider
+from backend.app.config import KLINE_STREAM_CHUNK_ROWS, REPLAY_SOURCE, SCAN_ENGINE, SCAN_ENGINE_MIN_ROWS
+from backend.app.database import ShardRouter, shard_router
+from backend.app.models.bar_batch import BarBatch
+from backend.app.models.market_data import KLineData, RealtimeData, SeriesSummary
+from backend.app.models.values import Bar, SeriesInfo, Tick
+from backend.app.services.change_index import ChangeIndex
+from backend.app.services.market_data import market_data_provider, TIMEFRAME_DURATIONS
+from backend.app.services.realtime import realtime_hub
+from backend.app.services.scan_engine import DuckDBScanEngine, ScanEngine, ScanEngineError, SQLiteScanEngine
+from backend.app.services.trading_calendar import calendar_for
+from backend.app.services.write_queue import WriteQueue
+
+# Raw columns read on the cache-hit path. Column keys match the KLineData
+# attribute names, so result rows can be used wherever a model instance is read.
+_kline_table = KLineData.__table__
+_KLINE_COLUMNS = (
+    _kline_table.c.id,
+    _kline_table.c.symbol,
+    _kline_table.c.timeframe,
+    _kline_table.c.timestamp,
+    _kline_table.c.open_price,
+    _kline_table.c.high_price,
+    _kline_table.c.low_price,
+    _kline_table.c.close_price,
+    _kline_table.c.volume,
+    _kline_table.c.created_at,
+    _kline_table.c.updated_at,
+)
+
+_realtime_table = RealtimeData.__table__
+_summary_table = SeriesSummary.__table__
+
+# Batch size for IN (...) lookups, kept under SQLite's bound parameter limit
+_IN_CLAUSE_BATCH = 500
+
+# Number of recent ticks kept per symbol in realtime_data
+_REALTIME_ROWS_PER_SYMBOL = 1000
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
 
 class DataCacheService:
-    """Service for caching and retrieving market data"""
+    """Service for caching and retrieving market data
+    
+    Storage is routed through a ShardRouter: each symbol's bars and ticks
+    live on one shard, so the per-symbol API is the same whether data sits
+    in one SQLite file or is spread across several.
+    """
     
-    def __init__(self):
+    def __init__(self, shards: Optional[ShardRouter] = None):
+        self.shards = shards or shard_router
         self.cache_duration = {
             "1m": timedelta(hours=1),
             "5m": timedelta(hours=6), 
@@ -18,6 +66,160 @@ class DataCacheService:
             "1h": timedelta(days=7),
             "1d": timedelta(days=30)
         }
+        
+        # Cache versions per (symbol, timeframe), bumped on every write. Series
+        # not written by this process report the boot version, which is unique
+        # per process, so versions never repeat across restarts.
+        self._last_version = 0
+        self._boot_version = self._next_version()
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self._written_at: Dict[Tuple[str, str], datetime] = {}
+        self.change_index = ChangeIndex(floor_version=self._boot_version)
+        
+        # Per-series read tracking, used to prioritize prefetching
+        self._last_access: Dict[Tuple[str, str], float] = {}
+        self._access_counts: Dict[Tuple[str, str], int] = {}
+        
+        # In-memory last-price table: last trade per symbol from the tick
+        # stream, and the close of the newest cached bar as fallback
+        self._last_trades: Dict[str, float] = {}
+        self._last_closes: Dict[str, Tuple[datetime, float]] = {}
+        
+        # Read-through copy of series_summary rows, updated after each write
+        self._summaries: Dict[Tuple[str, str], SeriesInfo] = {}
+        
+        # Engines for analytic range scans: SQLite for small ones, DuckDB over
+        # the same shard files for scans of scan_engine_min_rows bars or more
+        self.sqlite_scan_engine = SQLiteScanEngine(self.shards)
+        self.duckdb_scan_engine = DuckDBScanEngine(self.shards)
+        self.scan_engine_mode = SCAN_ENGINE
+        self.scan_engine_min_rows = SCAN_ENGINE_MIN_ROWS
+        
+        # Ticks from the stream are persisted in batches off the hot path,
+        # except replayed ones, which are already recorded or archived
+        self.tick_write_queue = WriteQueue(self._write_ticks)
+        self.persist_ticks = not REPLAY_SOURCE
+        
+        # Callbacks told about every change to cached data, used to keep the
+        # in-memory state of other worker processes coherent
+        self._change_listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    def _next_version(self) -> int:
+        """Return a new cache version, monotonically increasing across restarts"""
+        self._last_version = max(self._last_version + 1, time.time_ns() // 1000)
+        return self._last_version
+    
+    def add_change_listener(self, listener: Callable[[Dict[str, Any]], None]) -> None:
+        """Register a callback that receives a change record after every cache write"""
+        if listener not in self._change_listeners:
+            self._change_listeners.append(listener)
+    
+    def _emit(self, change: Dict[str, Any]) -> None:
+        for listener in list(self._change_listeners):
+            listener(change)
+    
+    def apply_change(self, change: Dict[str, Any]) -> None:
+        """Apply a change record from another process to the in-memory state
+        
+        The data itself is already in the shared database; only versions,
+        change history, freshness and the last-price table are updated here,
+        and nothing is re-emitted to the change listeners.
+        """
+        kind = change["type"]
+        if kind == "tick":
+            self.record_tick(Tick.from_dict(change["tick"]))
+        elif kind == "bars":
+            key = (change["symbol"], change["timeframe"])
+            version = change["version"]
+            if version > self.get_cache_version(*key):
+                self._last_version = max(self._last_version, version)
+            else:
+                # Keep versions increasing per series even if clocks disagree
+                version = self._next_version()
+            self._versions[key] = version
+            self.change_index.record(key, version, [datetime.fromisoformat(ts) for ts in change["timestamps"]])
+            self._written_at[key] = datetime.now()
+            # The writer's summary row is read back on the next lookup
+            self._summaries.pop(key, None)
+            newest, close = change["close"]
+            self._note_close(change["symbol"], datetime.fromisoformat(newest), close)
+        elif kind == "evict":
+            self._forget_series((change["symbol"], change["timeframe"]))
+        elif kind == "invalidate":
+            self._forget_symbols(change["symbols"], change["timeframe"])
+    
+    def get_cache_version(self, symbol: str, timeframe: str) -> int:
+        """Get the current cache version of a (symbol, timeframe) series"""
+        return self._versions.get((symbol, timeframe), self._boot_version)
+    
+    def is_cache_fresh(self, symbol: str, timeframe: str) -> bool:
+        """Check if this process wrote the series recently enough to serve it unchanged
+        
+        A series written before the market closed stays fresh until it opens again.
+        """
+        written_at = self._written_at.get((symbol, timeframe))
+        if written_at is None:
+            return False
+        cache_max_age = self.cache_duration.get(timeframe, timedelta(hours=1))
+        now = datetime.now()
+        return now - written_at <= cache_max_age or not calendar_for(symbol).has_session_between(written_at, now)
+    
+    def record_access(self, symbol: str, timeframe: str) -> None:
+        """Record a client read of a series"""
+        key = (symbol, timeframe)
+        self._last_access[key] = time.monotonic()
+        self._access_counts[key] = self._access_counts.get(key, 0) + 1
+    
+    def get_last_access(self, symbol: str, timeframe: str) -> float:
+        """Monotonic time of the last client read of a series, 0.0 if never read"""
+        return self._last_access.get((symbol, timeframe), 0.0)
+    
+    def get_access_count(self, symbol: str, timeframe: str) -> int:
+        """Number of client reads of a series since startup, or since the restored snapshot was taken"""
+        return self._access_counts.get((symbol, timeframe), 0)
+    
+    def snapshot_state(self) -> Dict[str, Any]:
+        """In-memory state worth keeping across a restart, in JSON-compatible form"""
+        now = time.monotonic()
+        return {
+            "versions": [[symbol, timeframe, version] for (symbol, timeframe), version in self._versions.items()],
+            "written_at": [[symbol, timeframe, written_at.isoformat()] for (symbol, timeframe), written_at in self._written_at.items()],
+            "last_trades": dict(self._last_trades),
+            "last_closes": {symbol: [timestamp.isoformat(), close] for symbol, (timestamp, close) in self._last_closes.items()},
+            # Monotonic times do not survive a restart, so reads are saved by age
+            "access": [
+                [symbol, timeframe, self._access_counts.get((symbol, timeframe), 0), now - last_access]
+                for (symbol, timeframe), last_access in self._last_access.items()
+            ]
+        }
+    
+    def restore_state(self, state: Dict[str, Any], clean: bool) -> None:
+        """Restore state saved by snapshot_state, without overriding anything newer
+    
+        Versions are only restored from a snapshot taken at a clean shutdown:
+        after a crash, writes made since the last periodic snapshot would be
+        hidden behind an old version. A restored version is also its series'
+        change-index floor, so clients holding it are told nothing changed
+        instead of reloading the series.
+        """
+        if clean:
+            for symbol, timeframe, version in state["versions"]:
+                key = (symbol, timeframe)
+                if key not in self._versions:
+                    self._versions[key] = version
+                    self.change_index.discard(key, version)
+                    self._last_version = max(self._last_version, version)
+        for symbol, timeframe, written_at in state["written_at"]:
+            self._written_at.setdefault((symbol, timeframe), datetime.fromisoformat(written_at))
+        for symbol, price in state["last_trades"].items():
+            self._last_trades.setdefault(symbol, price)
+        for symbol, (timestamp, close) in state["last_closes"].items():
+            self._note_close(symbol, datetime.fromisoformat(timestamp), close)
+        now = time.monotonic()
+        for symbol, timeframe, access_count, age in state["access"]:
+            key = (symbol, timeframe)
+            self._access_counts[key] = self._access_counts.get(key, 0) + access_count
+            self._last_access.setdefault(key, now - age)
     
     async def get_kline_data(
         self, 
@@ -26,16 +228,56 @@ class DataCacheService:
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None,
         use_cache: bool = True
-    ) -> List[Dict[str, Any]]:
-        """Get K-line data with caching"""
+    ) -> Union[BarBatch, List[Dict[str, Any]]]:
+        """Get K-line data with caching
+        
+        Cache hits are returned as a BarBatch; refreshed data is returned as
+        the provider delivered it, a BarBatch or a list of dictionaries.
+        """
+        
+        self.record_access(symbol, timeframe)
         
         if use_cache:
-            # Try to get data from cache first
-            cached_data = self._get_cached_kline_data(symbol, timeframe, start_time, end_time)
-            
-            # Check if we have sufficient cached data
-            if self._is_cache_sufficient(cached_data, start_time, end_time, timeframe):
-                return [item.to_dict() for item in cached_data]
+            # Decide from the series summary before reading any bars, so a
+            # miss costs one key lookup instead of a range scan
+            summary = self.get_series_summary(symbol, timeframe)
+            if self._is_cache_sufficient(summary, start_time, end_time, timeframe):
+                cached_data = self._get_cached_kline_data(symbol, timeframe, start_time, end_time)
+                if cached_data:
+                    return BarBatch.from_rows(cached_data)
+        
+        return await self.refresh_kline_data(symbol, timeframe, start_time, end_time)
+    
+    async def refresh_if_stale(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> None:
+        """Refresh a series from the provider when a full read would
+        
+        Delta reads only look at the change index, so they call this first
+        to pick up new and forming bars of series nobody else refreshes.
+        """
+        
+        if self.is_cache_fresh(symbol, timeframe):
+            return
+        summary = self.get_series_summary(symbol, timeframe)
+        if not self._is_cache_sufficient(summary, start_time, end_time, timeframe):
+            await self.refresh_kline_data(symbol, timeframe, start_time, end_time)
+    
+    async def refresh_kline_data(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Union[BarBatch, List[Dict[str, Any]]]:
+        """Fetch K-line data from the provider and cache it
+        
+        The provider enforces the upstream concurrency, rate and timeout limits.
+        """
         
         # Fetch fresh data from market data provider
         fresh_data = await market_data_provider.get_kline_data(
@@ -54,55 +296,129 @@ class DataCacheService:
         timeframe: str, 
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None
-    ) -> List[KLineData]:
-        """Retrieve cached K-line data from database"""
-        
-        with get_db_session() as session:
-            query = session.query(KLineData).filter(
-                and_(
-                    KLineData.symbol == symbol,
-                    KLineData.timeframe == timeframe
-                )
+    ) -> List[Row]:
+        """Retrieve cached K-line rows from database
+        
+        Selects raw column tuples through SQLAlchemy Core instead of loading
+        KLineData instances, so no ORM hydration or identity-map tracking
+        happens on the cache-hit path.
+        """
+        
+        stmt = select(*_KLINE_COLUMNS).where(
+            and_(
+                _kline_table.c.symbol == symbol,
+                _kline_table.c.timeframe == timeframe
             )
-            
-            if start_time:
-                query = query.filter(KLineData.timestamp >= start_time)
-            if end_time:
-                query = query.filter(KLineData.timestamp <= end_time)
-            
-            return query.order_by(KLineData.timestamp.asc()).all()
+        )
+        
+        if start_time:
+            stmt = stmt.where(_kline_table.c.timestamp >= start_time)
+        if end_time:
+            stmt = stmt.where(_kline_table.c.timestamp <= end_time)
+        
+        with self.shards.session(symbol) as session:
+            return session.execute(stmt.order_by(_kline_table.c.timestamp.asc())).all()
+    
+    def _read_kline_chunk(
+        self,
+        symbol: str,
+        timeframe: str,
+        after: Optional[datetime],
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        chunk_size: int
+    ) -> List[Row]:
+        """Up to chunk_size cached bars after a timestamp, or from start_time for the first chunk"""
+        
+        stmt = select(*_KLINE_COLUMNS).where(
+            and_(
+                _kline_table.c.symbol == symbol,
+                _kline_table.c.timeframe == timeframe
+            )
+        )
+        if after is not None:
+            stmt = stmt.where(_kline_table.c.timestamp > after)
+        elif start_time:
+            stmt = stmt.where(_kline_table.c.timestamp >= start_time)
+        if end_time:
+            stmt = stmt.where(_kline_table.c.timestamp <= end_time)
+        
+        with self.shards.session(symbol) as session:
+            return session.execute(stmt.order_by(_kline_table.c.timestamp.asc()).limit(chunk_size)).all()
+    
+    async def iter_kline_chunks(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        chunk_size: Optional[int] = None
+    ) -> AsyncIterator[BarBatch]:
+        """Yield cached K-line bars in time order, at most chunk_size at a time
+    
+        Each chunk is a separate keyset query continuing after the previous
+        chunk's last timestamp, run in a worker thread against the pooled
+        shard engine, so only one chunk is held in memory, no read
+        transaction stays open while the consumer is busy with a chunk and
+        the event loop is never blocked on a query.
+        """
+    
+        chunk_size = chunk_size or KLINE_STREAM_CHUNK_ROWS
+        self.record_access(symbol, timeframe)
+        after: Optional[datetime] = None
+        while True:
+            rows = await asyncio.to_thread(
+                self._read_kline_chunk, symbol, timeframe, after, start_time, end_time, chunk_size
+            )
+            if rows:
+                yield BarBatch.from_rows(rows)
+            if len(rows) < chunk_size:
+                return
+            after = rows[-1].timestamp
     
     def _is_cache_sufficient(
         self,
-        cached_data: List[KLineData],
+        summary: Optional[SeriesInfo],
         start_time: Optional[datetime],
         end_time: Optional[datetime],
         timeframe: str
     ) -> bool:
-        """Check if cached data is sufficient and not stale"""
+        """Check if a cached series covers a range and is not stale
+        
+        Judged from the series summary against the symbol's trading calendar:
+        data older than the cache duration is only stale if the market has
+        been open since it was last written, and the range only has to reach
+        the first and last bars that can exist within it, so closed periods
+        at either end (lunch breaks, nights, weekends, holidays) do not count
+        as missing data.
+        """
         
-        if not cached_data:
+        if summary is None:
             return False
         
+        calendar = calendar_for(summary.symbol)
+        
         # Check if cache is not too old
         cache_max_age = self.cache_duration.get(timeframe, timedelta(hours=1))
         now = datetime.now()
+        latest_cached = summary.updated_at
         
-        # Use created_at if available, otherwise use a recent timestamp
-        try:
-            latest_cached = max(item.created_at for item in cached_data if item.created_at)
-        except (ValueError, AttributeError):
-            # If no created_at, assume data is recent
-            return True
-        
-        if now - latest_cached > cache_max_age:
+        if now - latest_cached > cache_max_age and calendar.has_session_between(latest_cached, now):
             return False
         
-        # Check if we have the requested time range
-        if start_time and cached_data[0].timestamp > start_time:
-            return False
-        if end_time and cached_data[-1].timestamp < end_time:
-            return False
+        # Check if we have the requested time range, up to its tradable ends
+        if start_time:
+            first_bar = start_time
+            if timeframe in TIMEFRAME_DURATIONS:
+                first_bar = calendar.first_bar_at_or_after(start_time, timeframe) or start_time
+            if summary.first_time > first_bar:
+                return False
+        if end_time:
+            last_bar = end_time
+            if timeframe in TIMEFRAME_DURATIONS:
+                last_bar = calendar.last_bar_at_or_before(end_time, timeframe) or end_time
+            if summary.last_time < last_bar:
+                return False
         
         return True
     
@@ -110,46 +426,495 @@ class DataCacheService:
         self, 
         symbol: str, 
         timeframe: str, 
-        data: List[Dict[str, Any]]
+        data: Union[BarBatch, Sequence[Dict[str, Any]]]
     ) -> None:
-        """Cache K-line data to database"""
+        """Cache K-line data to database
+        
+        Bars are upserted by timestamp: new bars are inserted, bars whose values
+        changed are updated and identical bars are only marked as refreshed.
+        Inserted and updated timestamps are recorded in the change index under
+        a new cache version; a write that changes nothing keeps the version.
+        """
         
         if not data:
             return
         
-        with get_db_session() as session:
-            # Clear old data for this symbol/timeframe to avoid duplicates
-            session.query(KLineData).filter(
-                and_(
-                    KLineData.symbol == symbol,
-                    KLineData.timeframe == timeframe
-                )
-            ).delete()
+        now = datetime.now()
+        # Incoming bars are Bar values zipped from the batch columns; row
+        # dictionaries are only built for the bars that are inserted or updated
+        incoming = {bar.time: bar for bar in BarBatch.of(data).bars()}
+        
+        inserts, updates, summary = await self._run_write(
+            symbol, lambda: self._upsert_bars(symbol, timeframe, incoming, now)
+        )
+        
+        newest = max(incoming)
+        self._note_close(symbol, newest, incoming[newest].close)
+        
+        key = (symbol, timeframe)
+        self._written_at[key] = now
+        self._summaries[key] = summary
+        changed = sorted(item["timestamp"] for item in inserts + updates)
+        if changed:
+            version = self._next_version()
+            self._versions[key] = version
+            self.change_index.record(key, version, changed)
+            self._emit({
+                "type": "bars",
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "version": version,
+                "timestamps": [timestamp.isoformat() for timestamp in changed],
+                "close": [newest.isoformat(), incoming[newest].close]
+            })
+    
+    def _note_close(self, symbol: str, timestamp: datetime, close: float) -> None:
+        """Keep the close of the newest known bar as the fallback latest price"""
+        known = self._last_closes.get(symbol)
+        if known is None or timestamp >= known[0]:
+            self._last_closes[symbol] = (timestamp, close)
+    
+    def _upsert_bars(
+        self,
+        symbol: str,
+        timeframe: str,
+        incoming: Dict[datetime, Bar],
+        now: datetime
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], SeriesInfo]:
+        """Write bars keyed by timestamp and the series summary in one transaction
+        
+        Returns the inserted and updated rows and the new summary.
+        """
+        
+        series_filter = and_(
+            _kline_table.c.symbol == symbol,
+            _kline_table.c.timeframe == timeframe,
+            _kline_table.c.timestamp >= min(incoming),
+            _kline_table.c.timestamp <= max(incoming)
+        )
+        
+        with self.shards.session(symbol) as session:
+            existing = {
+                row.timestamp: row
+                for row in session.execute(select(*_KLINE_COLUMNS).where(series_filter))
+            }
+            
+            inserts = []
+            updates = []
+            for timestamp, bar in incoming.items():
+                row = existing.get(timestamp)
+                if row is None:
+                    inserts.append({
+                        "symbol": symbol,
+                        "timeframe": timeframe,
+                        "created_at": now,
+                        "updated_at": now,
+                        **bar.to_values()
+                    })
+                elif Bar.from_row(row) != bar:
+                    updates.append({"id": row.id, "updated_at": now, **bar.to_values()})
+            
+            if len(inserts) + len(updates) < len(incoming):
+                # Unchanged bars were re-confirmed by the provider
+                session.execute(update(_kline_table).where(series_filter).values(updated_at=now))
+            if inserts:
+                session.execute(insert(_kline_table), inserts)
+            if updates:
+                session.execute(update(KLineData), updates)
             
-            # Insert new data
-            for item in data:
-                kline = KLineData.from_market_data(symbol, timeframe, item)
-                session.add(kline)
+            summary = self._write_summary(session, symbol, timeframe, incoming, len(inserts), now)
+        
+        return inserts, updates, summary
+    
+    def _write_summary(
+        self,
+        session: Session,
+        symbol: str,
+        timeframe: str,
+        incoming: Dict[datetime, Bar],
+        inserted: int,
+        now: datetime
+    ) -> SeriesInfo:
+        """Fold a write into the series summary in the writer's open session"""
+        
+        key_filter = and_(_summary_table.c.symbol == symbol, _summary_table.c.timeframe == timeframe)
+        row = session.execute(select(_summary_table).where(key_filter)).first()
+        if row is None:
+            # First write of the series by the writer: take the aggregates
+            # from the stored bars, which may predate the summary table
+            summary = self._aggregate_series(session, symbol, timeframe)
+            session.execute(insert(_summary_table).values(**summary._asdict()))
+            return summary
+        
+        newest = max(incoming)
+        last_time, last_close = row.last_time, row.last_close
+        if newest >= last_time:
+            last_time, last_close = newest, incoming[newest].close
+        summary = SeriesInfo(
+            symbol,
+            timeframe,
+            min(row.first_time, min(incoming)),
+            last_time,
+            row.bar_count + inserted,
+            last_close,
+            now
+        )
+        session.execute(update(_summary_table).where(key_filter).values(**summary._asdict()))
+        return summary
+    
+    def _aggregate_series(self, session: Session, symbol: str, timeframe: str) -> Optional[SeriesInfo]:
+        """Summary of a series computed from its stored bars, None if it has none"""
+        
+        series_filter = and_(_kline_table.c.symbol == symbol, _kline_table.c.timeframe == timeframe)
+        first_time, last_time, bar_count, updated_at = session.execute(
+            select(
+                func.min(_kline_table.c.timestamp),
+                func.max(_kline_table.c.timestamp),
+                func.count(),
+                func.max(_kline_table.c.updated_at)
+            ).where(series_filter)
+        ).one()
+        if not bar_count:
+            return None
+        last_close = session.execute(
+            select(_kline_table.c.close_price).where(and_(series_filter, _kline_table.c.timestamp == last_time))
+        ).scalar()
+        return SeriesInfo(symbol, timeframe, first_time, last_time, bar_count, last_close, updated_at or last_time)
+    
+    async def _run_write(self, symbol: str, write: Callable[[], T]) -> T:
+        """Run a write on the writer of the symbol's shard
+        
+        A single database is written inline, as before. With several shards
+        each write runs in a worker thread under its shard's lock, so writes
+        to different shards proceed in parallel without blocking the event loop.
+        """
+        if not self.shards.is_sharded:
+            return write()
+        async with self.shards.write_locks[self.shards.shard_for(symbol)]:
+            return await asyncio.to_thread(write)
+    
+    def get_series_summary(self, symbol: str, timeframe: str) -> Optional[SeriesInfo]:
+        """First and last bar, bar count, last close and last write time of a cached series
+        
+        Served from memory, reading the summary row once per series; None if
+        nothing is cached.
+        """
+        
+        key = (symbol, timeframe)
+        summary = self._summaries.get(key)
+        if summary is None:
+            with self.shards.session(symbol) as session:
+                row = session.execute(
+                    select(_summary_table).where(
+                        and_(_summary_table.c.symbol == symbol, _summary_table.c.timeframe == timeframe)
+                    )
+                ).first()
+            if row is not None:
+                summary = self._summaries[key] = SeriesInfo.from_row(row)
+        return summary
+    
+    def list_series_summaries(self, symbol: Optional[str] = None) -> List[SeriesInfo]:
+        """Summaries of every cached series (of one symbol if given), read from all shards"""
+        
+        stmt = select(_summary_table)
+        if symbol is not None:
+            stmt = stmt.where(_summary_table.c.symbol == symbol)
+        shards = [self.shards.shard_for(symbol)] if symbol is not None else range(self.shards.shard_count)
+        
+        summaries = []
+        for shard in shards:
+            with self.shards.shard_session(shard) as session:
+                summaries.extend(SeriesInfo.from_row(row) for row in session.execute(stmt))
+        for summary in summaries:
+            self._summaries[(summary.symbol, summary.timeframe)] = summary
+        return sorted(summaries)
+    
+    def rebuild_series_summaries(self, only_if_missing: bool = False) -> int:
+        """Recompute the summaries of every shard from its bars; returns the number of series
+        
+        With only_if_missing, shards that already have summaries are left
+        alone, which is what startup uses to fill the table for a database
+        written before it existed.
+        """
+        
+        rebuilt = 0
+        for shard in range(self.shards.shard_count):
+            with self.shards.shard_session(shard) as session:
+                if only_if_missing and session.execute(select(_summary_table.c.symbol).limit(1)).first():
+                    continue
+                session.execute(delete(_summary_table))
+                keys = session.execute(
+                    select(_kline_table.c.symbol, _kline_table.c.timeframe).distinct()
+                ).all()
+                for symbol, timeframe in keys:
+                    summary = self._aggregate_series(session, symbol, timeframe)
+                    session.execute(insert(_summary_table).values(**summary._asdict()))
+                rebuilt += len(keys)
+        self._summaries.clear()
+        return rebuilt
+    
+    def find_gaps(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: datetime,
+        end_time: datetime
+    ) -> List[Tuple[datetime, datetime]]:
+        """Runs of bars missing from the cache that the trading calendar says can exist"""
+        
+        stmt = select(_kline_table.c.timestamp).where(
+            and_(
+                _kline_table.c.symbol == symbol,
+                _kline_table.c.timeframe == timeframe,
+                _kline_table.c.timestamp >= start_time,
+                _kline_table.c.timestamp <= end_time
+            )
+        )
+        with self.shards.session(symbol) as session:
+            timestamps = session.execute(stmt).scalars().all()
+        
+        return calendar_for(symbol).find_gaps(timestamps, start_time, end_time, timeframe)
+    
+    def estimate_scan_rows(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> int:
+        """Bars a range scan would read, from the series summaries assuming evenly spread bars"""
+        
+        total = 0
+        for symbol in symbols:
+            summary = self.get_series_summary(symbol, timeframe)
+            if summary is None or not summary.bar_count:
+                continue
+            first = max(summary.first_time, start_time) if start_time else summary.first_time
+            last = min(summary.last_time, end_time) if end_time else summary.last_time
+            if last < first:
+                continue
+            span = (summary.last_time - summary.first_time).total_seconds()
+            if span <= 0:
+                total += summary.bar_count
+            else:
+                total += round(summary.bar_count * (last - first).total_seconds() / span)
+        return total
+    
+    def choose_scan_engine(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> ScanEngine:
+        """The engine for a range scan: DuckDB for large scans unless it is known to be unavailable, SQLite otherwise
+        
+        Reads only in-memory state and never connects to DuckDB, so it is
+        cheap enough to call on the event loop before handing the scan to a
+        thread; a DuckDB connection that then fails falls back to SQLite.
+        """
+        
+        if self.scan_engine_mode == "sqlite":
+            return self.sqlite_scan_engine
+        if self.scan_engine_mode != "duckdb":
+            if self.estimate_scan_rows(symbols, timeframe, start_time, end_time) < self.scan_engine_min_rows:
+                return self.sqlite_scan_engine
+        if self.duckdb_scan_engine.ready:
+            return self.duckdb_scan_engine
+        return self.sqlite_scan_engine
+    
+    def _run_scan(
+        self,
+        engine: Optional[ScanEngine],
+        scan: Callable[[ScanEngine], T],
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> Tuple[ScanEngine, T]:
+        """Run a scan on the given or chosen engine, falling back to SQLite if DuckDB fails
+        
+        Returns the engine that produced the result along with it. A DuckDB
+        engine whose scan failed is suspended for its retry period, not
+        disabled; one that could not connect has already recorded why.
+        """
+        engine = engine or self.choose_scan_engine(symbols, timeframe, start_time, end_time)
+        if engine is self.sqlite_scan_engine:
+            return engine, scan(engine)
+        try:
+            return engine, scan(engine)
+        except ScanEngineError as e:
+            logger.warning("DuckDB scan failed, falling back to SQLite: %s", e)
+            if self.duckdb_scan_engine.unavailable_reason is None:
+                self.duckdb_scan_engine.suspend(str(e))
+            return self.sqlite_scan_engine, scan(self.sqlite_scan_engine)
+    
+    def scan_kline_data(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        engine: Optional[ScanEngine] = None
+    ) -> Dict[str, BarBatch]:
+        """Cached bars of many symbols over a range, one batch per symbol
+        
+        Reads only what is cached, without asking the provider for missing
+        bars. The engine is chosen by the estimated scan size unless given.
+        Blocking; run it in a thread from async code.
+        """
+        
+        return self._run_scan(
+            engine,
+            lambda scan_engine: scan_engine.scan(symbols, timeframe, start_time, end_time),
+            symbols, timeframe, start_time, end_time
+        )[1]
+    
+    def resample_kline_data(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        bucket: timedelta,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        engine: Optional[ScanEngine] = None
+    ) -> Dict[str, BarBatch]:
+        """Cached bars of many symbols merged into bars of a longer duration, one batch per symbol
+        
+        Buckets are aligned as AnalyticsPool.resample aligns them. Like
+        scan_kline_data, reads only cached bars and blocks.
+        """
+        
+        return self.resample_kline_data_with_engine(symbols, timeframe, bucket, start_time, end_time, engine)[1]
+    
+    def resample_kline_data_with_engine(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        bucket: timedelta,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        engine: Optional[ScanEngine] = None
+    ) -> Tuple[ScanEngine, Dict[str, BarBatch]]:
+        """resample_kline_data, also returning the engine that ran the scan after any fallback"""
+        
+        return self._run_scan(
+            engine,
+            lambda scan_engine: scan_engine.resample(symbols, timeframe, bucket, start_time, end_time),
+            symbols, timeframe, start_time, end_time
+        )
+    
+    def get_kline_changes(
+        self,
+        symbol: str,
+        timeframe: str,
+        since_version: int,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Optional[BarBatch]:
+        """Get bars inserted or updated after a cache version
+        
+        Returns None when the version predates the change index, in which case
+        the caller has to resend the full series.
+        """
+        
+        changed = self.change_index.changed_since((symbol, timeframe), since_version)
+        if changed is None:
+            return None
+        
+        if start_time:
+            changed = [timestamp for timestamp in changed if timestamp >= start_time]
+        if end_time:
+            changed = [timestamp for timestamp in changed if timestamp <= end_time]
+        
+        rows = []
+        with self.shards.session(symbol) as session:
+            for offset in range(0, len(changed), _IN_CLAUSE_BATCH):
+                stmt = select(*_KLINE_COLUMNS).where(
+                    and_(
+                        _kline_table.c.symbol == symbol,
+                        _kline_table.c.timeframe == timeframe,
+                        _kline_table.c.timestamp.in_(changed[offset:offset + _IN_CLAUSE_BATCH])
+                    )
+                ).order_by(_kline_table.c.timestamp.asc())
+                rows.extend(session.execute(stmt).all())
+        
+        return BarBatch.from_rows(rows)
+    
+    def record_tick(self, tick: Tick) -> None:
+        """Update the in-memory last-price table from a tick"""
+        self._last_trades[tick.symbol] = tick.price
+    
+    async def enqueue_tick(self, tick: Tick) -> None:
+        """Tick stream listener: update the last-price table now and persist the tick in the next batch"""
+        self.record_tick(tick)
+        if self.persist_ticks:
+            self.tick_write_queue.put(tick)
     
     async def cache_realtime_data(self, data: Dict[str, Any]) -> None:
         """Cache real-time tick data"""
         
-        with get_db_session() as session:
-            realtime = RealtimeData.from_tick_data(data)
-            session.add(realtime)
+        tick = Tick.of(data)
+        self.record_tick(tick)
+        await self._write_ticks([tick])
+    
+    async def _write_ticks(self, ticks: List[Tick]) -> None:
+        """Insert a batch of ticks and trim each symbol to its most recent rows
+        
+        The batch is split by shard and the shards are written concurrently.
+        """
+        
+        by_shard: Dict[int, List[Dict[str, Any]]] = {}
+        for tick in ticks:
+            by_shard.setdefault(self.shards.shard_for(tick.symbol), []).append(tick.to_row())
+        
+        await asyncio.gather(*(
+            self._run_write(rows[0]["symbol"], lambda rows=rows: self._insert_ticks(rows))
+            for rows in by_shard.values()
+        ))
+    
+    def _insert_ticks(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert tick rows that all belong to one shard"""
+        
+        with self.shards.session(rows[0]["symbol"]) as session:
+            session.execute(insert(_realtime_table), rows)
             
             # Clean up old real-time data (keep only last 1000 records per symbol)
-            old_data = session.query(RealtimeData).filter(
-                RealtimeData.symbol == data["symbol"]
-            ).order_by(desc(RealtimeData.timestamp)).offset(1000).all()
-            
-            for item in old_data:
-                session.delete(item)
+            for symbol in {row["symbol"] for row in rows}:
+                keep = select(_realtime_table.c.id).where(
+                    _realtime_table.c.symbol == symbol
+                ).order_by(desc(_realtime_table.c.timestamp)).limit(_REALTIME_ROWS_PER_SYMBOL)
+                session.execute(
+                    delete(_realtime_table).where(
+                        and_(_realtime_table.c.symbol == symbol, _realtime_table.c.id.not_in(keep))
+                    )
+                )
     
     def get_latest_price(self, symbol: str) -> Optional[float]:
-        """Get the latest cached price for a symbol"""
+        """Get the latest cached price for a symbol
+        
+        Answered from the in-memory last-price table; only symbols that have
+        neither ticked nor been cached by this process fall back to SQLite.
+        """
         
-        with get_db_session() as session:
+        price = self._last_trades.get(symbol)
+        if price is not None:
+            return price
+        
+        last_close = self._last_closes.get(symbol)
+        if last_close is not None:
+            return last_close[1]
+        
+        return self._get_stored_latest_price(symbol)
+    
+    def get_latest_prices(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        """Get the latest cached prices for many symbols at once"""
+        return {symbol: self.get_latest_price(symbol) for symbol in symbols}
+    
+    def _get_stored_latest_price(self, symbol: str) -> Optional[float]:
+        """Get the latest price for a symbol from the database"""
+        
+        with self.shards.session(symbol) as session:
             # Try real-time data first
             latest_realtime = session.query(RealtimeData).filter(
                 RealtimeData.symbol == symbol
@@ -157,32 +922,170 @@ class DataCacheService:
             
             if latest_realtime:
                 return latest_realtime.price
+        
+        # Fall back to the close of the newest cached bar of any timeframe
+        summaries = [self.get_series_summary(symbol, timeframe) for timeframe in TIMEFRAME_DURATIONS]
+        summaries = [summary for summary in summaries if summary is not None]
+        if summaries:
+            return max(summaries, key=lambda summary: summary.last_time).last_close
+        
+        return None
+    
+    def get_series_sizes(self) -> Dict[Tuple[str, str], int]:
+        """Number of cached bars per (symbol, timeframe)"""
+        return {(summary.symbol, summary.timeframe): summary.bar_count for summary in self.list_series_summaries()}
+    
+    def evict_oldest_bars(self, symbol: str, timeframe: str, count: int) -> int:
+        """Delete the oldest bars of a series with a single range delete"""
+        deleted, emptied = self.delete_oldest_bars(symbol, timeframe, count)
+        self.forget_evicted_bars(symbol, timeframe, emptied)
+        return deleted
+    
+    def delete_oldest_bars(self, symbol: str, timeframe: str, count: int) -> Tuple[int, bool]:
+        """Range-delete the oldest bars of a series from the store only
+        
+        Returns the number of deleted bars and whether the series is gone.
+        Touches no in-memory state, so it may run in a worker thread; the
+        caller applies forget_evicted_bars on the event loop afterwards.
+        """
+        
+        series_filter = and_(_kline_table.c.symbol == symbol, _kline_table.c.timeframe == timeframe)
+        summary_filter = and_(_summary_table.c.symbol == symbol, _summary_table.c.timeframe == timeframe)
+        
+        with self.shards.session(symbol) as session:
+            cutoff = session.execute(
+                select(_kline_table.c.timestamp).where(series_filter)
+                .order_by(_kline_table.c.timestamp.asc()).offset(count - 1).limit(1)
+            ).scalar()
+            if cutoff is None:
+                deleted = session.execute(delete(_kline_table).where(series_filter)).rowcount
+                session.execute(delete(_summary_table).where(summary_filter))
+                return deleted, True
+            deleted = session.execute(
+                delete(_kline_table).where(and_(series_filter, _kline_table.c.timestamp <= cutoff))
+            ).rowcount
+            first_time = session.execute(
+                select(_kline_table.c.timestamp).where(series_filter)
+                .order_by(_kline_table.c.timestamp.asc()).limit(1)
+            ).scalar()
+            if first_time is None:
+                session.execute(delete(_summary_table).where(summary_filter))
+            else:
+                session.execute(
+                    update(_summary_table).where(summary_filter)
+                    .values(first_time=first_time, bar_count=_summary_table.c.bar_count - deleted)
+                )
+        return deleted, False
+    
+    def forget_evicted_bars(self, symbol: str, timeframe: str, emptied: bool) -> None:
+        """Update the in-memory state after delete_oldest_bars"""
+        key = (symbol, timeframe)
+        if emptied:
+            self._forget_series(key)
+        else:
+            self._summaries.pop(key, None)
+            # The remaining bars did not change, but deletions cannot be expressed
+            # as deltas, so clients holding older versions must resync
+            version = self._next_version()
+            self._versions[key] = version
+            self.change_index.discard(key, version)
+        self._emit({"type": "evict", "symbol": symbol, "timeframe": timeframe})
+    
+    def invalidate(
+        self,
+        symbols: Optional[List[str]] = None,
+        timeframe: Optional[str] = None
+    ) -> Dict[str, int]:
+        """Drop cached data for symbols (all when None) from every cache tier
+        
+        Deletes K-line bars, and ticks unless a single timeframe is given,
+        from SQLite; clears the in-memory last-price table and access stats;
+        and moves the affected series to new cache versions so ETags and
+        delta-sync clients see the change.
+        """
+        
+        if symbols is None:
+            shard_symbols = {shard: None for shard in range(self.shards.shard_count)}
+        else:
+            shard_symbols = {}
+            for symbol in symbols:
+                shard_symbols.setdefault(self.shards.shard_for(symbol), []).append(symbol)
+        
+        deleted_bars = 0
+        deleted_ticks = 0
+        for shard, selected in shard_symbols.items():
+            kline_filter = []
+            summary_filter = []
+            realtime_filter = []
+            if selected is not None:
+                kline_filter.append(_kline_table.c.symbol.in_(selected))
+                summary_filter.append(_summary_table.c.symbol.in_(selected))
+                realtime_filter.append(_realtime_table.c.symbol.in_(selected))
+            if timeframe is not None:
+                kline_filter.append(_kline_table.c.timeframe == timeframe)
+                summary_filter.append(_summary_table.c.timeframe == timeframe)
             
-            # Fall back to latest K-line close price
-            latest_kline = session.query(KLineData).filter(
-                KLineData.symbol == symbol
-            ).order_by(desc(KLineData.timestamp)).first()
-            
-            if latest_kline:
-                return latest_kline.close_price
-            
-            return None
+            with self.shards.shard_session(shard) as session:
+                deleted_bars += session.execute(delete(_kline_table).where(*kline_filter)).rowcount
+                session.execute(delete(_summary_table).where(*summary_filter))
+                if timeframe is None:
+                    deleted_ticks += session.execute(delete(_realtime_table).where(*realtime_filter)).rowcount
+        
+        self._forget_symbols(symbols, timeframe)
+        self._emit({"type": "invalidate", "symbols": symbols, "timeframe": timeframe})
+        
+        return {"bars": deleted_bars, "ticks": deleted_ticks}
+    
+    def _forget_symbols(self, symbols: Optional[List[str]], timeframe: Optional[str]) -> None:
+        """Clear the in-memory tiers of invalidated symbols (all when None)"""
+        affected_symbols = set(symbols) if symbols is not None else (
+            {key[0] for key in self._versions} | {key[0] for key in self._summaries}
+            | set(self._last_trades) | set(self._last_closes)
+        )
+        for symbol in affected_symbols:
+            if timeframe is None:
+                self._last_trades.pop(symbol, None)
+            self._last_closes.pop(symbol, None)
+            for tf in [timeframe] if timeframe else TIMEFRAME_DURATIONS:
+                self._forget_series((symbol, tf))
+        
+        if symbols is None:
+            # Series this process never saw fall back to the boot version
+            self._boot_version = self._next_version()
+    
+    def _forget_series(self, key: Tuple[str, str]) -> None:
+        """Move a series to a new version and drop its change history, summary, freshness and access stats"""
+        version = self._next_version()
+        self._versions[key] = version
+        self.change_index.discard(key, version)
+        self._summaries.pop(key, None)
+        self._written_at.pop(key, None)
+        self._last_access.pop(key, None)
+        self._access_counts.pop(key, None)
     
     def cleanup_old_data(self, days_to_keep: int = 30) -> None:
         """Clean up old cached data"""
         
         cutoff_date = datetime.now() - timedelta(days=days_to_keep)
         
-        with get_db_session() as session:
-            # Clean up old K-line data
-            session.query(KLineData).filter(
-                KLineData.timestamp < cutoff_date
-            ).delete()
-            
-            # Clean up old real-time data
-            session.query(RealtimeData).filter(
-                RealtimeData.timestamp < cutoff_date
-            ).delete()
+        for shard in range(self.shards.shard_count):
+            with self.shards.shard_session(shard) as session:
+                # Clean up old K-line data
+                session.query(KLineData).filter(
+                    KLineData.timestamp < cutoff_date
+                ).delete()
+                
+                # Clean up old real-time data
+                session.query(RealtimeData).filter(
+                    RealtimeData.timestamp < cutoff_date
+                ).delete()
+        
+        # Old bars were cut from every series
+        self.rebuild_series_summaries()
 
 # Global instance
-data_cache_service = DataCacheService()
\ No newline at end of file
+data_cache_service = DataCacheService()
+
+# Persist ticks and keep the last-price table current from the tick stream;
+# ticks relayed from the ingest owner are already persisted by it
+realtime_hub.add_listener(data_cache_service.enqueue_tick, relayed=False)
\ No newline at end of file
@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from backend.app.database import shard_router
+from backend.app.services.data_cache import DataCacheService
+
+logger = logging.getLogger(__name__)
+
+EVICTION_POLICIES = ("lru", "lfu")
+
+class CacheEvictor:
+    """Keeps the SQLite K-line cache within a size budget
+    
+    When the cache holds more than max_bars bars, series are evicted until
+    it is back under target_ratio of the budget. Victims are chosen by
+    least recent client read ("lru") or fewest reads ("lfu", ties broken by
+    recency); series never read since startup go first. Each victim loses
+    its oldest bars in one range delete, or the whole series when more must
+    go than it holds. Protected series (the watchlist) are never evicted.
+    Freed pages are returned with an incremental vacuum.
+    """
+    
+    def __init__(
+        self,
+        cache: DataCacheService,
+        max_bars: int,
+        policy: str = "lru",
+        target_ratio: float = 0.9,
+        interval: float = 60.0,
+        protected: Optional[Set[Tuple[str, str]]] = None
+    ):
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy {policy!r}, expected one of {EVICTION_POLICIES}")
+        self.cache = cache
+        self.max_bars = max_bars
+        self.policy = policy
+        self.target_ratio = target_ratio
+        self.interval = interval
+        self.protected = protected or set()
+        self._task: Optional[asyncio.Task] = None
+    
+    def victims(self, sizes: Dict[Tuple[str, str], int]) -> List[Tuple[str, str]]:
+        """Evictable series in eviction order"""
+        candidates = [key for key in sizes if key not in self.protected]
+        if self.policy == "lfu":
+            return sorted(candidates, key=lambda key: (self.cache.get_access_count(*key), self.cache.get_last_access(*key)))
+        return sorted(candidates, key=lambda key: self.cache.get_last_access(*key))
+    
+    def evict_once(self) -> int:
+        """Evict until the cache fits the budget; returns the number of deleted bars"""
+        deleted, evicted = self.delete_excess()
+        self.forget(evicted)
+        return deleted
+    
+    def delete_excess(self) -> Tuple[int, List[Tuple[str, str, bool]]]:
+        """Delete bars from the store until it fits the budget, without touching in-memory state
+        
+        Returns the number of deleted bars and the evicted series, each with
+        whether it was removed entirely, for forget() to apply.
+        """
+        sizes = self.cache.get_series_sizes()
+        total = sum(sizes.values())
+        if total <= self.max_bars:
+            return 0, []
+        
+        excess = total - int(self.max_bars * self.target_ratio)
+        deleted = 0
+        evicted = []
+        for symbol, timeframe in self.victims(sizes):
+            if deleted >= excess:
+                break
+            count, emptied = self.cache.delete_oldest_bars(symbol, timeframe, min(excess - deleted, sizes[(symbol, timeframe)]))
+            deleted += count
+            evicted.append((symbol, timeframe, emptied))
+        
+        logger.info("Evicted %d of %d cached bars", deleted, total)
+        self.vacuum()
+        return deleted, evicted
+    
+    def forget(self, evicted: List[Tuple[str, str, bool]]) -> None:
+        """Apply evictions to the cache's versions, change index and summaries"""
+        for symbol, timeframe, emptied in evicted:
+            self.cache.forget_evicted_bars(symbol, timeframe, emptied)
+    
+    def vacuum(self) -> None:
+        """Return free pages to the OS; a no-op unless auto_vacuum is INCREMENTAL"""
+        for engine in shard_router.engines:
+            if engine.dialect.name != "sqlite":
+                continue
+            with engine.connect() as connection:
+                connection.execute(text("PRAGMA incremental_vacuum"))
+                connection.commit()
+    
+    async def run(self) -> None:
+        """Check the budget every interval until cancelled"""
+        while True:
+            try:
+                # Range deletes and the vacuum block, so they run in a worker
+                # thread; the in-memory state is only changed here on the loop
+                deleted, evicted = await asyncio.to_thread(self.delete_excess)
+                self.forget(evicted)
+            except Exception:
+                logger.exception("Cache eviction failed")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """Start the background eviction task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+    
+    async def stop(self) -> None:
+        """Cancel the background eviction task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
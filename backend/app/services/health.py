@@ -0,0 +1,142 @@
+from typing import Any, Dict, Optional
+from datetime import datetime
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+
+from backend.app.config import HEALTH_CHECK_INTERVAL_SECONDS, DEEP_HEALTH_MIN_INTERVAL_SECONDS
+from backend.app.database import get_db_session
+from backend.app.services.data_cache import data_cache_service
+from backend.app.services.market_data import market_data_provider
+
+logger = logging.getLogger(__name__)
+
+class HealthMonitor:
+    """Background-maintained health status for readiness probes
+    
+    A background task periodically records provider connectivity, a trivial
+    database round-trip and the tick write queue state. Readiness probes read
+    that snapshot and never touch the provider or write to the cache. If the
+    snapshot is missing or stale (e.g. the task is not running), it is
+    refreshed inline, which costs one SELECT 1.
+    
+    The deep check calls the provider directly, without caching the result,
+    and runs at most once per deep_min_interval; probes in between get the
+    previous result.
+    """
+    
+    def __init__(
+        self,
+        interval: float = 5.0,
+        deep_min_interval: float = 60.0,
+        deep_symbol: str = "000001",
+        deep_timeout: float = 10.0
+    ):
+        self.interval = interval
+        self.deep_min_interval = deep_min_interval
+        self.deep_symbol = deep_symbol
+        self.deep_timeout = deep_timeout
+        self.started = False
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._checked_at = 0.0
+        self._deep_result: Optional[Dict[str, Any]] = None
+        self._deep_checked_at = 0.0
+        self._deep_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+    
+    def check(self) -> Dict[str, Any]:
+        """Run the cheap checks and store the result as the current snapshot"""
+        provider_connected = bool(market_data_provider.is_connected)
+        
+        started = time.perf_counter()
+        try:
+            with get_db_session() as session:
+                session.execute(text("SELECT 1"))
+            database_ok = True
+            database_error = None
+        except Exception as e:
+            database_ok = False
+            database_error = str(e)
+        database_latency = round((time.perf_counter() - started) * 1000, 2)
+        
+        queue = data_cache_service.tick_write_queue
+        self._snapshot = {
+            "provider_connected": provider_connected,
+            "database_ok": database_ok,
+            "database_error": database_error,
+            "database_latency_ms": database_latency,
+            "write_queue_running": queue.is_running,
+            "write_queue_depth": queue.depth,
+            "write_queue_dropped": queue.dropped,
+            "checked_at": datetime.now().isoformat()
+        }
+        self._checked_at = time.monotonic()
+        return self._snapshot
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Latest status, refreshed inline only when it is older than 3 intervals"""
+        if self._snapshot is None or time.monotonic() - self._checked_at > self.interval * 3:
+            return self.check()
+        return self._snapshot
+    
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness verdict built from the snapshot"""
+        snapshot = self.snapshot()
+        ready = self.started and snapshot["provider_connected"] and snapshot["database_ok"]
+        return {"ready": ready, "started": self.started, **snapshot}
+    
+    async def deep_check(self) -> Dict[str, Any]:
+        """Fetch sample data from the provider, at most once per deep_min_interval"""
+        async with self._deep_lock:
+            age = time.monotonic() - self._deep_checked_at
+            if self._deep_result is not None and age < self.deep_min_interval:
+                return {**self._deep_result, "cached": True}
+            
+            started = time.perf_counter()
+            try:
+                sample = await asyncio.wait_for(
+                    market_data_provider.get_kline_data(self.deep_symbol, "1m"),
+                    self.deep_timeout
+                )
+                result = {"provider_ok": len(sample) > 0, "sample_size": len(sample), "error": None}
+            except Exception as e:
+                result = {"provider_ok": False, "sample_size": 0, "error": str(e) or type(e).__name__}
+            
+            result["provider_latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            result["checked_at"] = datetime.now().isoformat()
+            self._deep_result = result
+            self._deep_checked_at = time.monotonic()
+            return {**result, "cached": False}
+    
+    async def run(self) -> None:
+        """Refresh the snapshot every interval until cancelled"""
+        while True:
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Health check failed")
+            await asyncio.sleep(self.interval)
+    
+    def start(self) -> None:
+        """Start the background refresh task"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+    
+    async def stop(self) -> None:
+        """Cancel the background refresh task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+# Global instance
+health_monitor = HealthMonitor(
+    interval=HEALTH_CHECK_INTERVAL_SECONDS,
+    deep_min_interval=DEEP_HEALTH_MIN_INTERVAL_SECONDS
+)
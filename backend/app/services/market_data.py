@@ -1,8 +1,60 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Awaitable, Callable, Optional, Sequence, TypeVar
+from datetime import datetime, timedelta
 import asyncio
+import logging
 import random
+import time
+
+from backend.app.config import (
+    MOCK_TICK_RATE,
+    REPLAY_END,
+    REPLAY_SOURCE,
+    REPLAY_SPEED,
+    REPLAY_START,
+    REPLAY_SYMBOLS,
+    UPSTREAM_CONCURRENCY,
+    UPSTREAM_MAX_CONCURRENCY,
+    UPSTREAM_MAX_QUEUE,
+    UPSTREAM_LATENCY_TARGET_SECONDS,
+    UPSTREAM_RATE_PER_SECOND,
+    UPSTREAM_BURST,
+    UPSTREAM_TIMEOUT_SECONDS,
+    UPSTREAM_RETRY_ATTEMPTS,
+    UPSTREAM_CIRCUIT_FAILURES,
+    UPSTREAM_CIRCUIT_RESET_SECONDS,
+)
+from backend.app.models.bar_batch import BarBatch
+from backend.app.models.values import Tick
+from backend.app.services.resilience import (
+    AdaptiveLimiter,
+    CallMetrics,
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    TokenBucket,
+    UpstreamError,
+    UpstreamTimeoutError,
+)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bar length of each supported timeframe
+TIMEFRAME_DURATIONS = {
+    "1m": timedelta(minutes=1),
+    "5m": timedelta(minutes=5),
+    "15m": timedelta(minutes=15),
+    "1h": timedelta(hours=1),
+    "1d": timedelta(days=1),
+}
+
+def align_to_bar(timestamp: datetime, timeframe: str) -> datetime:
+    """Floor a timestamp to the start of the bar that contains it"""
+    duration = TIMEFRAME_DURATIONS[timeframe]
+    elapsed = timestamp - datetime.min
+    return timestamp - (elapsed % duration)
 
 class MarketDataProvider(ABC):
     """Abstract base class for market data providers"""
@@ -14,21 +66,35 @@ class MarketDataProvider(ABC):
         timeframe: str, 
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None
-    ) -> List[Dict[str, Any]]:
-        """Get K-line (candlestick) data"""
+    ) -> Sequence[Dict[str, Any]]:
+        """Get K-line (candlestick) data
+        
+        Bars may be returned as a list of time/open/high/low/close/volume
+        dictionaries or, preferably, as a columnar BarBatch.
+        """
         pass
     
     @abstractmethod
     async def subscribe_realtime_data(self, symbol: str, callback) -> None:
-        """Subscribe to real-time market data"""
+        """Subscribe to real-time market data
+        
+        The callback is awaited with each tick, as a Tick or a dictionary
+        with symbol, price, volume and timestamp keys.
+        """
+        pass
+    
+    async def unsubscribe_realtime_data(self, symbol: str) -> None:
+        """Stop delivering a symbol's ticks; providers without unsubscribe keep streaming"""
         pass
 
 class MockMarketDataProvider(MarketDataProvider):
     """Mock implementation for development and testing"""
     
-    def __init__(self):
+    def __init__(self, tick_rate: float = MOCK_TICK_RATE):
         self.is_connected = False
         self.subscriptions = {}
+        # Ticks per second per subscribed symbol
+        self.tick_rate = tick_rate
     
     async def connect(self) -> bool:
         """Mock connection to market data"""
@@ -47,16 +113,25 @@ class MockMarketDataProvider(MarketDataProvider):
         timeframe: str, 
         start_time: Optional[datetime] = None,
         end_time: Optional[datetime] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> BarBatch:
         """Generate mock K-line data"""
         if not self.is_connected:
             raise ConnectionError("Not connected to market data provider")
         
-        # Generate sample data based on timeframe
+        # Generate consecutive bars covering the requested range,
+        # or the latest 100 bars when no start time is given
         data_points = 100
         base_price = 100.0
+        bar_timeframe = timeframe if timeframe in TIMEFRAME_DURATIONS else "1m"
+        duration = TIMEFRAME_DURATIONS[bar_timeframe]
+        last_bar = align_to_bar(end_time or datetime.now(), bar_timeframe)
+        if start_time:
+            first_bar = align_to_bar(start_time, bar_timeframe)
+            data_points = max(int((last_bar - first_bar) / duration) + 1, 0)
+        else:
+            first_bar = last_bar - duration * (data_points - 1)
         
-        kline_data = []
+        kline_data = BarBatch()
         for i in range(data_points):
             # Simulate price movement
             open_price = base_price + random.uniform(-5, 5)
@@ -65,14 +140,14 @@ class MockMarketDataProvider(MarketDataProvider):
             low_price = min(open_price, close_price) - random.uniform(0, 2)
             volume = random.randint(1000, 10000)
             
-            kline_data.append({
-                "time": f"2023-12-{i+1:02d}",
-                "open": round(open_price, 2),
-                "high": round(high_price, 2),
-                "low": round(low_price, 2),
-                "close": round(close_price, 2),
-                "volume": volume
-            })
+            kline_data.append(
+                first_bar + duration * i,
+                round(open_price, 2),
+                round(high_price, 2),
+                round(low_price, 2),
+                round(close_price, 2),
+                volume
+            )
             
             base_price = close_price
         
@@ -88,28 +163,176 @@ class MockMarketDataProvider(MarketDataProvider):
         # Start mock data streaming
         asyncio.create_task(self._stream_mock_data(symbol, callback))
     
+    async def unsubscribe_realtime_data(self, symbol: str) -> None:
+        self.subscriptions.pop(symbol, None)
+    
     async def _stream_mock_data(self, symbol: str, callback):
-        """Stream mock real-time data"""
+        """Stream mock real-time data until the symbol is unsubscribed or resubscribed"""
         base_price = 100.0
         
-        while symbol in self.subscriptions and self.is_connected:
+        while self.subscriptions.get(symbol) is callback and self.is_connected:
             # Generate real-time tick data
             price_change = random.uniform(-0.5, 0.5)
             new_price = base_price + price_change
             volume = random.randint(100, 1000)
             
-            tick_data = {
-                "symbol": symbol,
-                "price": round(new_price, 2),
-                "volume": volume,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            await callback(tick_data)
+            await callback(Tick(symbol, round(new_price, 2), volume, datetime.now()))
             base_price = new_price
             
-            # Wait 1 second between updates
-            await asyncio.sleep(1.0)
+            await asyncio.sleep(1.0 / self.tick_rate)
+
+class ResilientProvider(MarketDataProvider):
+    """Wraps a provider with concurrency, rate, timeout, retry and circuit limits
+    
+    Every upstream call passes the circuit breaker, takes a token from the
+    rate limiter and a slot from the adaptive concurrency limiter, and runs
+    under a timeout. Timeouts and connection errors count as upstream
+    failures: they shrink the concurrency limit, feed the circuit breaker
+    and are retried with jittered backoff, except for subscriptions, which
+    may have registered upstream before failing. Other errors are passed
+    through unchanged and leave the circuit as it was. Latency and error counters are kept per operation.
+    """
+    
+    # Errors that indicate an unhealthy upstream and are worth retrying
+    RETRYABLE = (asyncio.TimeoutError, ConnectionError, OSError)
+    
+    def __init__(
+        self,
+        provider: MarketDataProvider,
+        limiter: Optional[AdaptiveLimiter] = None,
+        bucket: Optional[TokenBucket] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry: Optional[RetryPolicy] = None,
+        timeout: float = UPSTREAM_TIMEOUT_SECONDS
+    ):
+        self.provider = provider
+        self.limiter = limiter or AdaptiveLimiter(
+            initial_limit=UPSTREAM_CONCURRENCY,
+            max_limit=max(UPSTREAM_MAX_CONCURRENCY, UPSTREAM_CONCURRENCY),
+            latency_target=UPSTREAM_LATENCY_TARGET_SECONDS,
+            max_queue=UPSTREAM_MAX_QUEUE
+        )
+        self.bucket = bucket or TokenBucket(UPSTREAM_RATE_PER_SECOND, UPSTREAM_BURST)
+        self.breaker = breaker or CircuitBreaker(UPSTREAM_CIRCUIT_FAILURES, UPSTREAM_CIRCUIT_RESET_SECONDS)
+        self.retry = retry or RetryPolicy(UPSTREAM_RETRY_ATTEMPTS)
+        self.timeout = timeout
+        self.metrics: Dict[str, CallMetrics] = {}
+    
+    @property
+    def is_connected(self) -> bool:
+        return self.provider.is_connected
+    
+    async def connect(self) -> bool:
+        return await asyncio.wait_for(self.provider.connect(), self.timeout)
+    
+    async def disconnect(self) -> None:
+        await self.provider.disconnect()
+    
+    async def get_kline_data(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Sequence[Dict[str, Any]]:
+        return await self._call(
+            "get_kline_data",
+            lambda: self.provider.get_kline_data(symbol, timeframe, start_time, end_time)
+        )
+    
+    async def subscribe_realtime_data(self, symbol: str, callback) -> None:
+        # A retry could register the callback twice
+        await self._call(
+            "subscribe_realtime_data",
+            lambda: self.provider.subscribe_realtime_data(symbol, callback),
+            retry=False
+        )
+    
+    async def unsubscribe_realtime_data(self, symbol: str) -> None:
+        # Local bookkeeping in the provider, so not limited like upstream calls
+        await self.provider.unsubscribe_realtime_data(symbol)
+    
+    async def _call(self, operation: str, call: Callable[[], Awaitable[T]], retry: bool = True) -> T:
+        """Run one upstream call through the breaker, rate limit, concurrency limit and retries"""
+        metrics = self.metrics.setdefault(operation, CallMetrics())
+        
+        for attempt in range(self.retry.attempts if retry else 1):
+            if attempt:
+                metrics.retries += 1
+                await asyncio.sleep(self.retry.delay(attempt - 1))
+            
+            try:
+                self.breaker.allow()
+            except CircuitOpenError:
+                metrics.rejected += 1
+                raise
+            try:
+                await self.bucket.acquire()
+                await self.limiter.acquire()
+            except BaseException as e:
+                self.breaker.abandon()
+                if isinstance(e, UpstreamError):
+                    metrics.rejected += 1
+                raise
+            
+            metrics.calls += 1
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(call(), self.timeout)
+            except self.RETRYABLE as e:
+                metrics.errors += 1
+                if isinstance(e, asyncio.TimeoutError):
+                    metrics.timeouts += 1
+                    error: Exception = UpstreamTimeoutError(f"{operation} timed out after {self.timeout}s")
+                else:
+                    error = e
+                self.limiter.on_overload()
+                self.breaker.record_failure()
+                logger.warning("Upstream %s failed (attempt %d): %s", operation, attempt + 1, error)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception:
+                # Not an upstream health problem, e.g. a bad request
+                metrics.errors += 1
+                self.breaker.abandon()
+                raise
+            else:
+                latency = time.monotonic() - started
+                metrics.observe(latency)
+                self.limiter.on_success(latency)
+                self.breaker.record_success()
+                return result
+            finally:
+                self.limiter.release()
+        
+        raise error
+    
+    def stats(self) -> Dict[str, Any]:
+        """Limiter, circuit and per-operation metrics"""
+        return {
+            "concurrency_limit": round(self.limiter.limit, 2),
+            "in_flight": self.limiter.in_flight,
+            "queued": self.limiter.queued,
+            "circuit_state": self.breaker.state,
+            "circuit_opened": self.breaker.opened_count,
+            "operations": {operation: metrics.snapshot() for operation, metrics in self.metrics.items()}
+        }
+
+def _upstream_provider() -> MarketDataProvider:
+    """The configured upstream: a tick replay if REPLAY_SOURCE is set, else the mock provider"""
+    if REPLAY_SOURCE:
+        # Imported here because the replay module builds on this one
+        from backend.app.services.replay import ReplayMarketDataProvider
+        
+        return ReplayMarketDataProvider.from_source(
+            REPLAY_SOURCE,
+            REPLAY_SPEED,
+            REPLAY_SYMBOLS,
+            datetime.fromisoformat(REPLAY_START) if REPLAY_START else None,
+            datetime.fromisoformat(REPLAY_END) if REPLAY_END else None
+        )
+    return MockMarketDataProvider()
 
 # Global instance
-market_data_provider = MockMarketDataProvider()
\ No newline at end of file
+market_data_provider = ResilientProvider(_upstream_provider())
\ No newline at end of file
@@ -0,0 +1,224 @@
+from bisect import bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.app.models.bar_batch import BarBatch, from_epoch_ms
+from backend.app.services.data_cache import DataCacheService, data_cache_service
+
+def measured_move_levels(stop: float, entry: float) -> Dict[str, float]:
+    """Stop, entry and the 1x and 2x risk targets of a Measured Move
+
+    The risk is entry - stop, so the same formula gives targets above the
+    entry for longs (stop below entry) and below it for shorts.
+    """
+    risk = entry - stop
+    return {
+        "stop": stop,
+        "entry": entry,
+        "target_1r": entry + risk,
+        "target_2r": entry + 2 * risk
+    }
+
+def _percent(change: Optional[float], base: Optional[float]) -> Optional[float]:
+    if change is None or not base:
+        return None
+    return change / base * 100
+
+def measured_moves(
+    stops: Sequence[float],
+    entries: Sequence[float],
+    latest: Sequence[Optional[float]]
+) -> List[Dict[str, Any]]:
+    """Points 0-3 of many Measured Moves, with distances from the latest prices to each target
+
+    Inputs are columns: one stop, entry and latest price per measurement.
+    Distances are target - latest, so they are positive while a long target
+    is still above the price. r_multiple is the open profit in units of risk.
+    """
+    risks = [entry - stop for stop, entry in zip(stops, entries)]
+    targets_1r = [entry + risk for entry, risk in zip(entries, risks)]
+    targets_2r = [entry + 2 * risk for entry, risk in zip(entries, risks)]
+    r_multiples = [
+        (price - entry) / risk if price is not None and risk else None
+        for price, entry, risk in zip(latest, entries, risks)
+    ]
+
+    results = []
+    for index, price in enumerate(latest):
+        targets = {"0": stops[index], "2": targets_1r[index], "3": targets_2r[index]}
+        distances = {
+            point: target - price if price is not None else None
+            for point, target in targets.items()
+        }
+        results.append({
+            "direction": "long" if risks[index] > 0 else "short",
+            "risk": abs(risks[index]),
+            "points": {
+                "0": stops[index],
+                "1": entries[index],
+                "2": targets_1r[index],
+                "3": targets_2r[index]
+            },
+            "latest_price": price,
+            "distance": distances,
+            "distance_pct": {point: _percent(distance, price) for point, distance in distances.items()},
+            "r_multiple": r_multiples[index]
+        })
+    return results
+
+def price_changes(
+    starts: Sequence[float],
+    ends: Sequence[float],
+    latest: Sequence[Optional[float]]
+) -> List[Dict[str, Any]]:
+    """Change and percentage change of many two-point measurements, and the latest price's distance to each end point"""
+    changes = [end - start for start, end in zip(starts, ends)]
+    return [
+        {
+            "start_price": start,
+            "end_price": end,
+            "change": change,
+            "change_pct": _percent(change, start),
+            "latest_price": price,
+            "distance": end - price if price is not None else None,
+            "distance_pct": _percent(end - price, price) if price is not None else None
+        }
+        for start, end, change, price in zip(starts, ends, changes, latest)
+    ]
+
+class MeasurementService:
+    """Evaluates batches of Measure and Measured Move measurements
+
+    A batch is resolved in three passes: the latest price of every symbol is
+    read once, bars are loaded once per (symbol, timeframe) covering all of
+    its time-anchored measurements, and each measurement type is then
+    computed column-wise over the whole batch. Invalid measurements get an
+    error entry instead of failing the batch.
+    """
+
+    def __init__(self, cache: DataCacheService):
+        self.cache = cache
+
+    async def _load_bars(
+        self,
+        measurements: List[Dict[str, Any]]
+    ) -> Tuple[Dict[Tuple[str, str], List[Dict[str, Any]]], Dict[Tuple[str, str], str]]:
+        """Cached bars per (symbol, timeframe) spanning every time-anchored measurement
+
+        A series whose bars cannot be fetched from upstream is reported in the
+        second mapping, so only the measurements anchored to it fail.
+        """
+        spans: Dict[Tuple[str, str], Tuple[datetime, datetime]] = {}
+        for item in measurements:
+            if item.get("start_time") is None or item.get("end_time") is None:
+                continue
+            key = (item["symbol"], item.get("timeframe") or "1m")
+            start, end = sorted((item["start_time"], item["end_time"]))
+            if key in spans:
+                start, end = min(start, spans[key][0]), max(end, spans[key][1])
+            spans[key] = (start, end)
+
+        bars_by_series: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        errors: Dict[Tuple[str, str], str] = {}
+        for key, (start, end) in spans.items():
+            try:
+                bars_by_series[key] = await self.cache.get_kline_data(key[0], key[1], start_time=start, end_time=end)
+            except ConnectionError as e:
+                errors[key] = f"Bars unavailable: {e}"
+        return bars_by_series, errors
+
+    @staticmethod
+    def _anchor(times: List[datetime], at: datetime) -> Optional[int]:
+        """Index of the bar containing a time: the last bar starting at or before it"""
+        position = bisect_right(times, at) - 1
+        return position if position >= 0 else None
+
+    def _resolve_measure(
+        self,
+        item: Dict[str, Any],
+        bars_by_series: Dict[Tuple[str, str], List[Dict[str, Any]]],
+        times_by_series: Dict[Tuple[str, str], List[datetime]],
+        errors: Dict[Tuple[str, str], str]
+    ) -> Dict[str, Any]:
+        """Start and end prices of a Measure, plus the range between them when anchored to bars"""
+        if item.get("start_price") is not None and item.get("end_price") is not None:
+            return {"start": item["start_price"], "end": item["end_price"]}
+        if item.get("start_time") is None or item.get("end_time") is None:
+            raise ValueError("A measure needs start_price and end_price, or start_time and end_time")
+
+        key = (item["symbol"], item.get("timeframe") or "1m")
+        if key in errors:
+            raise ValueError(errors[key])
+        bars = bars_by_series.get(key, [])
+        times = times_by_series.get(key, [])
+        first = self._anchor(times, item["start_time"])
+        last = self._anchor(times, item["end_time"])
+        if first is None or last is None:
+            raise ValueError("No stored bars at the measured times")
+
+        span = bars[min(first, last):max(first, last) + 1]
+        high = max(bar["high"] for bar in span)
+        low = min(bar["low"] for bar in span)
+        return {
+            "start": bars[first]["close"],
+            "end": bars[last]["close"],
+            "range": {
+                "high": high,
+                "low": low,
+                "amplitude": high - low,
+                "amplitude_pct": _percent(high - low, low),
+                "bars": len(span)
+            }
+        }
+
+    async def evaluate(self, measurements: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Evaluate a batch of measurements against stored bars and latest prices"""
+        latest_prices = self.cache.get_latest_prices(list(dict.fromkeys(item["symbol"] for item in measurements)))
+        bars_by_series, errors = await self._load_bars(measurements)
+        times_by_series = {
+            key: [from_epoch_ms(time) for time in BarBatch.of(bars).times]
+            for key, bars in bars_by_series.items()
+        }
+
+        results: List[Optional[Dict[str, Any]]] = [None] * len(measurements)
+        moves: List[int] = []
+        measures: List[Tuple[int, Dict[str, Any]]] = []
+        for index, item in enumerate(measurements):
+            try:
+                if item["type"] == "measured_move":
+                    if item.get("stop") is None or item.get("entry") is None:
+                        raise ValueError("A measured move needs stop and entry")
+                    if item["stop"] == item["entry"]:
+                        raise ValueError("Stop and entry must differ")
+                    moves.append(index)
+                else:
+                    measures.append((index, self._resolve_measure(item, bars_by_series, times_by_series, errors)))
+            except ValueError as e:
+                results[index] = {"error": str(e)}
+
+        move_results = measured_moves(
+            [measurements[index]["stop"] for index in moves],
+            [measurements[index]["entry"] for index in moves],
+            [latest_prices[measurements[index]["symbol"]] for index in moves]
+        )
+        for index, result in zip(moves, move_results):
+            results[index] = result
+
+        measure_results = price_changes(
+            [resolved["start"] for _, resolved in measures],
+            [resolved["end"] for _, resolved in measures],
+            [latest_prices[measurements[index]["symbol"]] for index, _ in measures]
+        )
+        for (index, resolved), result in zip(measures, measure_results):
+            if "range" in resolved:
+                result["range"] = resolved["range"]
+            results[index] = result
+
+        results = [
+            {"id": item.get("id"), "type": item["type"], "symbol": item["symbol"], **result}
+            for item, result in zip(measurements, results)
+        ]
+        return {"results": results, "count": len(results), "latest_prices": latest_prices}
+
+# Global instance
+measurement_service = MeasurementService(data_cache_service)
@@ -0,0 +1,110 @@
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+from backend.app.services.data_cache import DataCacheService
+from backend.app.services.market_data import TIMEFRAME_DURATIONS, align_to_bar
+from backend.app.services.trading_calendar import calendar_for
+
+logger = logging.getLogger(__name__)
+
+class PrefetchScheduler:
+    """Background cache warm-up and roll-forward for a watchlist
+
+    On start every watchlist series is preloaded with its most recent bars.
+    Afterwards each series is refreshed delay after each of its bars closes,
+    once the provider has the final values, so charts asking for the closed
+    bar find it cached. Only bars inside the symbol's trading sessions are
+    waited for: nights, weekends and holidays cost no provider calls. Series
+    due at the same moment are refreshed in order of their most recent
+    client read, and all fetches go through the provider's upstream
+    concurrency limit.
+    """
+
+    def __init__(
+        self,
+        cache: DataCacheService,
+        watchlist: List[Tuple[str, str]],
+        lookback_bars: int = 500,
+        delay: timedelta = timedelta(seconds=2)
+    ):
+        self.cache = cache
+        self.watchlist = [series for series in watchlist if series[1] in TIMEFRAME_DURATIONS]
+        self.lookback_bars = lookback_bars
+        self.delay = delay
+        self._task: Optional[asyncio.Task] = None
+
+        skipped = set(watchlist) - set(self.watchlist)
+        if skipped:
+            logger.warning("Ignoring watchlist entries with unknown timeframes: %s", sorted(skipped))
+
+    def next_refresh_time(self, symbol: str, timeframe: str, now: datetime) -> datetime:
+        """When to roll a series forward: delay after the close of its next tradable bar"""
+        duration = TIMEFRAME_DURATIONS[timeframe]
+        # The bar whose refresh is still ahead, unless the calendar skips it
+        bar = align_to_bar(now - self.delay, timeframe)
+        bar = calendar_for(symbol).first_bar_at_or_after(bar, timeframe) or bar
+        return bar + duration + self.delay
+
+    def prioritize(self, series: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+        """Order series by most recent client read first"""
+        return sorted(series, key=lambda item: self.cache.get_last_access(*item), reverse=True)
+
+    async def refresh(self, series: List[Tuple[str, str]], full: bool = False) -> None:
+        """Fetch recent bars for each series, highest priority first
+
+        A full refresh fetches the whole lookback window. Otherwise a series
+        already cached within the window is fetched from its last cached
+        bar, which may have been forming when it was written, so a bar-close
+        refresh costs a couple of bars instead of the whole window.
+        """
+        now = datetime.now()
+
+        async def refresh_one(symbol: str, timeframe: str) -> None:
+            start_time = now - TIMEFRAME_DURATIONS[timeframe] * self.lookback_bars
+            if not full:
+                summary = self.cache.get_series_summary(symbol, timeframe)
+                if summary is not None and summary.last_time > start_time:
+                    start_time = summary.last_time
+            try:
+                await self.cache.refresh_kline_data(symbol, timeframe, start_time=start_time)
+            except Exception as e:
+                logger.warning("Prefetch of %s %s failed: %s", symbol, timeframe, e)
+
+        # Tasks queue on the provider's concurrency limiter in creation
+        # order, so higher priority series get the first slots
+        await asyncio.gather(*(refresh_one(*item) for item in self.prioritize(series)))
+
+    async def warm_up(self) -> None:
+        """Preload the whole lookback window for every watchlist series"""
+        await self.refresh(self.watchlist, full=True)
+
+    async def run(self, warm_up: bool = True) -> None:
+        """Warm up, then roll each series forward after every bar close"""
+        if warm_up:
+            await self.warm_up()
+
+        while self.watchlist:
+            now = datetime.now()
+            due_times = {series: self.next_refresh_time(*series, now) for series in self.watchlist}
+            refresh_at = min(due_times.values())
+
+            await asyncio.sleep(max((refresh_at - now).total_seconds(), 0))
+            await self.refresh([series for series, due in due_times.items() if due == refresh_at])
+
+    def start(self, warm_up: bool = True) -> None:
+        """Start the scheduler as a background task, optionally skipping the warm-up"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run(warm_up=warm_up))
+
+    async def stop(self) -> None:
+        """Cancel the background task and wait for it to finish"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
@@ -0,0 +1,155 @@
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+import logging
+import re
+
+from backend.app.models.values import Tick
+from backend.app.services.market_data import market_data_provider
+
+if TYPE_CHECKING:
+    from backend.app.services.coherence import CoherenceBus
+
+logger = logging.getLogger(__name__)
+
+TickListener = Callable[[Tick], Awaitable[None]]
+
+# Exchange codes fit the symbol columns of the store
+_SYMBOL = re.compile(r"[A-Za-z0-9._-]{1,20}")
+
+def is_valid_symbol(symbol: str) -> bool:
+    """Check that a client-supplied symbol looks like an exchange code"""
+    return _SYMBOL.fullmatch(symbol) is not None
+
+class RealtimeHub:
+    """Fans real-time ticks out to in-process listeners
+
+    Each symbol is subscribed upstream at most once; every tick delivered by
+    the provider's subscribe_realtime_data callback is converted to a Tick
+    once and passed to all registered listeners in registration order. A
+    failing listener is logged and does not prevent delivery to the others.
+
+    Subscriptions are reference counted: every subscribe() is matched by an
+    unsubscribe() from holders that go away, such as stream clients, and the
+    upstream subscription is dropped with the last reference. Holders that
+    last for the life of the process never unsubscribe.
+
+    In multi-process mode only the ingest owner subscribes upstream.
+    Followers forward their first subscribe and last unsubscribe of a
+    symbol to the owner over the coherence bus, and the ticks the owner
+    relays are delivered to their listeners, except those registered with
+    relayed=False, such as tick persistence, which the owner already does.
+    """
+
+    def __init__(self):
+        self._listeners: List[TickListener] = []
+        self._owner_only: List[TickListener] = []
+        self._refcounts: Dict[str, int] = {}
+        self.subscribed_symbols: Set[str] = set()
+        self.coherence: Optional['CoherenceBus'] = None
+
+    def add_listener(self, listener: TickListener, relayed: bool = True) -> None:
+        """Register an async callback that receives every tick
+
+        Listeners registered with relayed=False only get the ticks of this
+        process's own upstream subscriptions.
+        """
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        if not relayed and listener not in self._owner_only:
+            self._owner_only.append(listener)
+
+    def remove_listener(self, listener: TickListener) -> None:
+        """Unregister a tick callback"""
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+        if listener in self._owner_only:
+            self._owner_only.remove(listener)
+
+    @property
+    def is_follower(self) -> bool:
+        return self.coherence is not None and not self.coherence.is_owner
+
+    def join(self, coherence: 'CoherenceBus') -> None:
+        """Subscribe through the ingest owner and receive its ticks while this worker follows"""
+        self.coherence = coherence
+        coherence.handle_calls("ticks", self._apply_command)
+        coherence.handle_records("tick", self._relay_record)
+        coherence.add_connect_callback(self.resubscribe)
+
+    async def subscribe(self, symbol: str) -> None:
+        """Take a reference to a symbol's tick stream, subscribing upstream on the first"""
+        count = self._refcounts.get(symbol, 0)
+        self._refcounts[symbol] = count + 1
+        if count:
+            return
+        try:
+            await self._subscribe_upstream(symbol)
+        except BaseException:
+            self._drop_reference(symbol)
+            raise
+
+    async def unsubscribe(self, symbol: str) -> None:
+        """Release a reference taken by subscribe(); the last one ends the upstream subscription"""
+        if self._drop_reference(symbol):
+            return
+        if self.is_follower:
+            await self.coherence.call("ticks", {"op": "unsubscribe", "symbol": symbol})
+        elif symbol in self.subscribed_symbols:
+            self.subscribed_symbols.discard(symbol)
+            await market_data_provider.unsubscribe_realtime_data(symbol)
+
+    def _drop_reference(self, symbol: str) -> int:
+        """Decrement a symbol's reference count; returns the references left"""
+        count = self._refcounts.get(symbol, 0) - 1
+        if count > 0:
+            self._refcounts[symbol] = count
+        else:
+            self._refcounts.pop(symbol, None)
+        return max(count, 0)
+
+    async def _subscribe_upstream(self, symbol: str) -> None:
+        if self.is_follower:
+            await self.coherence.call("ticks", {"op": "subscribe", "symbol": symbol})
+        elif symbol not in self.subscribed_symbols:
+            await market_data_provider.subscribe_realtime_data(symbol, self.publish)
+            self.subscribed_symbols.add(symbol)
+
+    async def resubscribe(self) -> None:
+        """Subscribe the held symbols again after connecting to a new owner or becoming it
+
+        An owner counts one reference per follower subscription, so a
+        follower reconnecting to the same owner may leave a symbol subscribed
+        longer than needed, never shorter.
+        """
+        for symbol in list(self._refcounts):
+            try:
+                await self._subscribe_upstream(symbol)
+            except Exception as e:
+                logger.warning("Could not resubscribe to %s: %s", symbol, e)
+
+    async def _apply_command(self, command: Dict[str, Any]) -> None:
+        """Owner side: a follower's first subscribe or last unsubscribe of a symbol"""
+        if command["op"] == "subscribe":
+            await self.subscribe(command["symbol"])
+        else:
+            await self.unsubscribe(command["symbol"])
+
+    async def publish(self, tick: Union[Tick, Dict[str, Any]]) -> None:
+        """Deliver a tick to all listeners"""
+        await self._deliver(Tick.of(tick), self._listeners)
+
+    async def relay(self, tick: Tick) -> None:
+        """Deliver a tick received by another worker to the listeners that take relayed ticks"""
+        await self._deliver(tick, [listener for listener in self._listeners if listener not in self._owner_only])
+
+    async def _relay_record(self, record: Dict[str, Any]) -> None:
+        await self.relay(Tick.from_dict(record["tick"]))
+
+    async def _deliver(self, tick: Tick, listeners: List[TickListener]) -> None:
+        for listener in list(listeners):
+            try:
+                await listener(tick)
+            except Exception:
+                logger.exception("Tick listener %r failed", listener)
+
+# Global instance
+realtime_hub = RealtimeHub()
@@ -0,0 +1,210 @@
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+from datetime import datetime
+import asyncio
+import gzip
+import json
+import logging
+
+from backend.app.database import ShardRouter, shard_router
+from backend.app.models.market_data import RealtimeData
+from backend.app.models.values import Tick
+from backend.app.services.market_data import MarketDataProvider, MockMarketDataProvider
+
+logger = logging.getLogger(__name__)
+
+# Unthrottled replays yield to the event loop after this many ticks
+_YIELD_EVERY = 100
+
+def _open_archive(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def read_archive(path: str) -> Iterator[Tick]:
+    """Ticks of an archive file: one Tick.to_dict() JSON object per line, gzipped if the name ends in .gz"""
+    with _open_archive(path, "r") as archive:
+        for line in archive:
+            if line.strip():
+                yield Tick.from_dict(json.loads(line))
+
+def write_archive(path: str, ticks: Iterable[Tick]) -> int:
+    """Write ticks to an archive file; returns the number written"""
+    count = 0
+    with _open_archive(path, "w") as archive:
+        for tick in ticks:
+            archive.write(json.dumps(tick.to_dict(), separators=(",", ":")) + "\n")
+            count += 1
+    return count
+
+def load_recorded_ticks(
+    symbols: Optional[Sequence[str]] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    shards: ShardRouter = shard_router
+) -> List[Tick]:
+    """Ticks recorded in realtime_data across all shards, in time order"""
+    ticks = []
+    for index in range(shards.shard_count):
+        with shards.shard_session(index) as session:
+            query = session.query(RealtimeData)
+            if symbols:
+                query = query.filter(RealtimeData.symbol.in_(symbols))
+            if start_time:
+                query = query.filter(RealtimeData.timestamp >= start_time)
+            if end_time:
+                query = query.filter(RealtimeData.timestamp <= end_time)
+            ticks.extend(Tick.from_row(row) for row in query.order_by(RealtimeData.timestamp, RealtimeData.id))
+    ticks.sort(key=lambda tick: tick.timestamp)
+    return ticks
+
+class ReplayMarketDataProvider(MarketDataProvider):
+    """Replays recorded ticks through subscribe_realtime_data
+
+    The recording is loaded on connect. Each subscribed symbol's ticks are
+    delivered at their offset from the start of the whole recording divided
+    by speed, measured from the subscription, so bursts and pauses keep
+    their shape at 1x and are compressed at Nx; a speed of 0 replays as fast
+    as the callbacks allow. Delivered ticks are stamped with the time they
+    are replayed unless rebase is off, so downstream latency measurements
+    stay meaningful. A symbol's replay ends with its recorded ticks.
+
+    K-line requests are answered by the history provider, a mock one by
+    default.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], Iterable[Tick]],
+        speed: float = 1.0,
+        history: Optional[MarketDataProvider] = None,
+        rebase: bool = True
+    ):
+        self._load = load
+        self.speed = speed
+        self.history = history or MockMarketDataProvider()
+        self.rebase = rebase
+        self.is_connected = False
+        self.subscriptions: Dict[str, Any] = {}
+        self._ticks: Dict[str, List[Tick]] = {}
+        self._origin: Optional[datetime] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.ticks_replayed = 0
+
+    @classmethod
+    def from_archive(cls, path: str, speed: float = 1.0, **kwargs: Any) -> 'ReplayMarketDataProvider':
+        return cls(lambda: read_archive(path), speed, **kwargs)
+
+    @classmethod
+    def from_database(
+        cls,
+        symbols: Sequence[str],
+        start_time: datetime,
+        end_time: datetime,
+        speed: float = 1.0,
+        **kwargs: Any
+    ) -> 'ReplayMarketDataProvider':
+        """Provider replaying the recorded ticks of some symbols within a time window
+
+        Raises ValueError without symbols or a window, as the whole
+        realtime_data table would otherwise be loaded into memory.
+        """
+        if not symbols or start_time is None or end_time is None:
+            raise ValueError("A database replay needs symbols, a start time and an end time")
+        if end_time <= start_time:
+            raise ValueError("The replay end time must be after its start time")
+        return cls(lambda: load_recorded_ticks(symbols, start_time, end_time), speed, **kwargs)
+
+    @classmethod
+    def from_source(
+        cls,
+        source: str,
+        speed: float = 1.0,
+        symbols: Optional[Sequence[str]] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> 'ReplayMarketDataProvider':
+        """Provider for a REPLAY_SOURCE setting: "db" for realtime_data, otherwise an archive path
+
+        symbols and the time window only apply to, and are required by, "db".
+        """
+        if source == "db":
+            return cls.from_database(symbols or [], start_time, end_time, speed)
+        return cls.from_archive(source, speed)
+
+    @property
+    def tick_count(self) -> int:
+        return sum(len(ticks) for ticks in self._ticks.values())
+
+    async def connect(self) -> bool:
+        """Load the recording and connect the history provider"""
+        ticks = sorted(await asyncio.to_thread(lambda: list(self._load())), key=lambda tick: tick.timestamp)
+        self._ticks = {}
+        for tick in ticks:
+            self._ticks.setdefault(tick.symbol, []).append(tick)
+        self._origin = ticks[0].timestamp if ticks else None
+        logger.info("Loaded %d recorded ticks of %d symbols for replay", len(ticks), len(self._ticks))
+
+        if not self.history.is_connected:
+            await self.history.connect()
+        self.is_connected = True
+        return True
+
+    async def disconnect(self) -> None:
+        self.is_connected = False
+        self.subscriptions.clear()
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await self.history.disconnect()
+
+    async def get_kline_data(
+        self,
+        symbol: str,
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Sequence[Dict[str, Any]]:
+        if not self.is_connected:
+            raise ConnectionError("Not connected to market data provider")
+        return await self.history.get_kline_data(symbol, timeframe, start_time, end_time)
+
+    async def subscribe_realtime_data(self, symbol: str, callback) -> None:
+        """Start replaying a symbol's recorded ticks to the callback"""
+        if not self.is_connected:
+            raise ConnectionError("Not connected to market data provider")
+
+        self.subscriptions[symbol] = callback
+        if symbol not in self._tasks:
+            self._tasks[symbol] = asyncio.create_task(self._replay(symbol, callback))
+
+    async def unsubscribe_realtime_data(self, symbol: str) -> None:
+        """Stop replaying a symbol; subscribing again starts its recording over"""
+        self.subscriptions.pop(symbol, None)
+        task = self._tasks.pop(symbol, None)
+        if task is not None:
+            task.cancel()
+
+    async def _replay(self, symbol: str, callback) -> None:
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for count, tick in enumerate(self._ticks.get(symbol, ()), 1):
+            if self.speed > 0:
+                delay = started + (tick.timestamp - self._origin).total_seconds() / self.speed - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % _YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+
+            if symbol not in self.subscriptions or not self.is_connected:
+                return
+            try:
+                await callback(tick._replace(timestamp=datetime.now()) if self.rebase else tick)
+            except Exception:
+                logger.exception("Replay callback failed for %s", symbol)
+            self.ticks_replayed += 1
+
+    async def join(self) -> None:
+        """Wait until every subscribed symbol has been replayed to the end"""
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
@@ -0,0 +1,213 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import asyncio
+import random
+import time
+
+class UpstreamError(ConnectionError):
+    """Base class for calls refused or abandoned by the resilience layer"""
+
+class UpstreamTimeoutError(UpstreamError):
+    """An upstream call did not finish within its timeout"""
+
+class CircuitOpenError(UpstreamError):
+    """The circuit breaker is open and calls fail fast"""
+
+class LimiterRejectedError(UpstreamError):
+    """Too many calls are already waiting for a concurrency slot"""
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to upstream health (AIMD)
+
+    Each call that completes within latency_target raises the limit by
+    1/limit, so it grows by about one per limit's worth of successes. A
+    timeout, an overload error or a slow call multiplies the limit by
+    backoff, at most once per latency_target window: calls in flight
+    together tend to fail together, and one congestion event should cut
+    the limit once, not once per failed call. Slots are handed out in FIFO
+    order. At most max_queue callers may wait for a slot; further callers
+    are rejected, so a burst of chart loads fails fast instead of piling up.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_target: float = 2.0,
+        backoff: float = 0.5,
+        max_queue: int = 100
+    ):
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._backed_off_at: Optional[float] = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """Wait for a slot in FIFO order"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise LimiterRejectedError(f"{len(self._waiters)} upstream calls already queued")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller gave up
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        """Free a slot and hand it to the next waiter if the limit allows"""
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.on_overload()
+            return
+        self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        if self._backed_off_at is not None and now - self._backed_off_at < self.latency_target:
+            return
+        self._backed_off_at = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+
+class TokenBucket:
+    """Rate limit of rate calls per second with bursts of up to burst calls"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Take a token, waiting until one is available"""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class CircuitBreaker:
+    """Fails calls fast after repeated upstream failures
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for reset_timeout seconds. Then a single trial call is let
+    through (half-open): its success closes the circuit, its failure opens
+    it again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_count = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    def allow(self) -> None:
+        """Raise CircuitOpenError unless a call may proceed"""
+        if self.state == "open":
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("Upstream circuit is open")
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._trial_in_flight:
+                raise CircuitOpenError("Upstream circuit is half-open, trial call in flight")
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def abandon(self) -> None:
+        """A call let through by allow() ended without a verdict on upstream health"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self._opened_at = time.monotonic()
+            self.opened_count += 1
+
+class RetryPolicy:
+    """Retry schedule with exponential backoff and full jitter"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.1, max_delay: float = 2.0):
+        self.attempts = max(attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait before retry number attempt + 1"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+class CallMetrics:
+    """Counters and recent latencies of one upstream operation"""
+
+    def __init__(self, window: int = 1024):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rejected = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+
+    def observe(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000, 2)
+
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_max_ms": round(latencies[-1] * 1000, 2) if latencies else None
+        }
@@ -0,0 +1,326 @@
+from array import array
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import and_, select
+
+from backend.app.config import SCAN_ENGINE_RETRY_SECONDS, SCAN_ENGINE_THREADS
+from backend.app.database import ShardRouter
+from backend.app.models.bar_batch import BarBatch, to_epoch_ms
+from backend.app.models.market_data import KLineData
+
+# DuckDB is optional and imported on first use, so loading the cache
+# service does not load it; large scans run on SQLite without it
+duckdb = None
+
+logger = logging.getLogger(__name__)
+
+_kline_table = KLineData.__table__
+_SCAN_COLUMNS = (
+    _kline_table.c.symbol,
+    _kline_table.c.timestamp,
+    _kline_table.c.open_price,
+    _kline_table.c.high_price,
+    _kline_table.c.low_price,
+    _kline_table.c.close_price,
+    _kline_table.c.volume,
+)
+
+# Batch size for IN (...) lookups, kept under SQLite's bound parameter limit
+_IN_CLAUSE_BATCH = 500
+
+ScanRow = Tuple[str, int, float, float, float, float, int]
+
+def _import_duckdb():
+    """The duckdb module, or None if it is not installed"""
+    global duckdb
+    if duckdb is None:
+        try:
+            import duckdb as module
+        except ImportError:
+            return None
+        duckdb = module
+    return duckdb
+
+class ScanEngineError(RuntimeError):
+    """An engine that cannot run a scan; the caller falls back to SQLite"""
+
+def _group_rows(rows: Sequence[ScanRow], symbols: Sequence[str], timeframe: Optional[str]) -> Dict[str, BarBatch]:
+    """Batches per symbol from (symbol, epoch ms, open, high, low, close, volume) rows ordered by symbol"""
+    batches = {symbol: BarBatch(symbol=symbol, timeframe=timeframe) for symbol in symbols}
+    batch = None
+    for symbol, time, open_price, high, low, close, volume in rows:
+        if batch is None or batch.symbol != symbol:
+            batch = batches[symbol]
+        batch.times.append(time)
+        batch.opens.append(open_price)
+        batch.highs.append(high)
+        batch.lows.append(low)
+        batch.closes.append(close)
+        batch.volumes.append(volume)
+    return batches
+
+class SQLiteScanEngine:
+    """Range scans through the shard sessions, the same path interactive reads take
+
+    Bars are read one shard at a time and resampled in this process, so it
+    suits scans small enough that per-row work does not dominate.
+    """
+
+    name = "sqlite"
+    available = True
+
+    def __init__(self, shards: ShardRouter):
+        self.shards = shards
+
+    def _rows(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> List[ScanRow]:
+        by_shard: Dict[int, List[str]] = {}
+        for symbol in symbols:
+            by_shard.setdefault(self.shards.shard_for(symbol), []).append(symbol)
+
+        rows = []
+        for shard, shard_symbols in by_shard.items():
+            with self.shards.shard_session(shard) as session:
+                for offset in range(0, len(shard_symbols), _IN_CLAUSE_BATCH):
+                    stmt = select(*_SCAN_COLUMNS).where(
+                        and_(
+                            _kline_table.c.symbol.in_(shard_symbols[offset:offset + _IN_CLAUSE_BATCH]),
+                            _kline_table.c.timeframe == timeframe
+                        )
+                    )
+                    if start_time:
+                        stmt = stmt.where(_kline_table.c.timestamp >= start_time)
+                    if end_time:
+                        stmt = stmt.where(_kline_table.c.timestamp <= end_time)
+                    result = session.execute(stmt.order_by(_kline_table.c.symbol, _kline_table.c.timestamp))
+                    rows.extend(
+                        (row.symbol, to_epoch_ms(row.timestamp), row.open_price, row.high_price, row.low_price, row.close_price, row.volume)
+                        for row in result
+                    )
+        return rows
+
+    def scan(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[str, BarBatch]:
+        return _group_rows(self._rows(symbols, timeframe, start_time, end_time), symbols, timeframe)
+
+    def resample(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        bucket: timedelta,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[str, BarBatch]:
+        from backend.app.services.analytics import resample_into
+
+        bucket_ms = bucket // timedelta(milliseconds=1)
+        resampled = {}
+        for symbol, batch in self.scan(symbols, timeframe, start_time, end_time).items():
+            columns = (batch.times, batch.opens, batch.highs, batch.lows, batch.closes, batch.volumes)
+            out = [array(column.typecode, column) for column in columns]
+            count = resample_into(columns, bucket_ms, out)
+            resampled[symbol] = BarBatch(*(column[:count] for column in out), symbol=symbol)
+        return resampled
+
+class DuckDBScanEngine:
+    """Range scans run by DuckDB directly over the SQLite shard files
+
+    Each shard file is attached read-only through DuckDB's sqlite extension
+    on first use, so the same data the hot path writes is scanned without
+    copying it anywhere. Filtering, resampling and aggregation run
+    vectorized on DuckDB's worker threads, and only the result rows come
+    back to Python. The engine is unavailable when DuckDB is not installed
+    or the store is not SQLite files. A failed connection or scan, which may
+    be transient, only suspends it for retry_seconds.
+
+    The extension is only loaded, never downloaded, so servers without
+    network access work; install it once ahead of time with
+    python -c "import duckdb; duckdb.execute('INSTALL sqlite')".
+    """
+
+    name = "duckdb"
+
+    def __init__(
+        self,
+        shards: ShardRouter,
+        threads: int = SCAN_ENGINE_THREADS,
+        retry_seconds: float = SCAN_ENGINE_RETRY_SECONDS
+    ):
+        self.shards = shards
+        self.threads = threads
+        self.retry_seconds = retry_seconds
+        self.unavailable_reason: Optional[str] = None
+        self._retry_at: Optional[float] = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self._connect() is not None
+
+    @property
+    def ready(self) -> bool:
+        """Whether a scan may be tried now, judged without connecting
+
+        False only while the engine is known to be unavailable, for good or
+        until its retry time, so it is safe to check on the event loop; the
+        connection itself is made by the first scan, in the scan's thread.
+        """
+        if self.unavailable_reason is None:
+            return True
+        return self._retry_at is not None and time.monotonic() >= self._retry_at
+
+    def _shard_paths(self) -> List[str]:
+        paths = []
+        for shard_engine in self.shards.engines:
+            path = shard_engine.url.database
+            if shard_engine.dialect.name != "sqlite" or not path or path == ":memory:":
+                raise ScanEngineError("the store is not a set of SQLite files")
+            paths.append(os.path.abspath(path))
+        return paths
+
+    def _connect(self):
+        """The DuckDB connection with every shard attached, or None if the engine is unavailable"""
+        with self._lock:
+            if self._connection is not None:
+                return self._connection
+            if self.unavailable_reason is not None:
+                if self._retry_at is None or time.monotonic() < self._retry_at:
+                    return None
+                self.unavailable_reason = self._retry_at = None
+            if _import_duckdb() is None:
+                self.unavailable_reason = "duckdb is not installed"
+                return None
+            try:
+                paths = self._shard_paths()
+                connection = duckdb.connect()
+                connection.execute("LOAD sqlite")
+                if self.threads > 0:
+                    connection.execute(f"SET threads = {int(self.threads)}")
+                for index, path in enumerate(paths):
+                    escaped = path.replace("'", "''")
+                    connection.execute(f"ATTACH '{escaped}' AS shard{index} (TYPE sqlite, READ_ONLY)")
+            except ScanEngineError as e:
+                self.unavailable_reason = str(e)
+                logger.warning("DuckDB scan engine unavailable: %s", e)
+                return None
+            except duckdb.Error as e:
+                self.unavailable_reason = str(e)
+                self._retry_at = time.monotonic() + self.retry_seconds
+                logger.warning("DuckDB scan engine unavailable for %gs: %s", self.retry_seconds, e)
+                return None
+            self._connection = connection
+            return connection
+
+    def suspend(self, reason: str) -> None:
+        """Stop using the engine for retry_seconds after a failed scan, then reconnect"""
+        self._close(reason, time.monotonic() + self.retry_seconds)
+
+    def disable(self, reason: str) -> None:
+        """Stop using the engine for good"""
+        self._close(reason, None)
+
+    def _close(self, reason: str, retry_at: Optional[float]) -> None:
+        with self._lock:
+            self.unavailable_reason = reason
+            self._retry_at = retry_at
+            connection, self._connection = self._connection, None
+        if connection is not None:
+            connection.close()
+
+    def _source(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> Tuple[str, List[Any]]:
+        """SQL selecting the range's bars from the shards holding the symbols, and its parameters"""
+        by_shard: Dict[int, List[str]] = {}
+        for symbol in symbols:
+            by_shard.setdefault(self.shards.shard_for(symbol), []).append(symbol)
+
+        selects = []
+        params: List[Any] = []
+        for shard, shard_symbols in sorted(by_shard.items()):
+            conditions = [f"symbol IN ({', '.join('?' * len(shard_symbols))})", "timeframe = ?"]
+            params.extend(shard_symbols)
+            params.append(timeframe)
+            if start_time:
+                conditions.append("timestamp >= ?")
+                params.append(start_time)
+            if end_time:
+                conditions.append("timestamp <= ?")
+                params.append(end_time)
+            selects.append(
+                "SELECT symbol, timestamp, open_price, high_price, low_price, close_price, volume "
+                f"FROM shard{shard}.kline_data WHERE {' AND '.join(conditions)}"
+            )
+        return " UNION ALL ".join(selects), params
+
+    def _execute(self, sql: str, params: List[Any]) -> List[ScanRow]:
+        connection = self._connect()
+        if connection is None:
+            raise ScanEngineError(self.unavailable_reason or "DuckDB scan engine unavailable")
+        try:
+            # A cursor is a separate connection to the same database, safe to use from this thread
+            with connection.cursor() as cursor:
+                return cursor.execute(sql, params).fetchall()
+        except duckdb.Error as e:
+            raise ScanEngineError(str(e)) from e
+
+    def scan(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[str, BarBatch]:
+        if not symbols:
+            return {}
+        source, params = self._source(symbols, timeframe, start_time, end_time)
+        rows = self._execute(
+            "SELECT symbol, epoch_ms(timestamp), open_price, high_price, low_price, close_price, volume "
+            f"FROM ({source}) ORDER BY symbol, timestamp",
+            params
+        )
+        return _group_rows(rows, symbols, timeframe)
+
+    def resample(
+        self,
+        symbols: Sequence[str],
+        timeframe: str,
+        bucket: timedelta,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Dict[str, BarBatch]:
+        """Bars merged into buckets floored to multiples of bucket since the epoch, as resample_into does"""
+        if not symbols:
+            return {}
+        bucket_ms = bucket // timedelta(milliseconds=1)
+        source, params = self._source(symbols, timeframe, start_time, end_time)
+        rows = self._execute(
+            f"SELECT symbol, epoch_ms(timestamp) // {bucket_ms} * {bucket_ms} AS bucket, "
+            "arg_min(open_price, timestamp), max(high_price), min(low_price), "
+            "arg_max(close_price, timestamp), sum(volume)::BIGINT "
+            f"FROM ({source}) GROUP BY symbol, bucket ORDER BY symbol, bucket",
+            params
+        )
+        return _group_rows(rows, symbols, None)
+
+ScanEngine = Union[SQLiteScanEngine, DuckDBScanEngine]
@@ -0,0 +1,166 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from datetime import datetime
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+from backend.app.config import SNAPSHOT_INTERVAL_SECONDS, SNAPSHOT_PATH
+from backend.app.models.bar_batch import from_epoch_ms, to_epoch_ms
+from backend.app.services.alerts import alert_index
+from backend.app.services.data_cache import data_cache_service
+
+logger = logging.getLogger(__name__)
+
+# Snapshot files start with a fixed header: magic, format version, flags,
+# creation time in epoch milliseconds and the CRC-32 of the body that
+# follows. The body is zlib-compressed JSON mapping section names to each
+# service's state. Files of another format version are ignored.
+MAGIC = b"PAVS"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHqI")
+
+# Set when the snapshot was taken at a clean shutdown, after all writes
+FLAG_CLEAN = 1
+
+class SnapshotError(ValueError):
+    """A snapshot file that cannot be restored"""
+
+def encode_snapshot(sections: Dict[str, Any], clean: bool = False, created_at: Optional[datetime] = None) -> bytes:
+    body = zlib.compress(json.dumps(sections, separators=(",", ":")).encode())
+    header = HEADER.pack(
+        MAGIC,
+        FORMAT_VERSION,
+        FLAG_CLEAN if clean else 0,
+        to_epoch_ms(created_at or datetime.now()),
+        zlib.crc32(body)
+    )
+    return header + body
+
+def decode_snapshot(data: bytes) -> Tuple[Dict[str, Any], bool, datetime]:
+    """Sections, clean flag and creation time of a snapshot; raises SnapshotError"""
+    if len(data) < HEADER.size:
+        raise SnapshotError("Truncated snapshot")
+    magic, version, flags, created_ms, checksum = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotError("Not a snapshot file")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot format version {version}")
+    body = data[HEADER.size:]
+    if zlib.crc32(body) != checksum:
+        raise SnapshotError("Snapshot checksum mismatch")
+    return json.loads(zlib.decompress(body)), bool(flags & FLAG_CLEAN), from_epoch_ms(created_ms)
+
+def write_atomic(path: str, data: bytes) -> None:
+    """Write a file so readers see either the old or the new content, never a partial one"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as snapshot_file:
+        snapshot_file.write(data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary, path)
+
+class SnapshotManager:
+    """Saves in-memory service state to disk and restores it at startup
+
+    Each service registers a section with a dump function returning
+    JSON-compatible state and a load function taking that state and
+    whether the snapshot was taken at a clean shutdown. Snapshots are
+    written every interval while running and once more at shutdown, so a
+    restarted process serves from warm state instead of rebuilding it
+    through cold queries and provider calls. Sections missing from a
+    snapshot, or unknown to this version, are skipped.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH, interval: float = SNAPSHOT_INTERVAL_SECONDS):
+        self.path = path
+        self.interval = interval
+        self._sections: Dict[str, Tuple[Callable[[], Any], Callable[[Any, bool], None]]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.saved_at: Optional[datetime] = None
+        self.last_restore: Optional[Dict[str, Any]] = None
+
+    def register(self, name: str, dump: Callable[[], Any], load: Callable[[Any, bool], None]) -> None:
+        self._sections[name] = (dump, load)
+
+    def dump(self) -> Dict[str, Any]:
+        return {name: dump() for name, (dump, _) in self._sections.items()}
+
+    def save(self, clean: bool = False) -> int:
+        """Write a snapshot of every section; returns its size in bytes"""
+        data = encode_snapshot(self.dump(), clean)
+        write_atomic(self.path, data)
+        self.saved_at = datetime.now()
+        return len(data)
+
+    async def save_async(self, clean: bool = False) -> int:
+        """Take the state on the event loop, then encode and write it in a thread"""
+        sections = self.dump()
+        data = await asyncio.to_thread(encode_snapshot, sections, clean)
+        await asyncio.to_thread(write_atomic, self.path, data)
+        self.saved_at = datetime.now()
+        return len(data)
+
+    def restore(self) -> Dict[str, Any]:
+        """Load the snapshot file into the registered sections, if there is a usable one"""
+        started = time.perf_counter()
+        report: Dict[str, Any] = {"restored": False, "path": self.path}
+        try:
+            with open(self.path, "rb") as snapshot_file:
+                sections, clean, created_at = decode_snapshot(snapshot_file.read())
+        except FileNotFoundError:
+            report["reason"] = "no snapshot"
+        except (OSError, SnapshotError, ValueError) as e:
+            logger.warning("Ignoring snapshot %s: %s", self.path, e)
+            report["reason"] = str(e)
+        else:
+            restored = []
+            for name, (_, load) in self._sections.items():
+                if name not in sections:
+                    continue
+                try:
+                    load(sections[name], clean)
+                    restored.append(name)
+                except Exception:
+                    logger.exception("Failed to restore snapshot section %s", name)
+            report.update({
+                "restored": True,
+                "clean": clean,
+                "created_at": created_at.isoformat(),
+                "age_seconds": round((datetime.now() - created_at).total_seconds(), 1),
+                "sections": restored
+            })
+        report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        self.last_restore = report
+        return report
+
+    def start(self) -> None:
+        """Start periodic snapshots; an interval of 0 only snapshots at shutdown"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.save_async()
+            except Exception:
+                logger.exception("Periodic snapshot failed")
+
+    async def stop(self) -> None:
+        """Stop periodic snapshots"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+# Global instance
+snapshot_manager = SnapshotManager()
+
+snapshot_manager.register("data_cache", data_cache_service.snapshot_state, data_cache_service.restore_state)
+snapshot_manager.register("alerts", alert_index.snapshot_state, alert_index.restore_state)
@@ -0,0 +1,215 @@
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import asyncio
+import json
+import logging
+
+from backend.app.config import TICK_BATCH_WINDOW_MS, TICK_PRICE_DECIMALS
+from backend.app.models.bar_batch import from_epoch_ms, to_epoch_ms
+from backend.app.models.values import Tick
+from backend.app.services.realtime import realtime_hub
+
+logger = logging.getLogger(__name__)
+
+# Binary tick frames start with this format version byte
+FRAME_VERSION = 1
+
+# Frames buffered per client before the oldest are dropped
+_CLIENT_QUEUE_SIZE = 256
+
+def _write_varint(out: bytearray, value: int) -> None:
+    """Append an unsigned LEB128 varint"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _write_signed(out: bytearray, value: int) -> None:
+    """Append a zigzag-encoded signed varint, so small negative deltas stay short"""
+    _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)
+
+def _read_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Read an unsigned varint; returns the value and the offset after it"""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated tick frame")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def _read_signed(data: bytes, offset: int) -> Tuple[int, int]:
+    value, offset = _read_varint(data, offset)
+    return (value >> 1) ^ -(value & 1), offset
+
+def encode_block(symbol: str, ticks: List[Tick], decimals: int = TICK_PRICE_DECIMALS) -> bytes:
+    """Binary block of one symbol's ticks
+
+    Layout: symbol (varint length + UTF-8), price decimals, tick count, then
+    per tick the zigzag varint deltas of the price in units of 10^-decimals
+    and of the time in milliseconds, and the volume as a varint. The first
+    tick's deltas are taken from zero, so every block decodes on its own and
+    a client that joins late or drops frames needs no earlier state.
+    """
+    out = bytearray()
+    name = symbol.encode()
+    _write_varint(out, len(name))
+    out += name
+    _write_varint(out, decimals)
+    _write_varint(out, len(ticks))
+    scale = 10 ** decimals
+    previous_price = 0
+    previous_time = 0
+    for tick in ticks:
+        price = round(tick.price * scale)
+        time_ms = to_epoch_ms(tick.timestamp)
+        _write_signed(out, price - previous_price)
+        _write_signed(out, time_ms - previous_time)
+        _write_varint(out, tick.volume)
+        previous_price = price
+        previous_time = time_ms
+    return bytes(out)
+
+def encode_frame(blocks: List[bytes]) -> bytes:
+    """Binary frame: version byte, block count and the per-symbol blocks"""
+    header = bytearray([FRAME_VERSION])
+    _write_varint(header, len(blocks))
+    return bytes(header) + b"".join(blocks)
+
+def decode_frame(data: bytes) -> List[Dict[str, Any]]:
+    """Ticks of a binary frame, as symbol/price/volume/timestamp dictionaries"""
+    if not data or data[0] != FRAME_VERSION:
+        raise ValueError("Unsupported tick frame version")
+    block_count, offset = _read_varint(data, 1)
+    ticks = []
+    for _ in range(block_count):
+        length, offset = _read_varint(data, offset)
+        symbol = data[offset:offset + length].decode()
+        offset += length
+        decimals, offset = _read_varint(data, offset)
+        count, offset = _read_varint(data, offset)
+        price = 0
+        time_ms = 0
+        for _ in range(count):
+            price_delta, offset = _read_signed(data, offset)
+            time_delta, offset = _read_signed(data, offset)
+            volume, offset = _read_varint(data, offset)
+            price += price_delta
+            time_ms += time_delta
+            ticks.append({
+                "symbol": symbol,
+                "price": round(price / 10 ** decimals, decimals),
+                "volume": volume,
+                "timestamp": from_epoch_ms(time_ms).isoformat()
+            })
+    return ticks
+
+class TickSubscription:
+    """One stream client: its symbols, wire format and bounded frame queue"""
+
+    def __init__(self, symbols: Set[str], binary: bool = False):
+        self.symbols = symbols
+        self.binary = binary
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=_CLIENT_QUEUE_SIZE)
+        self.dropped = 0
+
+    def offer(self, frame: Union[bytes, str]) -> None:
+        """Queue a frame, dropping the oldest one if the client has fallen behind"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(frame)
+
+class TickBatcher:
+    """Coalesces ticks into one frame per client per window
+
+    Ticks of subscribed symbols are buffered and flushed every window. A
+    flush encodes each symbol's ticks once per format, and a client's frame
+    is the concatenation of the encoded blocks of its symbols, so encoding
+    cost does not grow with the number of clients. The flush loop runs only
+    while there are subscribers.
+    """
+
+    def __init__(self, window: float = TICK_BATCH_WINDOW_MS / 1000, decimals: int = TICK_PRICE_DECIMALS):
+        self.window = window
+        self.decimals = decimals
+        self._subscriptions: List[TickSubscription] = []
+        self._pending: Dict[str, List[Tick]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.frames_sent = 0
+        self.blocks_encoded = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def add(self, subscription: TickSubscription) -> None:
+        """Start delivering frames to a client"""
+        self._subscriptions.append(subscription)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def remove(self, subscription: TickSubscription) -> None:
+        """Stop delivering frames to a client"""
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+        if not self._subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._pending.clear()
+
+    async def on_tick(self, tick: Tick) -> None:
+        """Tick stream listener: buffer ticks of symbols some client follows"""
+        symbol = tick.symbol
+        if any(symbol in subscription.symbols for subscription in self._subscriptions):
+            self._pending.setdefault(symbol, []).append(tick)
+
+    def flush(self) -> None:
+        """Encode the buffered ticks and queue a frame for every client following them"""
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        binary_blocks: Dict[str, bytes] = {}
+        json_blocks: Dict[str, str] = {}
+        for subscription in self._subscriptions:
+            symbols = [symbol for symbol in pending if symbol in subscription.symbols]
+            if not symbols:
+                continue
+            if subscription.binary:
+                for symbol in symbols:
+                    if symbol not in binary_blocks:
+                        binary_blocks[symbol] = encode_block(symbol, pending[symbol], self.decimals)
+                        self.blocks_encoded += 1
+                subscription.offer(encode_frame([binary_blocks[symbol] for symbol in symbols]))
+            else:
+                for symbol in symbols:
+                    if symbol not in json_blocks:
+                        json_blocks[symbol] = json.dumps([tick.to_dict() for tick in pending[symbol]], separators=(",", ":"))[1:-1]
+                        self.blocks_encoded += 1
+                subscription.offer('{"type":"ticks","ticks":[' + ",".join(json_blocks[symbol] for symbol in symbols) + "]}")
+            self.frames_sent += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Tick batch flush failed")
+
+    async def stop(self) -> None:
+        """Stop the flush loop at shutdown"""
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+# Global instance
+tick_batcher = TickBatcher()
+
+# Buffer ticks for stream clients
+realtime_hub.add_listener(tick_batcher.on_tick)
@@ -0,0 +1,247 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+import re
+
+from backend.app.config import MARKET_HOLIDAYS
+from backend.app.services.market_data import TIMEFRAME_DURATIONS, align_to_bar
+
+# How far the calendar looks for the next or previous session
+_SEARCH_DAYS = 30
+
+Interval = Tuple[datetime, datetime]
+
+class TradingCalendar:
+    """Trading sessions of an exchange, in the exchange's naive local time
+
+    Day sessions run on trading days: weekdays that are not holidays. A night
+    session opens on the evening of a trading day and counts towards the
+    next trading day; it is skipped before holidays, when the exchange does
+    not trade overnight. A night session may close after midnight.
+
+    A bar of an intraday timeframe can exist when its time span overlaps a
+    session. A daily bar can exist on every trading day.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        sessions: Sequence[Tuple[time, time]],
+        night_session: Optional[Tuple[time, time]] = None,
+        holidays: Iterable[date] = ()
+    ):
+        self.name = name
+        self.sessions = list(sessions)
+        self.night_session = night_session
+        self.holidays: FrozenSet[date] = frozenset(holidays)
+
+    def __repr__(self) -> str:
+        return f"<TradingCalendar({self.name})>"
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self.holidays
+
+    def _has_night_session(self, day: date) -> bool:
+        """Night sessions run unless a holiday falls before the next trading day"""
+        if self.night_session is None or not self.is_trading_day(day):
+            return False
+        following = day + timedelta(days=1)
+        while not self.is_trading_day(following):
+            if following in self.holidays:
+                return False
+            following += timedelta(days=1)
+        return True
+
+    def day_intervals(self, day: date) -> List[Interval]:
+        """Sessions opening on a calendar day, in time order"""
+        intervals = []
+        if self.is_trading_day(day):
+            intervals = [(datetime.combine(day, start), datetime.combine(day, end)) for start, end in self.sessions]
+        if self._has_night_session(day):
+            start, end = self.night_session
+            close_day = day + timedelta(days=1) if end <= start else day
+            intervals.append((datetime.combine(day, start), datetime.combine(close_day, end)))
+        return intervals
+
+    def intervals(self, start: datetime, end: datetime) -> Iterator[Interval]:
+        """Sessions overlapping [start, end], in time order"""
+        # Start a day early for night sessions that run past midnight
+        day = start.date() - timedelta(days=1)
+        while day <= end.date():
+            for interval in self.day_intervals(day):
+                if interval[1] > start and interval[0] <= end:
+                    yield interval
+            day += timedelta(days=1)
+
+    def is_open(self, timestamp: datetime) -> bool:
+        return any(open_ <= timestamp < close for open_, close in self.intervals(timestamp, timestamp))
+
+    def has_session_between(self, start: datetime, end: datetime) -> bool:
+        """Whether the market was open at any moment after start and up to end"""
+        return any(close > start and open_ < end for open_, close in self.intervals(start, end))
+
+    def first_bar_at_or_after(self, timestamp: datetime, timeframe: str) -> Optional[datetime]:
+        """Start of the first bar that can exist at or after a time"""
+        duration = TIMEFRAME_DURATIONS[timeframe]
+        if duration >= timedelta(days=1):
+            day = timestamp.date() if timestamp.time() == time(0) else timestamp.date() + timedelta(days=1)
+            for offset in range(_SEARCH_DAYS):
+                if self.is_trading_day(day + timedelta(days=offset)):
+                    return datetime.combine(day + timedelta(days=offset), time(0))
+            return None
+
+        for open_, close in self.intervals(timestamp, timestamp + timedelta(days=_SEARCH_DAYS)):
+            bar = align_to_bar(max(timestamp, open_), timeframe)
+            if bar < timestamp:
+                bar += duration
+            if bar < close:
+                return bar
+        return None
+
+    def last_bar_at_or_before(self, timestamp: datetime, timeframe: str) -> Optional[datetime]:
+        """Start of the last bar that can exist at or before a time"""
+        duration = TIMEFRAME_DURATIONS[timeframe]
+        if duration >= timedelta(days=1):
+            for offset in range(_SEARCH_DAYS):
+                day = timestamp.date() - timedelta(days=offset)
+                if self.is_trading_day(day):
+                    return datetime.combine(day, time(0))
+            return None
+
+        intervals = list(self.intervals(timestamp - timedelta(days=_SEARCH_DAYS), timestamp))
+        for open_, close in reversed(intervals):
+            if open_ <= timestamp:
+                return align_to_bar(min(timestamp, close - timedelta(microseconds=1)), timeframe)
+        return None
+
+    def bars(self, start: datetime, end: datetime, timeframe: str) -> Iterator[datetime]:
+        """Start times of every bar that can exist in [start, end]"""
+        duration = TIMEFRAME_DURATIONS[timeframe]
+        if duration >= timedelta(days=1):
+            day = self.first_bar_at_or_after(start, timeframe)
+            while day is not None and day <= end:
+                if self.is_trading_day(day.date()):
+                    yield day
+                day += timedelta(days=1)
+            return
+
+        previous = None
+        for open_, close in self.intervals(start, end):
+            bar = align_to_bar(max(start, open_), timeframe)
+            if bar < start:
+                bar += duration
+            while bar < close and bar <= end:
+                # A bar spanning two sessions is yielded once
+                if previous is None or bar > previous:
+                    yield bar
+                    previous = bar
+                bar += duration
+
+    def find_gaps(
+        self,
+        timestamps: Sequence[datetime],
+        start: datetime,
+        end: datetime,
+        timeframe: str
+    ) -> List[Tuple[datetime, datetime]]:
+        """Runs of bars that can exist in [start, end] but are missing from timestamps
+
+        Each gap is the (first, last) bar start of a run of consecutive
+        missing bars; closed periods never count as gaps.
+        """
+        present = set(timestamps)
+        gaps = []
+        run_start = None
+        run_end = None
+        for bar in self.bars(start, end, timeframe):
+            if bar in present:
+                if run_start is not None:
+                    gaps.append((run_start, run_end))
+                    run_start = None
+            else:
+                if run_start is None:
+                    run_start = bar
+                run_end = bar
+        if run_start is not None:
+            gaps.append((run_start, run_end))
+        return gaps
+
+# Weekday closures of the mainland exchanges (SSE, SZSE, CFFEX and the
+# commodity exchanges share them) from the exchanges' yearly holiday notices.
+# Only years whose notice has been published are listed; add each year once
+# its notice is out, usually in December. Until a release ships it, list the
+# following year's closures in the MARKET_HOLIDAYS setting, which is added to
+# these, as are unscheduled closures.
+CN_EXCHANGE_HOLIDAYS: Dict[int, List[date]] = {
+    2026: [
+        date(2026, 1, 1), date(2026, 1, 2),
+        date(2026, 2, 16), date(2026, 2, 17), date(2026, 2, 18), date(2026, 2, 19), date(2026, 2, 20), date(2026, 2, 23),
+        date(2026, 4, 6),
+        date(2026, 5, 1), date(2026, 5, 4), date(2026, 5, 5),
+        date(2026, 6, 19),
+        date(2026, 9, 25),
+        date(2026, 10, 1), date(2026, 10, 2), date(2026, 10, 5), date(2026, 10, 6), date(2026, 10, 7),
+    ],
+}
+
+_HOLIDAYS = frozenset(MARKET_HOLIDAYS).union(*CN_EXCHANGE_HOLIDAYS.values())
+
+# Shanghai and Shenzhen stock exchanges
+CN_EQUITY = TradingCalendar(
+    "cn_equity",
+    [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 0))],
+    holidays=_HOLIDAYS
+)
+
+# CFFEX stock index futures trade equity hours; treasury futures close at 15:15
+CN_INDEX_FUTURES = TradingCalendar(
+    "cn_index_futures",
+    [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 0))],
+    holidays=_HOLIDAYS
+)
+CN_BOND_FUTURES = TradingCalendar(
+    "cn_bond_futures",
+    [(time(9, 30), time(11, 30)), (time(13, 0), time(15, 15))],
+    holidays=_HOLIDAYS
+)
+
+# Commodity futures day sessions, with the 10:15-10:30 break
+_COMMODITY_DAY_SESSIONS = [(time(9, 0), time(10, 15)), (time(10, 30), time(11, 30)), (time(13, 30), time(15, 0))]
+
+# Close of the night session by commodity product code; products not listed
+# trade day sessions only
+_NIGHT_SESSION_CLOSE: Dict[str, time] = {
+    **{product: time(2, 30) for product in ("au", "ag", "sc")},
+    **{product: time(1, 0) for product in ("cu", "al", "zn", "pb", "ni", "sn", "ss", "bc", "ao")},
+    **{
+        product: time(23, 0)
+        for product in (
+            "rb", "hc", "bu", "ru", "fu", "sp", "br", "nr", "lu",
+            "i", "j", "jm", "a", "b", "m", "y", "p", "c", "cs", "l", "v", "pp", "eg", "eb", "pg", "rr",
+            "sr", "cf", "cy", "ta", "ma", "fg", "rm", "oi", "sa", "pf", "px", "sh"
+        )
+    }
+}
+
+_COMMODITY_CALENDARS: Dict[Optional[time], TradingCalendar] = {
+    close: TradingCalendar(
+        f"cn_commodity_futures_{close.strftime('%H%M') if close else 'day'}",
+        _COMMODITY_DAY_SESSIONS,
+        night_session=(time(21, 0), close) if close else None,
+        holidays=_HOLIDAYS
+    )
+    for close in {None, *_NIGHT_SESSION_CLOSE.values()}
+}
+
+_PRODUCT_CODE = re.compile(r"^[A-Za-z]+")
+
+def calendar_for(symbol: str) -> TradingCalendar:
+    """Calendar of a symbol: digits are equities, a letter prefix is a futures product"""
+    match = _PRODUCT_CODE.match(symbol)
+    if match is None:
+        return CN_EQUITY
+    product = match.group(0).lower()
+    if product in ("if", "ih", "ic", "im"):
+        return CN_INDEX_FUTURES
+    if product in ("t", "tf", "ts", "tl"):
+        return CN_BOND_FUTURES
+    return _COMMODITY_CALENDARS[_NIGHT_SESSION_CLOSE.get(product)]
@@ -0,0 +1,125 @@
+from typing import Awaitable, Callable, List, Optional
+import asyncio
+import logging
+
+from backend.app.models.values import Tick
+
+logger = logging.getLogger(__name__)
+
+BatchWriter = Callable[[List[Tick]], Awaitable[None]]
+
+class WriteQueue:
+    """Buffers tick writes and flushes them to the database in batches
+
+    Producers enqueue Tick values without waiting on SQLite. A background
+    task collects up to batch_size ticks, or whatever arrived within
+    flush_interval, and hands them to the batch writer in one call. When the
+    queue is full the oldest pending tick is dropped so producers never block.
+    drain() flushes everything still pending and stops the task, which is
+    what shutdown uses to avoid losing buffered writes.
+    """
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        batch_size: int = 500,
+        flush_interval: float = 0.25,
+        max_pending: int = 100_000
+    ):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._task: Optional[asyncio.Task] = None
+        self._batch: List[Tick] = []
+        self._inflight: Optional[asyncio.Future] = None
+        self.dropped = 0
+        self.written = 0
+
+    @property
+    def depth(self) -> int:
+        """Number of items waiting to be written"""
+        return self._queue.qsize() + len(self._batch)
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def put(self, item: Tick) -> None:
+        """Enqueue a tick without blocking"""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(item)
+
+    async def _collect(self) -> None:
+        """Wait for the first item, then gather more until the batch is full or the interval ends
+        
+        Items are gathered into self._batch so nothing is lost if the task is
+        cancelled while waiting.
+        """
+        self._batch.append(await self._queue.get())
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(self._batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _write(self, batch: List[Tick]) -> None:
+        try:
+            await self.writer(batch)
+            self.written += len(batch)
+        except Exception:
+            logger.exception("Failed to write batch of %d items", len(batch))
+
+    async def run(self) -> None:
+        """Write batches until cancelled"""
+        while True:
+            await self._collect()
+            batch, self._batch = self._batch, []
+            # Shielded so cancelling the task never interrupts a write in progress
+            self._inflight = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._inflight)
+            self._inflight = None
+
+    def start(self) -> None:
+        """Start the background writer task
+        
+        The queue is rebuilt with any pending items so the writer can be
+        restarted in a new event loop, as when the app is started again in
+        the same process.
+        """
+        if not self.is_running:
+            queue: asyncio.Queue = asyncio.Queue(maxsize=self._queue.maxsize)
+            while not self._queue.empty():
+                queue.put_nowait(self._queue.get_nowait())
+            self._queue = queue
+            self._task = asyncio.create_task(self.run())
+
+    async def flush(self) -> None:
+        """Write everything currently pending"""
+        if self._batch:
+            batch, self._batch = self._batch, []
+            await self._write(batch)
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait() for _ in range(min(self.batch_size, self._queue.qsize()))]
+            await self._write(batch)
+
+    async def drain(self) -> None:
+        """Stop the background task and write everything still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._inflight is not None:
+            await self._inflight
+            self._inflight = None
+        await self.flush()
@@ -1,6 +1,14 @@
 import pytest
 from fastapi.testclient import TestClient
 from backend.app.main import app
+from backend.app.services.snapshot import snapshot_manager
+
+@pytest.fixture(autouse=True)
+def snapshot_path(tmp_path, monkeypatch):
+    """Keep warm-restart snapshots written by app startups out of the data directory"""
+    path = str(tmp_path / "state.snap")
+    monkeypatch.setattr(snapshot_manager, "path", path)
+    return path
 
 @pytest.fixture
 def client():
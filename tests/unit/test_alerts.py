@@ -0,0 +1,112 @@
+import pytest
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from backend.app.main import app
+from backend.app.models.values import Tick
+from backend.app.services.alerts import AlertIndex, alert_index, measured_move_levels
+
+def test_measured_move_levels():
+    assert measured_move_levels(95.0, 100.0) == {"stop": 95.0, "entry": 100.0, "target_1r": 105.0, "target_2r": 110.0}
+    # Shorts: stop above entry, targets below it
+    assert measured_move_levels(105.0, 100.0)["target_2r"] == 90.0
+
+def test_crossed_levels_between_ticks():
+    """Test a move triggers exactly the levels it passes, once"""
+    index = AlertIndex()
+    for price in [99.0, 100.0, 101.0, 102.0, 105.0]:
+        index.add("000001", price)
+    index.add("600000", 101.0)
+    
+    assert [alert["price"] for alert in index.crossed("000001", 99.5, 101.0)] == [100.0, 101.0]
+    # A level equal to the previous price was reached by the previous tick
+    assert [alert["price"] for alert in index.crossed("000001", 102.0, 98.0)] == [99.0]
+    assert index.crossed("000001", 101.0, 101.9) == []
+    assert [alert["price"] for alert in index.active("000001")] == [102.0, 105.0]
+    assert len(index) == 3
+
+def test_remove_alerts():
+    index = AlertIndex()
+    first = index.add("000001", 100.0)
+    second = index.add("000001", 100.0)
+    measurement = index.add_measured_move("000001", 95.0, 100.0)
+    
+    assert index.remove(second["id"]) == second
+    assert index.remove(second["id"]) is None
+    assert [alert["kind"] for alert in index.remove_measurement(measurement["measurement_id"])] == ["stop", "target_1r", "target_2r"]
+    assert index.active() == [first]
+
+@pytest.mark.asyncio
+async def test_on_tick_delivers_triggered_alerts():
+    index = AlertIndex()
+    received = []
+    
+    async def listener(events):
+        received.extend(events)
+    
+    index.add_listener(listener)
+    measurement = index.add_measured_move("000001", 95.0, 100.0)
+    
+    await index.on_tick(Tick.from_dict({"symbol": "000001", "price": 100.0}))
+    await index.on_tick(Tick.from_dict({"symbol": "000001", "price": 106.0}))
+    
+    assert [event["kind"] for event in received] == ["target_1r"]
+    assert received[0]["trigger_price"] == 106.0
+    assert received[0]["measurement_id"] == measurement["measurement_id"]
+
+@pytest.mark.asyncio
+async def test_tick_streams_are_released_with_the_last_alert():
+    index = AlertIndex()
+    
+    with patch('backend.app.services.alerts.realtime_hub') as mock_hub:
+        mock_hub.subscribe = AsyncMock()
+        mock_hub.unsubscribe = AsyncMock()
+        
+        alert = await index.create("000001", 105.0)
+        measurement = await index.create_measured_move("000001", 95.0, 100.0)
+        mock_hub.subscribe.assert_called_once_with("000001")
+        
+        await index.delete(alert["id"])
+        await index.on_tick(Tick.from_dict({"symbol": "000001", "price": 100.0}))
+        await index.on_tick(Tick.from_dict({"symbol": "000001", "price": 94.0}))
+        mock_hub.unsubscribe.assert_not_called()
+        
+        await index.delete_measurement(measurement["measurement_id"])
+        mock_hub.unsubscribe.assert_called_once_with("000001")
+
+def test_create_alert_rejects_invalid_symbols():
+    client = TestClient(app)
+    
+    assert client.post("/api/alerts?symbol=A%25B&price=10").status_code == 400
+    assert client.post("/api/alerts/measured-move?symbol=x%20y&stop=95&entry=100").status_code == 400
+
+def test_measured_move_endpoint_and_stream():
+    """Test alerts registered over HTTP are pushed to stream clients when crossed"""
+    client = TestClient(app)
+    
+    with patch('backend.app.services.alerts.realtime_hub') as mock_hub:
+        mock_hub.subscribe = AsyncMock()
+        response = client.post("/api/alerts/measured-move?symbol=TEST01&stop=95&entry=100")
+    
+    assert response.status_code == 200
+    measurement = response.json()
+    assert measurement["levels"]["target_2r"] == 110.0
+    mock_hub.subscribe.assert_called_once_with("TEST01")
+    
+    try:
+        with client.websocket_connect("/api/alerts/stream?symbol=TEST01") as websocket:
+            websocket.portal.call(alert_index.on_tick, Tick.from_dict({"symbol": "TEST01", "price": 100.0}))
+            websocket.portal.call(alert_index.on_tick, Tick.from_dict({"symbol": "TEST01", "price": 94.0}))
+            
+            message = websocket.receive_json()
+            assert message["type"] == "alerts"
+            assert [alert["kind"] for alert in message["alerts"]] == ["stop"]
+        
+        response = client.get("/api/alerts?symbol=TEST01")
+        assert response.json()["count"] == 2
+    finally:
+        client.delete(f"/api/alerts/measured-move/{measurement['measurement_id']}")
+    
+    assert client.get("/api/alerts?symbol=TEST01").json()["count"] == 0
+    assert client.post("/api/alerts/measured-move?symbol=TEST01&stop=100&entry=100").status_code == 400
+    assert client.delete("/api/alerts/999999").status_code == 404
@@ -0,0 +1,144 @@
+import asyncio
+import math
+import multiprocessing
+import pytest
+import pytest_asyncio
+from array import array
+from datetime import timedelta
+from multiprocessing.shared_memory import SharedMemory
+
+from backend.app.services.analytics import (
+    AnalyticsBusyError,
+    AnalyticsPool,
+    AnalyticsTimeoutError,
+    ema_into,
+    sma_into,
+)
+
+def _slow_job(shm_name, length, seconds):
+    import time
+    time.sleep(seconds)
+
+def _double_job(shm_name, length):
+    shm = SharedMemory(name=shm_name, track=False)
+    try:
+        with shm.buf.cast("d") as view:
+            for index in range(length):
+                view[length + index] = view[index] * 2
+    finally:
+        shm.close()
+    return length
+
+@pytest_asyncio.fixture
+async def pool():
+    pool = AnalyticsPool(max_workers=1, max_pending=4, timeout=5.0, inline_threshold=0)
+    pool.start()
+    yield pool
+    await pool.stop()
+
+def test_moving_averages():
+    closes = [1.0, 2.0, 3.0, 4.0, 5.0]
+    ema = [0.0] * 5
+    ma = [0.0] * 5
+    
+    ema_into(closes, 3, ema)
+    sma_into(closes, 3, ma)
+    
+    assert math.isnan(ema[1]) and math.isnan(ma[1])
+    assert ma[2:] == [2.0, 3.0, 4.0]
+    # Seeded with the first simple average, then smoothed with alpha 2 / (3 + 1)
+    assert ema[2:] == [2.0, 3.0, 4.0]
+
+@pytest.mark.asyncio
+async def test_indicators_in_worker_match_inline(pool):
+    """Test indicators computed over shared memory match the in-process result"""
+    closes = [100.0 + (index % 7) * 0.5 for index in range(100)]
+    
+    pooled = await pool.indicators(closes)
+    inline = await AnalyticsPool(inline_threshold=10_000).indicators(closes)
+    
+    assert pooled == inline
+    assert pooled["ema20"][18] is None and pooled["ema20"][19] is not None
+    assert pooled["ma16"][14] is None and pooled["ma16"][15] == pytest.approx(sum(closes[:16]) / 16)
+    assert pool.completed == 1
+
+@pytest.mark.asyncio
+async def test_run_job_exchanges_columns_through_shared_memory(pool):
+    outputs, result = await pool.run_job(_double_job, [[1.0, 2.5, 4.0]], "d")
+    
+    assert outputs == [array("d", [2.0, 5.0, 8.0])]
+    assert result == 3
+
+@pytest.mark.asyncio
+async def test_resample(pool):
+    """Test 1m bars are merged into 5m buckets aligned to the bar grid"""
+    bars = [
+        {"time": f"2023-12-01T09:{minute:02d}:00", "open": float(minute), "high": minute + 1.0,
+         "low": minute - 1.0, "close": minute + 0.5, "volume": 10}
+        for minute in range(33, 41)
+    ]
+    
+    resampled = await pool.resample(bars, timedelta(minutes=5))
+    
+    assert [bar["time"] for bar in resampled] == ["2023-12-01T09:30:00", "2023-12-01T09:35:00", "2023-12-01T09:40:00"]
+    assert resampled[0] == {"time": "2023-12-01T09:30:00", "open": 33.0, "high": 35.0, "low": 32.0, "close": 34.5, "volume": 20}
+    assert resampled[1]["volume"] == 50
+    assert resampled.volumes.typecode == "q"
+    assert resampled == await AnalyticsPool(inline_threshold=10_000).resample(bars, timedelta(minutes=5))
+
+@pytest.mark.asyncio
+async def test_queue_depth_limit():
+    pool = AnalyticsPool(max_workers=1, max_pending=1, timeout=5.0)
+    pool.start()
+    try:
+        first = asyncio.create_task(pool.run_job(_slow_job, [[0.0]], "", 0.5))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AnalyticsBusyError):
+            await pool.run_job(_slow_job, [[0.0]], "", 0)
+        assert pool.rejected == 1
+        await first
+    finally:
+        await pool.stop()
+
+@pytest.mark.asyncio
+async def test_job_timeout_replaces_pool():
+    pool = AnalyticsPool(max_workers=1, max_pending=4, timeout=2.0)
+    pool.start()
+    try:
+        hung = asyncio.create_task(pool.run_job(_slow_job, [[0.0]], "", 30))
+        await asyncio.sleep(0.1)
+        queued = asyncio.create_task(pool.run_job(_double_job, [[1.0]], "d"))
+        with pytest.raises(AnalyticsTimeoutError):
+            await hung
+        assert pool.timed_out == 1
+        
+        # The job waiting behind it was never handed to the old pool and
+        # runs on the replacement, not held up by the stuck worker
+        outputs, _ = await queued
+        assert outputs == [array("d", [2.0])]
+        assert pool.pending == 0
+        
+        # The hung worker is terminated rather than left running
+        for _ in range(100):
+            if len(multiprocessing.active_children()) <= 1:
+                break
+            await asyncio.sleep(0.02)
+        assert len(multiprocessing.active_children()) == 1
+    finally:
+        await pool.stop()
+
+@pytest.mark.asyncio
+async def test_timeout_excludes_time_spent_queued():
+    pool = AnalyticsPool(max_workers=1, max_pending=4, timeout=1.5)
+    pool.start()
+    try:
+        # Spawn the worker first, so only the queued jobs are timed
+        await pool.run_job(_slow_job, [[0.0]], "", 0)
+        
+        # Together the jobs take longer than the timeout, each one does not
+        results = await asyncio.gather(*(pool.run_job(_slow_job, [[0.0]], "", 0.6) for _ in range(3)))
+        assert len(results) == 3
+        assert pool.timed_out == 0
+    finally:
+        await pool.stop()
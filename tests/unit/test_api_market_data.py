@@ -1,10 +1,13 @@
+import json
 import pytest
+from array import array
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock, patch
 from datetime import datetime
 
 from backend.app.main import app
 from backend.app.database import create_tables, drop_tables
+from backend.app.models.bar_batch import BarBatch
 
 @pytest.fixture(scope="function")
 def setup_test_db():
@@ -164,7 +167,7 @@ def test_get_available_timeframes(client):
     assert "1h" in codes
     assert "1d" in codes
 
-def test_clear_cache(client):
+def test_clear_cache(setup_test_db, client):
     """Test cache clearing endpoint"""
     
     response = client.post("/api/market-data/cache/clear")
@@ -176,7 +179,7 @@ def test_clear_cache(client):
     assert "timestamp" in data
     assert "all symbols" in data["message"]
 
-def test_clear_cache_specific_symbol(client):
+def test_clear_cache_specific_symbol(setup_test_db, client):
     """Test cache clearing for specific symbol"""
     
     response = client.post("/api/market-data/cache/clear?symbol=000001")
@@ -186,13 +189,25 @@ def test_clear_cache_specific_symbol(client):
     
     assert "000001" in data["message"]
 
+def test_clear_cache_invalidates_selected_symbols(client):
+    """Test cache clearing passes the selected symbols and timeframe to the cache service"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.invalidate.return_value = {"bars": 10, "ticks": 0}
+        
+        response = client.post("/api/market-data/cache/clear?symbol=000001,600000&timeframe=1m")
+        
+        assert response.status_code == 200
+        assert response.json()["deleted"] == {"bars": 10, "ticks": 0}
+        mock_cache.invalidate.assert_called_once_with(["000001", "600000"], "1m")
+
 def test_health_check_endpoint(setup_test_db, client):
     """Test market data health check endpoint"""
     
-    with patch('backend.app.api.market_data.market_data_provider') as mock_provider, \
+    with patch('backend.app.api.market_data.health_monitor') as mock_monitor, \
          patch('backend.app.api.market_data.data_cache_service') as mock_cache:
         
-        mock_provider.is_connected = True
+        mock_monitor.snapshot.return_value = {"provider_connected": True, "database_ok": True}
         mock_cache.get_kline_data = AsyncMock(return_value=[{"test": "data"}])
         
         response = client.get("/api/market-data/health")
@@ -204,17 +219,439 @@ def test_health_check_endpoint(setup_test_db, client):
         assert data["market_data_connected"] == True
         assert data["data_available"] == True
         assert "timestamp" in data
+        
+        # Probes must not fetch from the provider or rewrite the cache
+        mock_cache.get_kline_data.assert_not_called()
 
 def test_health_check_degraded(setup_test_db, client):
     """Test health check when service is degraded"""
     
-    with patch('backend.app.api.market_data.market_data_provider') as mock_provider:
+    with patch('backend.app.services.health.market_data_provider') as mock_provider:
         mock_provider.is_connected = False
         
+        from backend.app.services.health import health_monitor
+        health_monitor.check()
+        
         response = client.get("/api/market-data/health")
         
         assert response.status_code == 200
         data = response.json()
         
         assert data["status"] == "degraded"
-        assert data["market_data_connected"] == False
\ No newline at end of file
+        assert data["market_data_connected"] == False
+
+def test_liveness_check(client):
+    """Test liveness probe"""
+    
+    response = client.get("/api/market-data/health/live")
+    
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+def test_readiness_check(setup_test_db, client):
+    """Test readiness probe reflects startup, provider and database status"""
+    from backend.app.services.health import HealthMonitor
+    
+    monitor = HealthMonitor()
+    with patch('backend.app.api.market_data.health_monitor', monitor), \
+         patch('backend.app.services.health.market_data_provider') as mock_provider:
+        mock_provider.is_connected = True
+        
+        response = client.get("/api/market-data/health/ready")
+        assert response.status_code == 503
+        assert response.json()["started"] == False
+        
+        monitor.started = True
+        response = client.get("/api/market-data/health/ready")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["status"] == "ready"
+        assert data["database_ok"] == True
+        assert "write_queue_depth" in data
+
+def test_deep_health_check_rate_limited(client):
+    """Test deep check calls the provider at most once per interval and does not cache data"""
+    from backend.app.services.health import HealthMonitor
+    
+    monitor = HealthMonitor(deep_min_interval=60)
+    with patch('backend.app.api.market_data.health_monitor', monitor), \
+         patch('backend.app.services.health.market_data_provider') as mock_provider, \
+         patch('backend.app.services.health.data_cache_service') as mock_cache:
+        mock_provider.get_kline_data = AsyncMock(return_value=[{"test": "data"}])
+        
+        first = client.get("/api/market-data/health/deep").json()
+        second = client.get("/api/market-data/health/deep").json()
+        
+        assert first["status"] == "healthy"
+        assert first["cached"] == False
+        assert second["cached"] == True
+        mock_provider.get_kline_data.assert_called_once()
+        assert not mock_cache.method_calls
+
+def test_deep_health_check_provider_failure(client):
+    """Test deep check reports provider errors as unhealthy"""
+    from backend.app.services.health import HealthMonitor
+    
+    monitor = HealthMonitor()
+    with patch('backend.app.api.market_data.health_monitor', monitor), \
+         patch('backend.app.services.health.market_data_provider') as mock_provider:
+        mock_provider.get_kline_data = AsyncMock(side_effect=ConnectionError("Not connected"))
+        
+        response = client.get("/api/market-data/health/deep")
+        
+        assert response.status_code == 503
+        assert response.json()["error"] == "Not connected"
+
+def test_fast_json_response_matches_default_encoder(sample_kline_response):
+    """Test fast JSON rendering matches FastAPI's default JSONResponse"""
+    from fastapi.responses import JSONResponse
+    from backend.app.api.responses import FastJSONResponse
+    
+    payload = {
+        "symbol": "000001",
+        "timeframe": "1m",
+        "data": sample_kline_response + [{"time": "2023-12-01T09:32:00", "name": "平安银行", "close": 0.1 + 0.2}],
+        "count": 3
+    }
+    
+    assert FastJSONResponse(payload).body == JSONResponse(payload).body
+    
+    # Batches are encoded from their columns to the same bytes as their dictionaries
+    batch = BarBatch.of(sample_kline_response)
+    assert FastJSONResponse({"data": batch, "empty": batch[:0]}).body == JSONResponse({"data": batch.to_dicts(), "empty": []}).body
+    
+    # Stored batches carry their names, which may contain format characters
+    batch.ids, batch.symbol, batch.timeframe = array("q", range(len(batch))), "A%B", "1m"
+    assert json.loads(FastJSONResponse(batch).body) == batch.to_dicts()
+
+def test_get_kline_data_etag_not_modified(setup_test_db, client, sample_kline_response):
+    """Test K-line responses carry an ETag and revalidate to 304"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        mock_cache.get_cache_version.return_value = 7
+        mock_cache.is_cache_fresh.return_value = False
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m")
+        etag = response.headers["etag"]
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "no-cache"
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        
+        # A new cache version invalidates the ETag
+        mock_cache.get_cache_version.return_value = 8
+        response = client.get("/api/market-data/kline/000001?timeframe=1m", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+def test_get_kline_data_fresh_revalidation_skips_query(client):
+    """Test revalidating a fresh series answers 304 without reading the cache"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=[])
+        mock_cache.get_cache_version.return_value = 7
+        mock_cache.is_cache_fresh.return_value = True
+        
+        from backend.app.api.market_data import _kline_etag
+        etag = _kline_etag("000001", "1m", None, None, "rows")
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m", headers={"If-None-Match": etag})
+        
+        assert response.status_code == 304
+        mock_cache.get_kline_data.assert_not_called()
+        
+        # The same range in the columnar layout is a different representation
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&layout=columns", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&layout=table")
+        assert response.status_code == 422
+
+def test_get_kline_data_historical_range_is_immutable(setup_test_db, client, sample_kline_response):
+    """Test closed historical ranges are marked immutable only when complete"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        mock_cache.get_cache_version.return_value = 1
+        mock_cache.is_cache_fresh.return_value = False
+        
+        response = client.get(
+            "/api/market-data/kline/000001"
+            "?timeframe=1m"
+            "&start_time=2023-12-01T09:30:00"
+            "&end_time=2023-12-01T09:31:00"
+        )
+        
+        assert response.status_code == 200
+        assert "immutable" in response.headers["cache-control"]
+        
+        # A closed range missing bars may still be backfilled, so it must revalidate
+        response = client.get(
+            "/api/market-data/kline/000001"
+            "?timeframe=1m"
+            "&start_time=2023-12-01T09:30:00"
+            "&end_time=2023-12-01T10:00:00"
+        )
+        
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "no-cache"
+
+def test_get_available_symbols_not_modified(client):
+    """Test symbols listing revalidates to 304"""
+    
+    response = client.get("/api/market-data/symbols")
+    etag = response.headers["etag"]
+    
+    response = client.get("/api/market-data/symbols", headers={"If-None-Match": etag})
+    
+    assert response.status_code == 304
+
+def test_get_kline_data_since_version(client, sample_kline_response):
+    """Test delta sync returns only changed bars for a known version"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_cache_version.return_value = 42
+        mock_cache.get_kline_changes.return_value = sample_kline_response[1:]
+        mock_cache.get_kline_data = AsyncMock()
+        mock_cache.refresh_if_stale = AsyncMock()
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&since=40")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["full"] == False
+        assert data["version"] == 42
+        assert data["count"] == 1
+        assert response.headers["x-cache-version"] == "42"
+        mock_cache.get_kline_changes.assert_called_once_with("000001", "1m", 40, None, None)
+        mock_cache.refresh_if_stale.assert_awaited_once_with("000001", "1m", None, None)
+        mock_cache.get_kline_data.assert_not_called()
+
+def test_get_kline_data_since_unknown_version(client, sample_kline_response):
+    """Test delta sync falls back to the full series when the version is too old"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_cache_version.return_value = 42
+        mock_cache.get_kline_changes.return_value = None
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        mock_cache.refresh_if_stale = AsyncMock()
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&since=1")
+        
+        data = response.json()
+        assert data["full"] == True
+        assert data["count"] == 2
+
+def test_get_kline_data_since_timestamp(client, sample_kline_response):
+    """Test a since timestamp narrows the requested range"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response[1:])
+        mock_cache.get_cache_version.return_value = 1
+        mock_cache.is_cache_fresh.return_value = False
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&since=2023-12-01T09:31:00")
+        
+        assert response.status_code == 200
+        call_args = mock_cache.get_kline_data.call_args
+        assert call_args.kwargs["start_time"] == datetime(2023, 12, 1, 9, 31)
+
+def test_get_latest_prices(client):
+    """Test bulk latest price endpoint"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_latest_prices.return_value = {"000001": 102.5, "600000": None}
+        
+        response = client.get("/api/market-data/latest-prices?symbols=000001,600000")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["prices"] == {"000001": 102.5, "600000": None}
+        assert data["count"] == 2
+        mock_cache.get_latest_prices.assert_called_once_with(["000001", "600000"])
+
+def test_get_latest_prices_requires_symbols(client):
+    """Test bulk latest price endpoint rejects an empty symbol list"""
+    
+    response = client.get("/api/market-data/latest-prices?symbols=,")
+    
+    assert response.status_code == 400
+
+def test_get_indicators(client, sample_kline_response):
+    """Test indicators are returned per bar, None until enough bars are available"""
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        
+        response = client.get("/api/market-data/indicators/000001?timeframe=1m")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 2
+        assert data["data"][0] == {"time": "2023-12-01T09:30:00", "ema20": None, "ma16": None}
+
+def test_get_indicators_busy(client, sample_kline_response):
+    """Test a full analytics queue is reported as temporarily unavailable"""
+    from backend.app.services.analytics import AnalyticsBusyError
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache, \
+         patch('backend.app.services.analytics.analytics_pool') as mock_pool:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        mock_pool.indicators = AsyncMock(side_effect=AnalyticsBusyError("full"))
+        
+        response = client.get("/api/market-data/indicators/000001")
+        
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+def test_get_resampled_kline_data(client, sample_kline_response):
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        
+        response = client.get("/api/market-data/resample/000001?timeframe=5m")
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 1
+        assert data["data"][0]["high"] == 106.0
+        assert data["data"][0]["close"] == 104.0
+        
+        response = client.get("/api/market-data/resample/000001?timeframe=1m&source_timeframe=5m")
+        assert response.status_code == 400
+
+def test_scan_resampled_kline_data(setup_test_db, client, sample_kline_response):
+    with patch('backend.app.services.data_cache.market_data_provider') as mock_provider:
+        mock_provider.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        client.get("/api/market-data/kline/000001?timeframe=1m")
+        client.get("/api/market-data/kline/600000?timeframe=1m")
+    
+    response = client.get("/api/market-data/scan/resample?symbols=000001,600000,600036&timeframe=5m")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["engine"] == "sqlite"
+    assert data["count"] == 2
+    assert data["series"]["600000"] == [
+        {"time": "2023-12-01T09:30:00", "open": 100.0, "high": 106.0, "low": 98.0, "close": 104.0, "volume": 2200}
+    ]
+    assert data["series"]["600036"] == []
+    
+    response = client.get("/api/market-data/scan/resample?symbols=000001&timeframe=1m")
+    assert response.status_code == 400
+
+def test_get_kline_data_upstream_unavailable(client):
+    """Test an open upstream circuit is reported as 503 with Retry-After"""
+    from backend.app.services.resilience import CircuitOpenError
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.is_cache_fresh.return_value = False
+        mock_cache.get_kline_data = AsyncMock(side_effect=CircuitOpenError("open"))
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m")
+        
+        assert response.status_code == 503
+        assert "retry-after" in response.headers
+
+def test_provider_metrics(client):
+    response = client.get("/api/market-data/provider/metrics")
+    
+    assert response.status_code == 200
+    assert response.json()["circuit_state"] in ("closed", "open", "half_open")
+
+def test_backfill_endpoints(client):
+    with patch('backend.app.services.backfill.backfill_manager') as mock_manager:
+        mock_manager.create.side_effect = lambda symbol, timeframe, start, end: {"id": 1, "symbol": symbol, "status": "pending"}
+        
+        response = client.post("/api/market-data/backfill?symbols=000001,600000&timeframe=1m&start_time=2023-01-01T00:00:00")
+        assert response.status_code == 200
+        assert [job["symbol"] for job in response.json()["jobs"]] == ["000001", "600000"]
+        
+        mock_manager.create.side_effect = ValueError("end_time must be after start_time")
+        response = client.post("/api/market-data/backfill?symbols=000001&start_time=2023-01-01T00:00:00&end_time=2022-01-01T00:00:00")
+        assert response.status_code == 400
+        
+        mock_manager.get.return_value = None
+        assert client.get("/api/market-data/backfill/5").status_code == 404
+
+def test_get_kline_data_streams(setup_test_db, client):
+    import asyncio
+    from backend.app.api.streaming import decode_binary
+    from backend.app.services.data_cache import data_cache_service
+    
+    bars = [
+        {"time": f"2023-12-01T09:{minute:02d}:00", "open": 100.0 + minute, "high": 105.0, "low": 98.0, "close": 102.0, "volume": 1000 + minute}
+        for minute in range(30, 60)
+    ]
+    asyncio.run(data_cache_service._cache_kline_data("000001", "1m", bars))
+    
+    # Several chunks per response
+    with patch("backend.app.services.data_cache.KLINE_STREAM_CHUNK_ROWS", 7):
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&stream=ndjson&start_time=2023-12-01T09:35:00")
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["time"] for line in lines] == [bar["time"] for bar in bars[5:]]
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&stream=binary")
+        assert response.status_code == 200
+        assert decode_binary(response.content) == bars
+        
+        # Without the end frame the stream is reported as truncated
+        with pytest.raises(ValueError):
+            decode_binary(response.content[:-4])
+    
+    # Chunks are queried in worker threads, while access is recorded once on the loop
+    loops = []
+    read_chunk = data_cache_service._read_kline_chunk
+    
+    def recording_read(*args):
+        try:
+            loops.append(asyncio.get_running_loop())
+        except RuntimeError:
+            loops.append(None)
+        return read_chunk(*args)
+    
+    with patch("backend.app.services.data_cache.KLINE_STREAM_CHUNK_ROWS", 7), \
+            patch.object(data_cache_service, "_read_kline_chunk", recording_read), \
+            patch.object(data_cache_service, "record_access") as record_access:
+        assert decode_binary(client.get("/api/market-data/kline/000001?timeframe=1m&stream=binary").content) == bars
+    assert loops == [None] * 5
+    record_access.assert_called_once_with("000001", "1m")
+    
+    assert client.get("/api/market-data/kline/000001?stream=csv").status_code == 400
+
+def test_get_kline_data_column_layout(setup_test_db, client, sample_kline_response):
+    from backend.app.models.bar_batch import BarBatch
+    
+    with patch('backend.app.api.market_data.data_cache_service') as mock_cache:
+        mock_cache.get_kline_data = AsyncMock(return_value=BarBatch.from_dicts(sample_kline_response))
+        mock_cache.is_cache_fresh.return_value = False
+        mock_cache.get_cache_version.return_value = 1
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m")
+        assert response.json()["data"] == sample_kline_response
+        
+        response = client.get("/api/market-data/kline/000001?timeframe=1m&layout=columns")
+        data = response.json()["data"]
+        assert data["time"] == ["2023-12-01T09:30:00", "2023-12-01T09:31:00"]
+        assert data["volume"] == [1000, 1200]
+        assert response.json()["count"] == 2
+
+def test_list_cached_series(setup_test_db, client, sample_kline_response):
+    with patch('backend.app.services.data_cache.market_data_provider') as mock_provider:
+        mock_provider.get_kline_data = AsyncMock(return_value=sample_kline_response)
+        client.get("/api/market-data/kline/000001?timeframe=1m")
+        client.get("/api/market-data/kline/600000?timeframe=5m")
+    
+    response = client.get("/api/market-data/cache/series")
+    assert response.status_code == 200
+    data = response.json()
+    assert [(item["symbol"], item["timeframe"]) for item in data["series"]] == [("000001", "1m"), ("600000", "5m")]
+    assert data["total_bars"] == 2 * len(sample_kline_response)
+    assert data["series"][0]["first_time"] == sample_kline_response[0]["time"]
+    assert data["series"][0]["last_close"] == sample_kline_response[-1]["close"]
+    
+    assert client.get("/api/market-data/cache/series?symbol=600000").json()["count"] == 1
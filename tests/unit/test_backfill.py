@@ -0,0 +1,145 @@
+import asyncio
+import os
+import pytest
+from datetime import datetime, timedelta
+
+from backend.app.database import create_tables, drop_tables, get_db_session
+from backend.app.models.market_data import BackfillJob
+from backend.app.services.backfill import BackfillManager
+
+@pytest.fixture(scope="function")
+def setup_test_db():
+    """Set up test database"""
+    create_tables()
+    yield
+    drop_tables()
+
+class FakeCache:
+    """Records chunk fetches and how many ran at once"""
+    
+    def __init__(self, fail_at=None):
+        self.ranges = []
+        self.active = 0
+        self.peak = 0
+        self.fail_at = fail_at
+    
+    async def refresh_kline_data(self, symbol, timeframe, start_time=None, end_time=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.001)
+            if self.fail_at is not None and start_time >= self.fail_at:
+                raise ConnectionError("upstream down")
+            self.ranges.append((start_time, end_time))
+            bars = int((end_time - start_time) / timedelta(minutes=1)) + 1
+            return [{}] * bars
+        finally:
+            self.active -= 1
+
+async def _wait(manager, job_id):
+    while job_id in manager._tasks:
+        await asyncio.sleep(0.005)
+    return manager.get(job_id)
+
+@pytest.mark.asyncio
+async def test_backfill_chunks_range_with_bounded_parallelism(setup_test_db):
+    cache = FakeCache()
+    manager = BackfillManager(cache, chunk_bars=100, parallelism=3)
+    start = datetime(2023, 12, 1, 9, 30)
+    
+    job = manager.create("000001", "1m", start, start + timedelta(minutes=1000))
+    assert job["chunks_total"] == 11
+    job = await _wait(manager, job["id"])
+    
+    assert job["status"] == "completed"
+    assert job["chunks_done"] == 11 and job["progress"] == 1.0
+    assert job["bars_written"] == 1001
+    assert cache.peak == 3
+    
+    # Chunks tile the range without overlap
+    ranges = sorted(cache.ranges)
+    assert ranges[0][0] == start and ranges[-1][1] == start + timedelta(minutes=1000)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert timedelta(0) < next_start - end <= timedelta(microseconds=1)
+
+@pytest.mark.asyncio
+async def test_failed_backfill_resumes_from_checkpoint(setup_test_db):
+    start = datetime(2023, 12, 1, 9, 30)
+    cache = FakeCache(fail_at=start + timedelta(minutes=500))
+    manager = BackfillManager(cache, chunk_bars=100, parallelism=1)
+    
+    job = manager.create("000001", "1m", start, start + timedelta(minutes=999))
+    job = await _wait(manager, job["id"])
+    
+    assert job["status"] == "failed"
+    assert job["error"] == "upstream down"
+    assert job["chunks_done"] == 5
+    
+    cache.fail_at = None
+    cache.ranges.clear()
+    manager.start(job["id"])
+    job = await _wait(manager, job["id"])
+    
+    assert job["status"] == "completed"
+    assert min(cache.ranges)[0] == start + timedelta(minutes=500)
+    assert job["bars_written"] == 1000
+
+@pytest.mark.asyncio
+async def test_interrupted_backfill_is_resumed(setup_test_db):
+    start = datetime(2023, 12, 1, 9, 30)
+    manager = BackfillManager(FakeCache(), chunk_bars=10, parallelism=2)
+    job = manager.create("000001", "1m", start, start + timedelta(minutes=999))
+    
+    await asyncio.sleep(0.01)
+    await manager.stop()
+    assert manager.get(job["id"])["status"] == "running"
+    
+    # A new process picks up the job where the checkpoint left it
+    restarted = BackfillManager(FakeCache(), chunk_bars=10, parallelism=2)
+    assert restarted.resume_incomplete() == 1
+    job = await _wait(restarted, job["id"])
+    assert job["status"] == "completed"
+    assert job["bars_written"] == 1000
+    
+    assert (await restarted.cancel(job["id"]))["status"] == "completed"
+
+@pytest.mark.asyncio
+async def test_jobs_leased_by_live_workers_are_not_resumed(setup_test_db):
+    """Test a worker starting up leaves jobs alone while their worker's heartbeat is fresh"""
+    start = datetime(2023, 12, 1, 9, 30)
+    manager = BackfillManager(FakeCache(), chunk_bars=10, parallelism=1)
+    job = manager.create("000001", "1m", start, start + timedelta(minutes=999))
+    await asyncio.sleep(0.01)
+    await manager.stop()
+    assert manager.get(job["id"])["owner_pid"] is None
+    
+    def lease(heartbeat_at):
+        with get_db_session() as session:
+            session.query(BackfillJob).filter(BackfillJob.id == job["id"]).update(
+                {"owner_pid": os.getpid() + 1, "heartbeat_at": heartbeat_at}
+            )
+    
+    lease(datetime.now())
+    other = BackfillManager(FakeCache(), chunk_bars=10, parallelism=1, lease_seconds=30)
+    assert other.resume_incomplete() == 0
+    assert not other.start(job["id"])
+    
+    # The other worker stopped renewing its lease
+    lease(datetime.now() - timedelta(seconds=60))
+    assert other.resume_incomplete() == 1
+    assert manager.get(job["id"])["owner_pid"] == os.getpid()
+    assert (await _wait(other, job["id"]))["status"] == "completed"
+
+@pytest.mark.asyncio
+async def test_job_stops_when_cancelled_by_another_worker(setup_test_db):
+    start = datetime(2023, 12, 1, 9, 30)
+    manager = BackfillManager(FakeCache(), chunk_bars=1, parallelism=1, lease_seconds=0.03)
+    job = manager.create("000001", "1m", start, start + timedelta(minutes=999))
+    await asyncio.sleep(0.01)
+    
+    with get_db_session() as session:
+        session.query(BackfillJob).filter(BackfillJob.id == job["id"]).update({"status": "cancelled"})
+    job = await asyncio.wait_for(_wait(manager, job["id"]), 1.0)
+    
+    assert job["status"] == "cancelled"
+    assert 0 < job["chunks_done"] < 1000
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from backend.app.services.change_index import ChangeIndex
+
+KEY = ("000001", "1m")
+
+def test_changed_since_merges_batches():
+    index = ChangeIndex(floor_version=10)
+    index.record(KEY, 11, [datetime(2023, 12, 1, 9, 30)])
+    index.record(KEY, 12, [datetime(2023, 12, 1, 9, 31), datetime(2023, 12, 1, 9, 30)])
+    
+    assert index.changed_since(KEY, 10) == [datetime(2023, 12, 1, 9, 30), datetime(2023, 12, 1, 9, 31)]
+    assert index.changed_since(KEY, 11) == [datetime(2023, 12, 1, 9, 30), datetime(2023, 12, 1, 9, 31)]
+    assert index.changed_since(KEY, 12) == []
+    assert index.changed_since(KEY, 9) is None
+
+def test_trimmed_versions_require_full_resync():
+    index = ChangeIndex(floor_version=0, max_batches=2)
+    for version in range(1, 4):
+        index.record(KEY, version, [datetime(2023, 12, 1, 9, 30 + version)])
+    
+    assert index.changed_since(KEY, 0) is None
+    assert index.changed_since(KEY, 1) == [datetime(2023, 12, 1, 9, 32), datetime(2023, 12, 1, 9, 33)]
+
+def test_discard_forgets_history():
+    index = ChangeIndex(floor_version=0)
+    index.record(KEY, 1, [datetime(2023, 12, 1, 9, 31)])
+    index.discard(KEY, 5)
+    
+    assert index.changed_since(KEY, 1) is None
+    assert index.changed_since(KEY, 5) == []
+
+def test_large_batches_are_trimmed_by_size():
+    index = ChangeIndex(floor_version=0, max_timestamps=3)
+    index.record(KEY, 1, [datetime(2023, 12, 1, 9, minute) for minute in range(2)])
+    index.record(KEY, 2, [datetime(2023, 12, 1, 10, minute) for minute in range(2)])
+    
+    assert index.changed_since(KEY, 0) is None
+    assert len(index.changed_since(KEY, 1)) == 2
+    
+    # The newest batch is kept even when it alone exceeds the budget
+    index.record(KEY, 3, [datetime(2023, 12, 1, 11, minute) for minute in range(5)])
+    assert len(index.changed_since(KEY, 2)) == 5
@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from backend.app.models.values import Tick
+from backend.app.services.alerts import AlertIndex
+from backend.app.services.coherence import CoherenceBus
+from backend.app.services.data_cache import DataCacheService
+from backend.app.services.realtime import RealtimeHub
+
+async def _wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+@pytest_asyncio.fixture
+async def group(tmp_path):
+    """An owner and a follower bus, each with its own cache"""
+    socket_path = str(tmp_path / "ingest.sock")
+    lock_path = str(tmp_path / "ingest.lock")
+    owner = CoherenceBus(DataCacheService(), socket_path, lock_path, reconnect_interval=0.01)
+    follower = CoherenceBus(DataCacheService(), socket_path, lock_path, reconnect_interval=0.01)
+    
+    await owner.start()
+    await follower.start()
+    await _wait_for(lambda: owner.follower_count == 1)
+    yield owner, follower
+    
+    await follower.stop()
+    await owner.stop()
+
+@pytest.mark.asyncio
+async def test_single_owner_is_elected(group):
+    """Test only the first process to take the lock owns ingest"""
+    owner, follower = group
+    
+    assert owner.is_owner
+    assert follower.role == "follower"
+
+@pytest.mark.asyncio
+async def test_ticks_fan_out_to_followers(group):
+    """Test ticks received by the owner update the followers' last-price table"""
+    owner, follower = group
+    
+    await owner.publish_tick(Tick("000001", 101.5, 10, datetime.now()))
+    
+    await _wait_for(lambda: "000001" in follower.cache._last_trades)
+    assert follower.cache.get_latest_price("000001") == 101.5
+
+@pytest.mark.asyncio
+async def test_changes_relay_between_workers(group):
+    """Test bar writes and invalidations reach the other workers' memory tiers"""
+    owner, follower = group
+    before = follower.cache.get_cache_version("000001", "1m")
+    
+    owner.cache._emit({
+        "type": "bars",
+        "symbol": "000001",
+        "timeframe": "1m",
+        "version": before + 1,
+        "timestamps": ["2023-12-01T09:30:00"],
+        "close": ["2023-12-01T09:30:00", 102.0]
+    })
+    await _wait_for(lambda: follower.cache.get_cache_version("000001", "1m") > before)
+    assert follower.cache.get_latest_price("000001") == 102.0
+    assert follower.cache.change_index.changed_since(("000001", "1m"), before) == [datetime(2023, 12, 1, 9, 30)]
+    
+    # Followers send their changes to the owner
+    owner.cache.record_tick(Tick.from_dict({"symbol": "000001", "price": 99.0}))
+    follower.cache._emit({"type": "invalidate", "symbols": ["000001"], "timeframe": None})
+    await _wait_for(lambda: "000001" not in owner.cache._last_trades)
+
+@pytest.mark.asyncio
+async def test_changes_from_worker_threads_are_sent_on_the_loop(group):
+    """Test a change emitted off the event loop, as eviction does, still reaches the followers"""
+    owner, follower = group
+    follower.cache.record_tick(Tick.from_dict({"symbol": "000001", "price": 99.0}))
+    
+    await asyncio.to_thread(owner.cache._emit, {"type": "invalidate", "symbols": ["000001"], "timeframe": None})
+    await _wait_for(lambda: "000001" not in follower.cache._last_trades)
+
+@pytest.mark.asyncio
+async def test_follower_takes_over_when_owner_stops(group):
+    """Test a follower is promoted and resyncs when the owner goes away"""
+    owner, follower = group
+    promoted = asyncio.Event()
+    
+    async def on_promote():
+        promoted.set()
+    
+    follower.on_promote = on_promote
+    follower.cache.record_tick(Tick.from_dict({"symbol": "000001", "price": 99.0}))
+    
+    await owner.stop()
+    await asyncio.wait_for(promoted.wait(), 2.0)
+    
+    assert follower.is_owner
+    assert follower.cache._last_trades == {}
+
+@pytest.mark.asyncio
+async def test_alerts_are_kept_by_the_owner(group):
+    """Test alerts created in a follower live in the owner, which reports their triggers to every worker"""
+    owner, follower = group
+    owner_alerts, follower_alerts = AlertIndex(), AlertIndex()
+    owner_alerts.add("000002", 50.0)
+    owner_alerts.join(owner)
+    follower_alerts.join(follower)
+    
+    # Reconnecting syncs the alerts the owner already holds
+    follower._owner.close()
+    await _wait_for(lambda: len(follower_alerts) == 1)
+    await _wait_for(lambda: follower._owner is not None and owner.follower_count == 1)
+    
+    with patch("backend.app.services.alerts.realtime_hub") as mock_hub:
+        mock_hub.subscribe = AsyncMock()
+        alert = await follower_alerts.create("000001", 101.0)
+    # The owner streams the ticks of every symbol it holds alerts for
+    assert sorted(call.args[0] for call in mock_hub.subscribe.call_args_list) == ["000001", "000002"]
+    assert owner_alerts.get(alert["id"]) == alert
+    assert follower_alerts.get(alert["id"]) == alert
+    
+    received = []
+    
+    async def listener(events):
+        received.extend(events)
+    
+    follower_alerts.add_listener(listener)
+    # Replicas do not evaluate ticks themselves
+    await follower_alerts.on_tick(Tick("000001", 100.0, 10, datetime.now()))
+    await follower_alerts.on_tick(Tick("000001", 102.0, 10, datetime.now()))
+    assert received == []
+    
+    await owner_alerts.on_tick(Tick("000001", 100.0, 10, datetime.now()))
+    await owner_alerts.on_tick(Tick("000001", 102.0, 10, datetime.now()))
+    await _wait_for(lambda: received)
+    assert received[0]["id"] == alert["id"] and received[0]["trigger_price"] == 102.0
+    assert follower_alerts.get(alert["id"]) is None
+    
+    removed = await follower_alerts.delete_measurement(12345)
+    assert removed == []
+    assert await follower_alerts.delete(alert["id"]) is None
+
+@pytest.mark.asyncio
+async def test_followers_subscribe_through_the_owner(group):
+    """Test a follower's tick subscriptions are made by the owner, whose ticks reach the follower's listeners"""
+    owner, follower = group
+    owner_hub, follower_hub = RealtimeHub(), RealtimeHub()
+    owner_hub.join(owner)
+    follower_hub.join(follower)
+    owner_hub.add_listener(owner.publish_tick, relayed=False)
+    received, persisted = [], []
+    
+    async def listener(tick):
+        received.append(tick)
+    
+    async def persist(tick):
+        persisted.append(tick)
+    
+    follower_hub.add_listener(listener)
+    follower_hub.add_listener(persist, relayed=False)
+    
+    with patch("backend.app.services.realtime.market_data_provider") as mock_provider:
+        mock_provider.subscribe_realtime_data = AsyncMock()
+        mock_provider.unsubscribe_realtime_data = AsyncMock()
+        
+        await follower_hub.subscribe("000001")
+        await follower_hub.subscribe("000001")
+        mock_provider.subscribe_realtime_data.assert_called_once_with("000001", owner_hub.publish)
+        assert owner_hub.subscribed_symbols == {"000001"}
+        assert follower_hub.subscribed_symbols == set()
+        
+        await owner_hub.publish({"symbol": "000001", "price": 101.0})
+        await _wait_for(lambda: received)
+        assert received[0].price == 101.0
+        assert persisted == []
+        assert follower.cache.get_latest_price("000001") == 101.0
+        
+        await follower_hub.unsubscribe("000001")
+        mock_provider.unsubscribe_realtime_data.assert_not_called()
+        await follower_hub.unsubscribe("000001")
+        mock_provider.unsubscribe_realtime_data.assert_called_once_with("000001")
@@ -1,11 +1,12 @@
 import pytest
 from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 from sqlalchemy.orm import Session
 
 from backend.app.services.data_cache import DataCacheService
 from backend.app.models.market_data import KLineData, RealtimeData
-from backend.app.database import create_tables, drop_tables, get_db_session
+from backend.app.models.values import SeriesInfo, Tick
+from backend.app.database import ShardRouter, create_tables, drop_tables, get_db_session
 
 @pytest.fixture(scope="function")
 def setup_test_db():
@@ -106,50 +107,69 @@ def test_is_cache_sufficient(data_cache_service):
     """Test cache sufficiency check"""
     now = datetime.now()
     
-    # Create recent cached data that covers the requested time range
-    kline_data = KLineData(
-        symbol="000001",
-        timeframe="1m",
-        timestamp=now - timedelta(minutes=15),  # Earlier timestamp to cover range
-        open_price=100.0,
-        high_price=105.0,
-        low_price=98.0,
-        close_price=102.0,
-        volume=1000
-    )
-    kline_data.created_at = now - timedelta(minutes=1)  # Recently cached
-    
-    kline_data2 = KLineData(
-        symbol="000001",
-        timeframe="1m", 
-        timestamp=now,  # Latest timestamp to cover range
-        open_price=102.0,
-        high_price=105.0,
-        low_price=98.0,
-        close_price=104.0,
-        volume=1000
-    )
-    kline_data2.created_at = now - timedelta(minutes=1)
-    
-    cached_data = [kline_data, kline_data2]
-    
-    # Should be sufficient for recent data with good time coverage
-    assert data_cache_service._is_cache_sufficient(
-        cached_data, 
-        now - timedelta(minutes=10), 
-        now, 
-        "1m"
-    ) == True
-    
-    # Should not be sufficient for old cache
-    kline_data.created_at = now - timedelta(hours=2)
-    kline_data2.created_at = now - timedelta(hours=2)
-    assert data_cache_service._is_cache_sufficient(
-        cached_data, 
-        now - timedelta(minutes=10), 
-        now, 
-        "1m"
-    ) == False
+    # A recently written series that covers the requested time range
+    summary = SeriesInfo("000001", "1m", now - timedelta(minutes=15), now, 16, 104.0, now - timedelta(minutes=1))
+    
+    # A market that is open around the clock, so only age and coverage count
+    calendar = MagicMock()
+    calendar.has_session_between.return_value = True
+    calendar.first_bar_at_or_after.side_effect = lambda timestamp, timeframe: timestamp
+    calendar.last_bar_at_or_before.side_effect = lambda timestamp, timeframe: timestamp
+    
+    with patch('backend.app.services.data_cache.calendar_for', return_value=calendar):
+        # Should be sufficient for recent data with good time coverage
+        assert data_cache_service._is_cache_sufficient(
+            summary, 
+            now - timedelta(minutes=10), 
+            now, 
+            "1m"
+        ) == True
+        
+        # Should not be sufficient for a range starting before the cached bars
+        assert data_cache_service._is_cache_sufficient(
+            summary, 
+            now - timedelta(minutes=20), 
+            now, 
+            "1m"
+        ) == False
+        
+        # Should not be sufficient for old cache
+        assert data_cache_service._is_cache_sufficient(
+            summary._replace(updated_at=now - timedelta(hours=2)), 
+            now - timedelta(minutes=10), 
+            now, 
+            "1m"
+        ) == False
+        
+        assert data_cache_service._is_cache_sufficient(None, None, None, "1m") == False
+
+def test_is_cache_sufficient_ignores_closed_periods(data_cache_service):
+    """Test lunch breaks, nights and weekends at the ends of a range are not missing data"""
+    friday = datetime(2023, 12, 1)
+    
+    class Saturday(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime(2023, 12, 2, 10, 0)
+    
+    def series(first, last, written_at):
+        return SeriesInfo("000001", "1m", first, last, 240, 1.0, written_at)
+    
+    after_close = series(friday.replace(hour=9, minute=30), friday.replace(hour=14, minute=59), friday.replace(hour=15, minute=5))
+    
+    with patch('backend.app.services.data_cache.datetime', Saturday):
+        # Written after Friday's close, so still current on Saturday morning
+        assert data_cache_service._is_cache_sufficient(
+            after_close, friday.replace(hour=11, minute=45), datetime(2023, 12, 2, 10, 0), "1m"
+        )
+        # Written before the close, so the last hour may have changed
+        before_close = series(friday.replace(hour=9, minute=30), friday.replace(hour=14, minute=59), friday.replace(hour=14))
+        assert not data_cache_service._is_cache_sufficient(before_close, None, None, "1m")
+        # The 14:59 bar can exist and is missing
+        early_end = series(friday.replace(hour=9, minute=30), friday.replace(hour=14, minute=58), friday.replace(hour=15, minute=5))
+        assert not data_cache_service._is_cache_sufficient(
+            early_end, None, datetime(2023, 12, 2, 10, 0), "1m"
+        )
 
 @pytest.mark.asyncio
 async def test_cache_realtime_data(setup_test_db, data_cache_service):
@@ -174,7 +194,8 @@ async def test_cache_realtime_data(setup_test_db, data_cache_service):
         assert cached_tick.price == 102.5
         assert cached_tick.volume == 500
 
-def test_get_latest_price(setup_test_db, data_cache_service):
+@pytest.mark.asyncio
+async def test_get_latest_price(setup_test_db, data_cache_service):
     """Test getting latest price from cache"""
     symbol = "000001"
     now = datetime.now()
@@ -196,20 +217,13 @@ def test_get_latest_price(setup_test_db, data_cache_service):
     # Test fallback to K-line data when no real-time data
     with get_db_session() as session:
         session.query(RealtimeData).delete()
-        
-        kline = KLineData(
-            symbol=symbol,
-            timeframe="1m",
-            timestamp=now,
-            open_price=100.0,
-            high_price=105.0,
-            low_price=98.0,
-            close_price=103.0,
-            volume=1000
-        )
-        session.add(kline)
     
-    latest_price = data_cache_service.get_latest_price(symbol)
+    await data_cache_service._cache_kline_data(symbol, "1m", [
+        {"time": now, "open": 100.0, "high": 105.0, "low": 98.0, "close": 103.0, "volume": 1000}
+    ])
+    
+    # A fresh service has no in-memory closes and reads the series summary
+    latest_price = DataCacheService().get_latest_price(symbol)
     assert latest_price == 103.0
 
 @pytest.mark.asyncio
@@ -227,4 +241,301 @@ async def test_get_kline_data_with_mock(setup_test_db, data_cache_service, sampl
         assert result[1]["close"] == 104.0
         
         # Verify provider was called
-        mock_provider.get_kline_data.assert_called_once_with("000001", "1m", None, None)
\ No newline at end of file
+        mock_provider.get_kline_data.assert_called_once_with("000001", "1m", None, None)
+
+
+@pytest.mark.asyncio
+async def test_get_kline_data_cache_hit_format(setup_test_db, data_cache_service, sample_kline_data):
+    """Test cache hits read raw rows but return the same dictionaries as KLineData.to_dict"""
+    symbol = "000001"
+    timeframe = "1m"
+    
+    await data_cache_service._cache_kline_data(symbol, timeframe, sample_kline_data)
+    
+    with patch('backend.app.services.data_cache.market_data_provider') as mock_provider:
+        mock_provider.get_kline_data = AsyncMock()
+        result = await data_cache_service.get_kline_data(
+            symbol, timeframe,
+            start_time=datetime(2023, 12, 1, 9, 30, 0),
+            end_time=datetime(2023, 12, 1, 9, 31, 0)
+        )
+        mock_provider.get_kline_data.assert_not_called()
+    
+    with get_db_session() as session:
+        expected = [
+            item.to_dict() for item in session.query(KLineData).order_by(KLineData.timestamp.asc()).all()
+        ]
+    
+    assert result == expected
+    assert result[0]["time"] == "2023-12-01T09:30:00"
+
+@pytest.mark.asyncio
+async def test_cache_version_bumped_on_write(setup_test_db, data_cache_service, sample_kline_data):
+    """Test every cache write that changes bars moves the series to a new, higher version"""
+    initial = data_cache_service.get_cache_version("000001", "1m")
+    assert not data_cache_service.is_cache_fresh("000001", "1m")
+    
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    first = data_cache_service.get_cache_version("000001", "1m")
+    
+    # Re-caching identical bars keeps the version
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    assert data_cache_service.get_cache_version("000001", "1m") == first
+    
+    await data_cache_service._cache_kline_data("000001", "1m", [dict(sample_kline_data[1], close=105.0)])
+    second = data_cache_service.get_cache_version("000001", "1m")
+    
+    assert initial < first < second
+    assert data_cache_service.is_cache_fresh("000001", "1m")
+    assert data_cache_service.get_cache_version("000002", "1m") == initial
+
+@pytest.mark.asyncio
+async def test_cache_kline_data_upserts(setup_test_db, data_cache_service, sample_kline_data):
+    """Test re-caching updates changed bars in place and keeps bars outside the new range"""
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    
+    forming_bar = dict(sample_kline_data[1], close=105.0, volume=1500)
+    new_bar = {"time": "2023-12-01T09:32:00", "open": 105.0, "high": 107.0, "low": 104.0, "close": 106.0, "volume": 800}
+    await data_cache_service._cache_kline_data("000001", "1m", [forming_bar, new_bar])
+    
+    with get_db_session() as session:
+        cached = session.query(KLineData).order_by(KLineData.timestamp.asc()).all()
+        
+        assert [item.close_price for item in cached] == [102.0, 105.0, 106.0]
+        assert cached[1].volume == 1500
+
+@pytest.mark.asyncio
+async def test_get_kline_changes(setup_test_db, data_cache_service, sample_kline_data):
+    """Test delta reads return only bars changed after a version"""
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    version = data_cache_service.get_cache_version("000001", "1m")
+    
+    assert data_cache_service.get_kline_changes("000001", "1m", version) == []
+    
+    forming_bar = dict(sample_kline_data[1], close=105.0)
+    new_bar = {"time": "2023-12-01T09:32:00", "open": 105.0, "high": 107.0, "low": 104.0, "close": 106.0, "volume": 800}
+    await data_cache_service._cache_kline_data("000001", "1m", [sample_kline_data[0], forming_bar, new_bar])
+    
+    changes = data_cache_service.get_kline_changes("000001", "1m", version)
+    assert [bar["time"] for bar in changes] == ["2023-12-01T09:31:00", "2023-12-01T09:32:00"]
+    assert changes[0]["close"] == 105.0
+    
+    # Versions from before this process started cannot be answered
+    assert data_cache_service.get_kline_changes("000001", "1m", 1) is None
+
+@pytest.mark.asyncio
+async def test_refresh_if_stale(setup_test_db, data_cache_service, sample_kline_data):
+    """Test delta reads refresh series that are neither fresh nor covered"""
+    with patch('backend.app.services.data_cache.market_data_provider') as mock_provider:
+        mock_provider.get_kline_data = AsyncMock(return_value=sample_kline_data)
+        
+        await data_cache_service.refresh_if_stale("000001", "1m")
+        mock_provider.get_kline_data.assert_called_once()
+        
+        # Written by this process just now, so fresh
+        await data_cache_service.refresh_if_stale("000001", "1m")
+        mock_provider.get_kline_data.assert_called_once()
+
+def test_get_latest_price_from_tick_table(data_cache_service):
+    """Test latest prices fed by ticks are answered without touching SQLite"""
+    data_cache_service.record_tick(Tick.from_dict({"symbol": "000001", "price": 101.5, "volume": 100}))
+    
+    with patch.object(data_cache_service.shards, 'session', side_effect=AssertionError("SQLite touched")):
+        assert data_cache_service.get_latest_price("000001") == 101.5
+        assert data_cache_service.get_latest_prices(["000001"]) == {"000001": 101.5}
+
+@pytest.mark.asyncio
+async def test_get_latest_price_bar_close_fallback(setup_test_db, data_cache_service, sample_kline_data):
+    """Test the newest cached bar close is used until the symbol ticks"""
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    
+    with patch.object(data_cache_service.shards, 'session', side_effect=AssertionError("SQLite touched")):
+        assert data_cache_service.get_latest_price("000001") == 104.0
+        
+        data_cache_service.record_tick(Tick.from_dict({"symbol": "000001", "price": 104.5, "volume": 100}))
+        assert data_cache_service.get_latest_price("000001") == 104.5
+
+def test_get_latest_prices_bulk(setup_test_db, data_cache_service):
+    """Test bulk latest prices mix in-memory and stored prices"""
+    data_cache_service.record_tick(Tick.from_dict({"symbol": "000001", "price": 101.5, "volume": 100}))
+    
+    with get_db_session() as session:
+        session.add(RealtimeData(symbol="600000", price=8.5, volume=100, timestamp=datetime.now()))
+    
+    assert data_cache_service.get_latest_prices(["000001", "600000", "NONEXISTENT"]) == {
+        "000001": 101.5,
+        "600000": 8.5,
+        "NONEXISTENT": None
+    }
+
+@pytest.mark.asyncio
+async def test_enqueue_tick_updates_price_and_persists_on_flush(setup_test_db, data_cache_service):
+    """Test streamed ticks update the last-price table at once and reach SQLite in a batch"""
+    now = datetime.now()
+    for i in range(3):
+        await data_cache_service.enqueue_tick(Tick("000001", 100.0 + i, 100, now + timedelta(seconds=i)))
+    
+    assert data_cache_service.get_latest_price("000001") == 102.0
+    assert data_cache_service.tick_write_queue.depth == 3
+    
+    await data_cache_service.tick_write_queue.drain()
+    
+    with get_db_session() as session:
+        assert session.query(RealtimeData).count() == 3
+
+@pytest.mark.asyncio
+async def test_write_ticks_trims_per_symbol(setup_test_db, data_cache_service):
+    """Test tick batches keep only the most recent rows per symbol"""
+    now = datetime.now()
+    ticks = [
+        Tick("000001", 100.0, 1, now + timedelta(seconds=i))
+        for i in range(1005)
+    ]
+    
+    await data_cache_service._write_ticks(ticks)
+    
+    with get_db_session() as session:
+        remaining = session.query(RealtimeData).order_by(RealtimeData.timestamp.asc()).all()
+        assert len(remaining) == 1000
+        assert remaining[0].timestamp == now + timedelta(seconds=5)
+
+@pytest.mark.asyncio
+async def test_invalidate_clears_all_tiers(setup_test_db, data_cache_service, sample_kline_data):
+    """Test invalidation deletes stored data and resets in-memory state for the selected symbols"""
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    await data_cache_service._cache_kline_data("600000", "1m", sample_kline_data)
+    await data_cache_service.cache_realtime_data({"symbol": "000001", "price": 101.0, "volume": 1, "timestamp": datetime.now()})
+    version = data_cache_service.get_cache_version("000001", "1m")
+    
+    deleted = data_cache_service.invalidate(["000001"])
+    
+    assert deleted == {"bars": 2, "ticks": 1}
+    assert data_cache_service.get_latest_price("000001") is None
+    assert data_cache_service.get_latest_price("600000") == 104.0
+    assert data_cache_service.get_cache_version("000001", "1m") > version
+    assert data_cache_service.get_kline_changes("000001", "1m", version) is None
+    assert data_cache_service.get_series_sizes() == {("600000", "1m"): 2}
+    
+    data_cache_service.invalidate()
+    assert data_cache_service.get_series_sizes() == {}
+
+@pytest.mark.asyncio
+async def test_evict_oldest_bars(setup_test_db, data_cache_service, sample_kline_data):
+    """Test partial eviction removes the oldest bars with one range delete"""
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    version = data_cache_service.get_cache_version("000001", "1m")
+    
+    assert data_cache_service.evict_oldest_bars("000001", "1m", 1) == 1
+    
+    remaining = data_cache_service._get_cached_kline_data("000001", "1m")
+    assert [row.close_price for row in remaining] == [104.0]
+    assert data_cache_service.get_cache_version("000001", "1m") > version
+    
+    # Asking for more bars than the series holds removes it entirely
+    assert data_cache_service.evict_oldest_bars("000001", "1m", 5) == 1
+    assert data_cache_service.get_series_sizes() == {}
+
+@pytest.mark.asyncio
+async def test_sharded_storage(tmp_path, sample_kline_data):
+    """Test symbols are spread over shard files without changing the query API"""
+    shards = ShardRouter.from_config(2, f"sqlite:///{tmp_path}/cache.db")
+    shards.create_all()
+    service = DataCacheService(shards)
+    
+    symbols = ["000001", "000002", "600000", "600036"]
+    assert len({shards.shard_for(symbol) for symbol in symbols}) == 2
+    
+    for symbol in symbols:
+        await service._cache_kline_data(symbol, "1m", sample_kline_data)
+    await service._write_ticks([
+        Tick(symbol, 101.0, 1, datetime.now())
+        for symbol in symbols
+    ])
+    
+    for symbol in symbols:
+        rows = service._get_cached_kline_data(symbol, "1m")
+        assert [row.close_price for row in rows] == [102.0, 104.0]
+        with shards.shard_session(1 - shards.shard_for(symbol)) as session:
+            assert session.query(KLineData).filter_by(symbol=symbol).count() == 0
+    
+    assert service.get_series_sizes() == {(symbol, "1m"): 2 for symbol in symbols}
+    assert service.invalidate() == {"bars": 8, "ticks": 4}
+    
+    shards.drop_all()
+    for shard_engine in shards.engines:
+        shard_engine.dispose()
+
+@pytest.mark.asyncio
+async def test_iter_kline_chunks(setup_test_db, data_cache_service):
+    bars = [
+        {"time": (datetime(2023, 12, 1, 9, 30) + timedelta(minutes=i)).isoformat(), "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": i}
+        for i in range(25)
+    ]
+    await data_cache_service._cache_kline_data("000001", "1m", bars)
+    
+    chunks = [chunk async for chunk in data_cache_service.iter_kline_chunks("000001", "1m", chunk_size=10)]
+    assert [len(chunk) for chunk in chunks] == [10, 10, 5]
+    assert [volume for chunk in chunks for volume in chunk.volumes] == list(range(25))
+    
+    chunks = [chunk async for chunk in data_cache_service.iter_kline_chunks(
+        "000001", "1m", datetime(2023, 12, 1, 9, 35), datetime(2023, 12, 1, 9, 44), chunk_size=5
+    )]
+    assert [volume for chunk in chunks for volume in chunk.volumes] == list(range(5, 15))
+    assert [chunk async for chunk in data_cache_service.iter_kline_chunks("600000", "1m")] == []
+
+@pytest.mark.asyncio
+async def test_series_summary_maintained_on_write(setup_test_db, data_cache_service, sample_kline_data):
+    """Test the series summary follows inserts, upserts, evictions and invalidation"""
+    assert data_cache_service.get_series_summary("000001", "1m") is None
+    
+    await data_cache_service._cache_kline_data("000001", "1m", sample_kline_data)
+    summary = data_cache_service.get_series_summary("000001", "1m")
+    assert (summary.first_time, summary.last_time) == (datetime(2023, 12, 1, 9, 30), datetime(2023, 12, 1, 9, 31))
+    assert (summary.bar_count, summary.last_close) == (2, 104.0)
+    
+    # An updated bar does not change the count; newer and older bars extend the range
+    await data_cache_service._cache_kline_data("000001", "1m", [
+        dict(sample_kline_data[1], close=105.0),
+        {"time": "2023-12-01T09:32:00", "open": 105.0, "high": 107.0, "low": 104.0, "close": 106.0, "volume": 800},
+        {"time": "2023-12-01T09:25:00", "open": 99.0, "high": 100.0, "low": 98.0, "close": 99.5, "volume": 800}
+    ])
+    summary = data_cache_service.get_series_summary("000001", "1m")
+    assert (summary.first_time, summary.last_time) == (datetime(2023, 12, 1, 9, 25), datetime(2023, 12, 1, 9, 32))
+    assert (summary.bar_count, summary.last_close) == (4, 106.0)
+    # The stored row matches the in-memory copy
+    assert DataCacheService().get_series_summary("000001", "1m") == summary
+    
+    assert data_cache_service.evict_oldest_bars("000001", "1m", 2) == 2
+    summary = DataCacheService().get_series_summary("000001", "1m")
+    assert (summary.first_time, summary.bar_count) == (datetime(2023, 12, 1, 9, 31), 2)
+    assert data_cache_service.get_series_summary("000001", "1m") == summary
+    
+    data_cache_service.invalidate(["000001"])
+    assert data_cache_service.get_series_summary("000001", "1m") is None
+    assert data_cache_service.list_series_summaries() == []
+
+@pytest.mark.asyncio
+async def test_cache_miss_decided_from_summary(setup_test_db, data_cache_service, sample_kline_data):
+    """Test a miss is decided from the series summary without reading bars"""
+    with patch('backend.app.services.data_cache.market_data_provider') as mock_provider, \
+         patch.object(data_cache_service, '_get_cached_kline_data') as read_bars:
+        mock_provider.get_kline_data = AsyncMock(return_value=sample_kline_data)
+        await data_cache_service.get_kline_data("000001", "1m", start_time=datetime(2023, 12, 1, 9, 30))
+        
+        read_bars.assert_not_called()
+        mock_provider.get_kline_data.assert_called_once()
+
+def test_rebuild_series_summaries(setup_test_db, data_cache_service):
+    """Test summaries are filled from bars stored before the summary table existed"""
+    with get_db_session() as session:
+        for minute, close in ((30, 102.0), (31, 104.0)):
+            session.add(KLineData(symbol="000001", timeframe="5m", timestamp=datetime(2023, 12, 1, 9, minute),
+                                  open_price=100.0, high_price=105.0, low_price=98.0, close_price=close, volume=1000))
+    
+    assert data_cache_service.get_series_summary("000001", "5m") is None
+    assert data_cache_service.rebuild_series_summaries(only_if_missing=True) == 1
+    assert data_cache_service.rebuild_series_summaries(only_if_missing=True) == 0
+    
+    summary = data_cache_service.get_series_summary("000001", "5m")
+    assert (summary.bar_count, summary.last_close, summary.last_time) == (2, 104.0, datetime(2023, 12, 1, 9, 31))
+    assert data_cache_service.get_series_sizes() == {("000001", "5m"): 2}
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+import pytest_asyncio
+import threading
+from datetime import datetime, timedelta
+
+from backend.app.database import create_tables, drop_tables
+from backend.app.services.data_cache import DataCacheService
+from backend.app.services.eviction import CacheEvictor
+
+@pytest.fixture(scope="function")
+def setup_test_db():
+    """Set up test database"""
+    create_tables()
+    yield
+    drop_tables()
+
+def _bars(count):
+    start = datetime(2023, 12, 1, 9, 30)
+    return [
+        {"time": start + timedelta(minutes=i), "open": 100.0, "high": 101.0, "low": 99.0, "close": 100.5, "volume": 100}
+        for i in range(count)
+    ]
+
+@pytest_asyncio.fixture
+async def cache(setup_test_db):
+    cache = DataCacheService()
+    for symbol in ("000001", "000002", "600000"):
+        await cache._cache_kline_data(symbol, "1m", _bars(10))
+    return cache
+
+def test_unknown_policy_rejected():
+    with pytest.raises(ValueError):
+        CacheEvictor(DataCacheService(), max_bars=10, policy="fifo")
+
+@pytest.mark.asyncio
+async def test_within_budget_evicts_nothing(cache):
+    evictor = CacheEvictor(cache, max_bars=30)
+    
+    assert evictor.evict_once() == 0
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_read(cache):
+    cache.record_access("000002", "1m")
+    cache.record_access("000001", "1m")
+    evictor = CacheEvictor(cache, max_bars=25, target_ratio=0.8)
+    
+    # 30 bars cached, target is 20: the unread series goes first, then the oldest read
+    assert evictor.evict_once() == 10
+    assert cache.get_series_sizes() == {("000001", "1m"): 10, ("000002", "1m"): 10}
+
+@pytest.mark.asyncio
+async def test_lfu_evicts_least_frequently_read(cache):
+    for _ in range(3):
+        cache.record_access("000001", "1m")
+    cache.record_access("000002", "1m")
+    cache.record_access("600000", "1m")
+    cache.record_access("600000", "1m")
+    evictor = CacheEvictor(cache, max_bars=25, policy="lfu", target_ratio=0.5)
+    
+    # Target is 12 bars: 000002 is removed, then the oldest 8 bars of 600000
+    assert evictor.evict_once() == 18
+    assert cache.get_series_sizes() == {("000001", "1m"): 10, ("600000", "1m"): 2}
+
+@pytest.mark.asyncio
+async def test_protected_series_are_kept(cache):
+    evictor = CacheEvictor(cache, max_bars=10, target_ratio=1.0, protected={("000001", "1m"), ("000002", "1m")})
+    
+    evictor.evict_once()
+    
+    assert cache.get_series_sizes() == {("000001", "1m"): 10, ("000002", "1m"): 10}
+
+@pytest.mark.asyncio
+async def test_background_eviction_updates_state_on_the_loop(cache):
+    evictor = CacheEvictor(cache, max_bars=25, target_ratio=0.8, interval=3600)
+    versions = {key: cache.get_cache_version(*key) for key in cache.get_series_sizes()}
+    forget = cache.forget_evicted_bars
+    threads = []
+    
+    def record(*args):
+        threads.append(threading.current_thread())
+        forget(*args)
+    
+    cache.forget_evicted_bars = record
+    evictor.start()
+    for _ in range(200):
+        if threads:
+            break
+        await asyncio.sleep(0.01)
+    await evictor.stop()
+    
+    # Bars were deleted in a worker thread, versions moved on the loop's thread
+    assert threads == [threading.current_thread()]
+    evicted = [key for key, version in versions.items() if cache.get_cache_version(*key) != version]
+    assert len(evicted) == 1 and evicted[0] not in cache.get_series_sizes()
@@ -0,0 +1,62 @@
+import json
+import pytest
+from datetime import datetime
+from unittest.mock import patch
+
+from backend.app.loadgen import LatencyStats, _frame_ticks, main, run_load
+from backend.app.models.values import Tick
+from backend.app.services.realtime import realtime_hub
+from backend.app.services.tick_stream import encode_block, encode_frame
+
+def test_latency_percentiles():
+    stats = LatencyStats()
+    assert stats.snapshot()["p50_ms"] is None
+    
+    for millisecond in range(1, 101):
+        stats.observe(millisecond / 1000)
+    snapshot = stats.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50_ms"] == 51.0
+    assert snapshot["p95_ms"] == 96.0
+    assert snapshot["p99_ms"] == 100.0
+    assert snapshot["max_ms"] == 100.0
+
+def test_frame_ticks_decodes_both_formats():
+    tick = Tick("000001", 10.5, 100, datetime(2023, 12, 1, 9, 30))
+    expected = [tick.to_dict()]
+    
+    assert _frame_ticks(encode_frame([encode_block("000001", [tick])])) == expected
+    assert _frame_ticks(json.dumps({"type": "ticks", "ticks": expected})) == expected
+
+@pytest.mark.asyncio
+async def test_run_load_in_process():
+    with patch.object(realtime_hub, "subscribed_symbols", set()), patch.object(realtime_hub, "_refcounts", {}):
+        report = await run_load(
+            clients=3,
+            duration=1.0,
+            symbols=["000001", "600000"],
+            tick_rate=20,
+            poll_interval=0.1,
+            switch_every=3
+        )
+    
+    assert report["target"] == "in-process"
+    assert report["clients"] == 3
+    assert report["errors"] == 0
+    assert report["throughput_rps"] > 0
+    assert report["operations"]["history"]["count"] == 3
+    assert report["operations"]["latest_price"]["count"] > 0
+    assert report["operations"]["switch_timeframe"]["count"] > 0
+    assert report["ticks"]["count"] > 0
+    assert report["ticks"]["p99_ms"] is not None
+    assert report["stream_format"] == "json"
+
+def test_main_prints_json_report(capsys):
+    report = {"clients": 1, "ticks": {}}
+    with patch("backend.app.loadgen.run_load", return_value=report) as run:
+        main(["--clients", "1", "--duration", "2", "--symbols", "000001", "--tick-rate", "5"])
+    
+    assert run.call_args.kwargs["clients"] == 1
+    assert run.call_args.kwargs["symbols"] == ["000001"]
+    assert run.call_args.kwargs["tick_rate"] == 5
+    assert '"clients": 1' in capsys.readouterr().out
@@ -1,3 +1,5 @@
+import subprocess
+import sys
 import pytest
 from fastapi.testclient import TestClient
 from backend.app.main import app
@@ -12,4 +14,87 @@ def test_health_check():
     client = TestClient(app)
     response = client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "healthy"}
\ No newline at end of file
+    assert response.json() == {"status": "healthy"}
+
+
+def _large_response_app():
+    from fastapi import FastAPI
+    from fastapi.responses import PlainTextResponse
+    from backend.app.compression import CompressionMiddleware
+    
+    small_app = FastAPI()
+    small_app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    
+    @small_app.get("/large")
+    async def large():
+        return PlainTextResponse("x" * 4096)
+    
+    @small_app.get("/small")
+    async def small():
+        return PlainTextResponse("x" * 16)
+    
+    @small_app.get("/tagged")
+    async def tagged():
+        return PlainTextResponse("x" * 4096, headers={"ETag": '"v1"'})
+    
+    return small_app
+
+def test_compression_gzip():
+    client = TestClient(_large_response_app())
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "x" * 4096
+    
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+
+def test_compression_weakens_etag_and_sets_vary():
+    client = TestClient(_large_response_app())
+    response = client.get("/tagged", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    
+    response = client.get("/tagged", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"v1"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_compression_brotli():
+    brotli = pytest.importorskip("brotli")
+    client = TestClient(_large_response_app())
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    
+    # br;q=0 refuses brotli
+    response = client.get("/large", headers={"Accept-Encoding": "gzip, br;q=0"})
+    assert response.headers["content-encoding"] == "gzip"
+
+def test_background_services_load_lazily():
+    """Importing the app leaves the background services to the lifespan phases that start them"""
+    lazy = [
+        "backend.app.services.analytics",
+        "backend.app.services.backfill",
+        "backend.app.services.eviction",
+        "backend.app.services.snapshot",
+        "backend.app.services.tick_stream",
+        "multiprocessing.shared_memory",
+        "duckdb",
+    ]
+    code = f"import sys, backend.app.main; print([name for name in {lazy!r} if name in sys.modules])"
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_lifespan_reports_startup_phases():
+    with TestClient(app) as client:
+        client.get("/")
+        report = client.get("/health/startup").json()
+    
+    assert report["ready"] is True
+    assert report["failed_phase"] is None
+    assert {"schema_check", "provider_connect", "write_queue_start"} <= set(report["phases_ms"])
+    assert report["time_to_ready_ms"] > 0
+    assert report["time_to_first_request_ms"] >= report["time_to_ready_ms"]
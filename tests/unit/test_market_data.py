@@ -1,6 +1,8 @@
 import pytest
 import asyncio
 from unittest.mock import AsyncMock
+from backend.app.models.bar_batch import BarBatch
+from backend.app.models.values import Tick
 from backend.app.services.market_data import MockMarketDataProvider
 
 @pytest.mark.asyncio
@@ -31,7 +33,7 @@ async def test_get_kline_data_requires_connection():
     await provider.connect()
     data = await provider.get_kline_data("000001", "1m")
     
-    assert isinstance(data, list)
+    assert isinstance(data, BarBatch)
     assert len(data) > 0
     
     # Validate data structure
@@ -68,10 +70,25 @@ async def test_realtime_subscription():
     
     # Validate data structure
     tick = received_data[0]
-    assert "symbol" in tick
-    assert "price" in tick
-    assert "volume" in tick
-    assert "timestamp" in tick
-    assert tick["symbol"] == "000001"
+    assert isinstance(tick, Tick)
+    assert tick.symbol == "000001"
+    assert tick.price > 0 and tick.volume > 0
     
-    await provider.disconnect()
\ No newline at end of file
+    await provider.disconnect()
+
+
+@pytest.mark.asyncio
+async def test_get_kline_data_covers_requested_range():
+    from datetime import datetime
+    provider = MockMarketDataProvider()
+    await provider.connect()
+    
+    data = await provider.get_kline_data(
+        "000001", "5m",
+        start_time=datetime(2023, 12, 1, 9, 32),
+        end_time=datetime(2023, 12, 1, 10, 0)
+    )
+    
+    assert data[0]["time"] == "2023-12-01T09:30:00"
+    assert data[-1]["time"] == "2023-12-01T10:00:00"
+    assert len(data) == 7
@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from backend.app.main import app
+from backend.app.services.resilience import CircuitOpenError
+from backend.app.services.measurements import (
+    MeasurementService,
+    measured_moves,
+    measurement_service,
+    price_changes,
+)
+
+@pytest.fixture
+def bars():
+    return [
+        {"time": "2023-12-01T09:30:00", "open": 100.0, "high": 105.0, "low": 98.0, "close": 102.0, "volume": 1000},
+        {"time": "2023-12-01T09:31:00", "open": 102.0, "high": 106.0, "low": 101.0, "close": 104.0, "volume": 1200},
+        {"time": "2023-12-01T09:32:00", "open": 104.0, "high": 104.5, "low": 97.0, "close": 99.0, "volume": 800}
+    ]
+
+@pytest.fixture
+def cache(bars):
+    cache = MagicMock()
+    cache.get_latest_prices.side_effect = lambda symbols: {symbol: 103.0 for symbol in symbols}
+    cache.get_kline_data = AsyncMock(return_value=bars)
+    return cache
+
+def test_measured_moves_long_and_short():
+    long_move, short_move = measured_moves([95.0, 110.0], [100.0, 100.0], [103.0, None])
+    
+    assert long_move["direction"] == "long"
+    assert long_move["points"] == {"0": 95.0, "1": 100.0, "2": 105.0, "3": 110.0}
+    assert long_move["distance"] == {"0": -8.0, "2": 2.0, "3": 7.0}
+    assert long_move["r_multiple"] == pytest.approx(0.6)
+    
+    assert short_move["direction"] == "short"
+    assert short_move["risk"] == 10.0
+    assert short_move["points"]["3"] == 80.0
+    assert short_move["distance"]["2"] is None
+
+def test_price_changes():
+    (result,) = price_changes([100.0], [110.0], [105.0])
+    
+    assert result["change"] == 10.0
+    assert result["change_pct"] == 10.0
+    assert result["distance"] == 5.0
+
+@pytest.mark.asyncio
+async def test_evaluate_batch(cache):
+    """Test a mixed batch loads bars once per series and reports errors in place"""
+    service = MeasurementService(cache)
+    
+    result = await service.evaluate([
+        {"id": "a", "type": "measured_move", "symbol": "000001", "stop": 95.0, "entry": 100.0},
+        {"id": "b", "type": "measure", "symbol": "000001", "timeframe": "1m",
+         "start_time": datetime(2023, 12, 1, 9, 30), "end_time": datetime(2023, 12, 1, 9, 32, 30)},
+        {"id": "c", "type": "measure", "symbol": "000001", "timeframe": "1m",
+         "start_time": datetime(2023, 12, 1, 9, 31), "end_time": datetime(2023, 12, 1, 9, 32)},
+        {"id": "d", "type": "measured_move", "symbol": "000001", "stop": 100.0, "entry": 100.0}
+    ])
+    
+    assert result["count"] == 4
+    move, measure, shorter, invalid = result["results"]
+    assert move["id"] == "a" and move["points"]["3"] == 110.0
+    assert measure["start_price"] == 102.0 and measure["end_price"] == 99.0
+    assert measure["range"] == {"high": 106.0, "low": 97.0, "amplitude": 9.0, "amplitude_pct": pytest.approx(9.0 / 97.0 * 100), "bars": 3}
+    assert shorter["range"]["bars"] == 2
+    assert invalid == {"id": "d", "type": "measured_move", "symbol": "000001", "error": "Stop and entry must differ"}
+    cache.get_kline_data.assert_called_once_with(
+        "000001", "1m", start_time=datetime(2023, 12, 1, 9, 30), end_time=datetime(2023, 12, 1, 9, 32, 30)
+    )
+    cache.get_latest_prices.assert_called_once_with(["000001"])
+
+@pytest.mark.asyncio
+async def test_evaluate_upstream_failure_stays_per_series(cache, bars):
+    """Test a series that cannot be fetched only fails the measures anchored to it"""
+    async def get_kline_data(symbol, timeframe, start_time, end_time):
+        if symbol == "600000":
+            raise CircuitOpenError("provider circuit open")
+        return bars
+    cache.get_kline_data = AsyncMock(side_effect=get_kline_data)
+    service = MeasurementService(cache)
+    
+    result = await service.evaluate([
+        {"type": "measure", "symbol": "000001",
+         "start_time": datetime(2023, 12, 1, 9, 30), "end_time": datetime(2023, 12, 1, 9, 32)},
+        {"type": "measure", "symbol": "600000",
+         "start_time": datetime(2023, 12, 1, 9, 30), "end_time": datetime(2023, 12, 1, 9, 32)}
+    ])
+    
+    ok, failed = result["results"]
+    assert ok["start_price"] == 102.0
+    assert failed["error"].startswith("Bars unavailable")
+
+def test_batch_endpoint(cache):
+    client = TestClient(app)
+    
+    with patch.object(measurement_service, "cache", cache):
+        response = client.post("/api/measurements/batch", json={"measurements": [
+            {"type": "measure", "symbol": "000001", "start_price": 100.0, "end_price": 95.0},
+            {"type": "measure", "symbol": "600000"}
+        ]})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["latest_prices"] == {"000001": 103.0, "600000": 103.0}
+    assert data["results"][0]["change_pct"] == -5.0
+    assert "error" in data["results"][1]
+    
+    assert client.post("/api/measurements/batch", json={"measurements": [{"type": "ruler", "symbol": "x"}]}).status_code == 422
+    
+    start = datetime(2023, 12, 1, 9, 30).astimezone().astimezone(timezone.utc)
+    with patch.object(measurement_service, "cache", cache):
+        response = client.post("/api/measurements/batch", json={"measurements": [
+            {"type": "measure", "symbol": "000001", "start_time": start.isoformat(),
+             "end_time": start.replace(minute=32).isoformat()}
+        ]})
+    
+    assert response.status_code == 200
+    assert response.json()["results"][0]["start_price"] == 102.0
+    assert cache.get_kline_data.call_args.kwargs["start_time"] == datetime(2023, 12, 1, 9, 30)
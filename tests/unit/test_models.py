@@ -1,5 +1,7 @@
 import pytest
 from datetime import datetime
+from backend.app.models.bar_batch import BarBatch
+from backend.app.models.values import Bar, Tick
 from backend.app.models.market_data import KLineData, RealtimeData
 
 def test_kline_data_creation():
@@ -138,4 +140,63 @@ def test_kline_data_validation():
     assert isinstance(kline.open_price, float)
     assert isinstance(kline.volume, int)
     assert kline.open_price == 100.0
-    assert kline.volume == 1000
\ No newline at end of file
+    assert kline.volume == 1000
+
+
+def test_bar_batch_columns_and_views():
+    """Test BarBatch stores columns and reads back as API dictionaries"""
+    bars = [
+        {"time": "2023-12-01T09:30:00", "open": 100.0, "high": 105.0, "low": 98.0, "close": 102.0, "volume": 1000},
+        {"time": "2023-12-01T09:31:00", "open": 102.0, "high": 106.0, "low": 101.0, "close": 104.0, "volume": 1200}
+    ]
+    batch = BarBatch.from_dicts(bars)
+    
+    assert batch.times.typecode == "q" and batch.closes.typecode == "d"
+    assert list(batch.times) == [1701423000000, 1701423060000]
+    assert len(batch) == 2
+    assert batch[1] == bars[1]
+    assert batch[-1]["time"] == "2023-12-01T09:31:00"
+    assert batch == bars
+    assert batch[1:] == bars[1:]
+    assert BarBatch.of(batch) is batch
+    assert batch.to_columns()["close"] == [102.0, 104.0]
+    assert [batch.time_at(index) for index in range(len(batch))] == [
+        datetime(2023, 12, 1, 9, 30), datetime(2023, 12, 1, 9, 31)
+    ]
+    assert list(batch.bars()) == [batch.bar(0), batch.bar(1)]
+    assert [bar.to_dict() for bar in batch.bars()] == bars
+
+def test_bar_batch_from_rows_matches_to_dict():
+    rows = [
+        KLineData(id=index + 1, symbol="000001", timeframe="1m", timestamp=datetime(2023, 12, 1, 9, 30 + index),
+                  open_price=100.0, high_price=105.0, low_price=98.0, close_price=102.0, volume=1000)
+        for index in range(3)
+    ]
+    batch = BarBatch.from_rows(rows)
+    
+    assert batch.to_dicts() == [row.to_dict() for row in rows]
+    assert list(batch) == [row.to_dict() for row in rows]
+    assert BarBatch.from_rows([]).to_dicts() == []
+
+def test_tick_value_conversions():
+    """Test Tick converts between wire dictionaries, ORM rows and insert values"""
+    tick = Tick.from_dict({"symbol": "000001", "price": "101.5", "volume": 300, "timestamp": "2023-12-01T09:30:00"})
+    
+    assert tick == Tick("000001", 101.5, 300, datetime(2023, 12, 1, 9, 30))
+    assert Tick.of(tick) is tick
+    assert tick.to_dict() == {"symbol": "000001", "price": 101.5, "volume": 300, "timestamp": "2023-12-01T09:30:00"}
+    assert Tick.from_dict(tick.to_dict()) == tick
+    assert Tick.from_row(RealtimeData(**tick.to_row())) == tick
+    
+    # Immutable and without a per-instance dictionary
+    with pytest.raises(AttributeError):
+        tick.price = 102.0
+    assert not hasattr(tick, "__dict__")
+
+def test_bar_value_conversions():
+    bar = Bar.from_dict({"time": "2023-12-01T09:30:00", "open": 100, "high": 105, "low": 98, "close": 102, "volume": 1000})
+    
+    assert bar.to_dict()["time"] == "2023-12-01T09:30:00"
+    assert KLineData(symbol="000001", timeframe="1m", **bar.to_values()).to_dict()["close"] == 102.0
+    assert Bar.from_row(KLineData(symbol="000001", timeframe="1m", **bar.to_values())) == bar
+    assert BarBatch.from_dicts([bar.to_dict()]).bar(0) == bar
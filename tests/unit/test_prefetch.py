@@ -0,0 +1,85 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+
+from backend.app.config import _parse_watchlist
+from backend.app.models.values import SeriesInfo
+from backend.app.services.prefetch import PrefetchScheduler
+
+@pytest.fixture
+def mock_cache():
+    cache = MagicMock()
+    cache.refresh_kline_data = AsyncMock(return_value=[])
+    cache.get_last_access.return_value = 0.0
+    cache.get_series_summary.return_value = None
+    return cache
+
+def test_parse_watchlist():
+    watchlist = _parse_watchlist(["000001", "600000:5m", "000001:1m"], ["1m", "15m"])
+    
+    assert watchlist == [("000001", "1m"), ("000001", "15m"), ("600000", "5m")]
+
+def test_next_refresh_time(mock_cache):
+    scheduler = PrefetchScheduler(mock_cache, [("000001", "5m")], delay=timedelta(seconds=2))
+    
+    assert scheduler.next_refresh_time("000001", "5m", datetime(2023, 12, 1, 9, 31, 10)) == datetime(2023, 12, 1, 9, 35, 2)
+    # Within the delay after a close, that close is still due
+    assert scheduler.next_refresh_time("000001", "5m", datetime(2023, 12, 1, 9, 35, 1)) == datetime(2023, 12, 1, 9, 35, 2)
+    assert scheduler.next_refresh_time("000001", "5m", datetime(2023, 12, 1, 9, 35, 2)) == datetime(2023, 12, 1, 9, 40, 2)
+    # Lunch break, and the weekend after Friday's close (2023-12-01 is a Friday)
+    assert scheduler.next_refresh_time("000001", "5m", datetime(2023, 12, 1, 11, 31)) == datetime(2023, 12, 1, 13, 5, 2)
+    assert scheduler.next_refresh_time("000001", "5m", datetime(2023, 12, 1, 15, 1)) == datetime(2023, 12, 4, 9, 35, 2)
+    # Night sessions of commodity futures are waited for
+    assert scheduler.next_refresh_time("rb2405", "1m", datetime(2023, 12, 1, 15, 1)) == datetime(2023, 12, 1, 21, 1, 2)
+
+def test_prioritize_by_recent_access(mock_cache):
+    last_access = {("000001", "1m"): 10.0, ("600000", "1m"): 20.0}
+    mock_cache.get_last_access.side_effect = lambda symbol, timeframe: last_access.get((symbol, timeframe), 0.0)
+    watchlist = [("000001", "1m"), ("000002", "1m"), ("600000", "1m")]
+    scheduler = PrefetchScheduler(mock_cache, watchlist)
+    
+    assert scheduler.prioritize(watchlist) == [("600000", "1m"), ("000001", "1m"), ("000002", "1m")]
+
+@pytest.mark.asyncio
+async def test_warm_up_preloads_watchlist(mock_cache):
+    scheduler = PrefetchScheduler(mock_cache, [("000001", "1m"), ("000001", "2w")], lookback_bars=10)
+    
+    await scheduler.warm_up()
+    
+    # Unknown timeframes are dropped from the watchlist
+    mock_cache.refresh_kline_data.assert_called_once()
+    call_args = mock_cache.refresh_kline_data.call_args
+    assert call_args.args == ("000001", "1m")
+    assert datetime.now() - call_args.kwargs["start_time"] >= timedelta(minutes=10)
+
+@pytest.mark.asyncio
+async def test_refresh_failures_do_not_stop_others(mock_cache):
+    mock_cache.refresh_kline_data.side_effect = [ConnectionError("down"), []]
+    scheduler = PrefetchScheduler(mock_cache, [("000001", "1m"), ("600000", "1m")])
+    
+    await scheduler.warm_up()
+    
+    assert mock_cache.refresh_kline_data.call_count == 2
+
+@pytest.mark.asyncio
+async def test_bar_close_refresh_starts_at_last_cached_bar(mock_cache):
+    last_bar = datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=1)
+    mock_cache.get_series_summary.side_effect = lambda symbol, timeframe: (
+        SeriesInfo(symbol, timeframe, last_bar - timedelta(minutes=499), last_bar, 500, 10.0, datetime.now())
+        if symbol == "000001" else None
+    )
+    scheduler = PrefetchScheduler(mock_cache, [("000001", "1m"), ("600000", "1m")], lookback_bars=500)
+    
+    await scheduler.refresh(scheduler.watchlist)
+    
+    start_times = {call.args[0]: call.kwargs["start_time"] for call in mock_cache.refresh_kline_data.call_args_list}
+    assert start_times["000001"] == last_bar
+    # Series not cached yet still get the whole lookback window
+    assert datetime.now() - start_times["600000"] >= timedelta(minutes=500)
+    
+    mock_cache.refresh_kline_data.reset_mock()
+    await scheduler.warm_up()
+    assert all(
+        datetime.now() - call.kwargs["start_time"] >= timedelta(minutes=500)
+        for call in mock_cache.refresh_kline_data.call_args_list
+    )
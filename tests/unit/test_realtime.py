@@ -0,0 +1,93 @@
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from backend.app.models.values import Tick
+from backend.app.services.realtime import RealtimeHub, is_valid_symbol
+
+@pytest.mark.asyncio
+async def test_publish_reaches_all_listeners():
+    hub = RealtimeHub()
+    received = []
+    
+    async def failing_listener(tick):
+        raise RuntimeError("boom")
+    
+    async def listener(tick):
+        received.append(tick)
+    
+    hub.add_listener(failing_listener)
+    hub.add_listener(listener)
+    hub.add_listener(listener)
+    
+    await hub.publish({"symbol": "000001", "price": 100.0})
+    
+    # Listeners get Tick values, converted once from the provider's dictionaries
+    assert [(tick.symbol, tick.price) for tick in received] == [("000001", 100.0)]
+    assert isinstance(received[0], Tick)
+    
+    hub.remove_listener(listener)
+    await hub.publish({"symbol": "000001", "price": 100.5})
+    assert len(received) == 1
+
+@pytest.mark.asyncio
+async def test_subscribe_once_per_symbol():
+    hub = RealtimeHub()
+    
+    with patch('backend.app.services.realtime.market_data_provider') as mock_provider:
+        mock_provider.subscribe_realtime_data = AsyncMock()
+        
+        await hub.subscribe("000001")
+        await hub.subscribe("000001")
+        
+        mock_provider.subscribe_realtime_data.assert_called_once_with("000001", hub.publish)
+        assert hub.subscribed_symbols == {"000001"}
+
+@pytest.mark.asyncio
+async def test_last_unsubscribe_ends_upstream_subscription():
+    hub = RealtimeHub()
+    
+    with patch('backend.app.services.realtime.market_data_provider') as mock_provider:
+        mock_provider.subscribe_realtime_data = AsyncMock()
+        mock_provider.unsubscribe_realtime_data = AsyncMock()
+        
+        await hub.subscribe("000001")
+        await hub.subscribe("000001")
+        await hub.unsubscribe("000001")
+        mock_provider.unsubscribe_realtime_data.assert_not_called()
+        
+        await hub.unsubscribe("000001")
+        mock_provider.unsubscribe_realtime_data.assert_called_once_with("000001")
+        assert hub.subscribed_symbols == set()
+        
+        # A failed subscription holds no reference
+        mock_provider.subscribe_realtime_data.side_effect = ConnectionError("down")
+        with pytest.raises(ConnectionError):
+            await hub.subscribe("600000")
+        assert hub._refcounts == {}
+
+@pytest.mark.asyncio
+async def test_relayed_ticks_skip_owner_only_listeners():
+    hub = RealtimeHub()
+    received, persisted = [], []
+    
+    async def listener(tick):
+        received.append(tick)
+    
+    async def persist(tick):
+        persisted.append(tick)
+    
+    hub.add_listener(listener)
+    hub.add_listener(persist, relayed=False)
+    
+    await hub.relay(Tick.from_dict({"symbol": "000001", "price": 100.0}))
+    await hub.publish({"symbol": "000001", "price": 100.5})
+    
+    assert [tick.price for tick in received] == [100.0, 100.5]
+    assert [tick.price for tick in persisted] == [100.5]
+
+def test_is_valid_symbol():
+    assert is_valid_symbol("000001")
+    assert is_valid_symbol("IF2312.CFE")
+    assert not is_valid_symbol("")
+    assert not is_valid_symbol("000001;DROP")
+    assert not is_valid_symbol("X" * 21)
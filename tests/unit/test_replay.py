@@ -0,0 +1,139 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, patch
+
+from backend.app.database import create_tables, drop_tables, get_db_session
+from backend.app.models.market_data import RealtimeData
+from backend.app.models.values import Tick
+from backend.app.services import market_data
+from backend.app.services.replay import (
+    ReplayMarketDataProvider,
+    load_recorded_ticks,
+    read_archive,
+    write_archive,
+)
+
+START = datetime(2023, 12, 1, 9, 30)
+
+@pytest.fixture(scope="function")
+def setup_test_db():
+    """Set up test database"""
+    create_tables()
+    yield
+    drop_tables()
+
+def recording():
+    # A burst of three ticks, a pause, then one more; a second symbol in between
+    return [
+        Tick("000001", 10.0, 100, START),
+        Tick("000001", 10.1, 200, START + timedelta(milliseconds=10)),
+        Tick("000001", 10.2, 300, START + timedelta(milliseconds=20)),
+        Tick("600000", 8.0, 50, START + timedelta(milliseconds=500)),
+        Tick("000001", 10.3, 400, START + timedelta(seconds=1))
+    ]
+
+@pytest.mark.parametrize("name", ["ticks.ndjson", "ticks.ndjson.gz"])
+def test_archive_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    assert write_archive(path, recording()) == 5
+    assert list(read_archive(path)) == recording()
+
+@pytest.mark.asyncio
+async def test_replay_preserves_inter_arrival_shape():
+    provider = ReplayMarketDataProvider(recording, speed=5)
+    await provider.connect()
+    arrivals = []
+    
+    async def callback(tick):
+        arrivals.append((asyncio.get_running_loop().time(), tick))
+    
+    await provider.subscribe_realtime_data("000001", callback)
+    await provider.join()
+    
+    assert [tick.price for _, tick in arrivals] == [10.0, 10.1, 10.2, 10.3]
+    # The burst stays a burst and the 980 ms pause becomes about 196 ms
+    assert arrivals[2][0] - arrivals[0][0] < 0.05
+    assert 0.15 < arrivals[3][0] - arrivals[2][0] < 0.4
+    # Ticks are stamped with their replay time
+    assert arrivals[0][1].timestamp > START
+    assert provider.ticks_replayed == 4
+
+@pytest.mark.asyncio
+async def test_unthrottled_replay():
+    ticks = [Tick("000001", 10.0 + index / 100, index, START + timedelta(seconds=index)) for index in range(1000)]
+    provider = ReplayMarketDataProvider(lambda: ticks, speed=0, rebase=False)
+    await provider.connect()
+    received = []
+    
+    async def callback(tick):
+        received.append(tick)
+    
+    await provider.subscribe_realtime_data("000001", callback)
+    await asyncio.wait_for(provider.join(), 2)
+    
+    assert received == ticks
+    assert provider.tick_count == 1000
+
+@pytest.mark.asyncio
+async def test_disconnect_stops_replay():
+    history = AsyncMock()
+    history.is_connected = False
+    history.get_kline_data.return_value = []
+    provider = ReplayMarketDataProvider(recording, speed=1, history=history)
+    
+    with pytest.raises(ConnectionError):
+        await provider.subscribe_realtime_data("000001", AsyncMock())
+    
+    await provider.connect()
+    callback = AsyncMock()
+    await provider.subscribe_realtime_data("000001", callback)
+    await asyncio.sleep(0.1)
+    await provider.disconnect()
+    
+    assert callback.await_count == 3
+    history.connect.assert_awaited_once()
+    
+    await provider.connect()
+    await provider.get_kline_data("000001", "1m")
+    history.get_kline_data.assert_awaited_once_with("000001", "1m", None, None)
+
+def test_load_recorded_ticks(setup_test_db):
+    with get_db_session() as session:
+        for tick in reversed(recording()):
+            session.add(RealtimeData(**tick.to_row()))
+        session.commit()
+    
+    # Bounded by the recording, as other tests leave ticks in the database
+    end = START + timedelta(seconds=1)
+    assert load_recorded_ticks(start_time=START, end_time=end) == recording()
+    assert load_recorded_ticks(["600000"], START, end) == [recording()[3]]
+    assert load_recorded_ticks(start_time=START + timedelta(milliseconds=20), end_time=START + timedelta(milliseconds=500)) == recording()[2:4]
+
+def test_upstream_provider_from_config():
+    assert isinstance(market_data._upstream_provider(), market_data.MockMarketDataProvider)
+    
+    with patch.object(market_data, "REPLAY_SOURCE", "ticks.ndjson.gz"), patch.object(market_data, "REPLAY_SPEED", 0.0):
+        provider = market_data._upstream_provider()
+    assert isinstance(provider, ReplayMarketDataProvider)
+    assert provider.speed == 0.0
+    
+    # A database replay is always bounded by symbols and a time window
+    with patch.object(market_data, "REPLAY_SOURCE", "db"):
+        with pytest.raises(ValueError):
+            market_data._upstream_provider()
+        with patch.object(market_data, "REPLAY_SYMBOLS", ["000001"]), \
+                patch.object(market_data, "REPLAY_START", START.isoformat()), \
+                patch.object(market_data, "REPLAY_END", (START + timedelta(hours=1)).isoformat()):
+            assert isinstance(market_data._upstream_provider(), ReplayMarketDataProvider)
+
+@pytest.mark.asyncio
+async def test_replayed_ticks_are_not_persisted():
+    from backend.app.services.data_cache import DataCacheService
+    
+    service = DataCacheService()
+    service.persist_ticks = False
+    await service.enqueue_tick(recording()[0])
+    
+    assert service.get_latest_price("000001") == recording()[0].price
+    assert service.tick_write_queue.depth == 0
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from backend.app.services.market_data import MarketDataProvider, ResilientProvider
+from backend.app.services.resilience import (
+    AdaptiveLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LimiterRejectedError,
+    RetryPolicy,
+    TokenBucket,
+    UpstreamTimeoutError,
+)
+
+class FakeUpstream:
+    """Local TCP server answering one JSON line per connection
+    
+    Each request may be delayed or have its connection dropped, and the
+    server records how many requests it served concurrently.
+    """
+    
+    def __init__(self):
+        self.delay = 0.0
+        self.drop_next = 0
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self.server = None
+    
+    async def handle(self, reader, writer):
+        request = json.loads(await reader.readline())
+        self.requests += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.drop_next:
+                self.drop_next -= 1
+                return
+            await asyncio.sleep(self.delay)
+            writer.write(json.dumps([{"time": "2023-12-01T09:30:00", "close": 100.0, "symbol": request["symbol"]}]).encode() + b"\n")
+            await writer.drain()
+        finally:
+            self.active -= 1
+            writer.close()
+    
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+class TcpProvider(MarketDataProvider):
+    """Provider that fetches bars from the fake upstream"""
+    
+    def __init__(self, port: int):
+        self.port = port
+        self.is_connected = True
+        self.subscribe_attempts = 0
+    
+    async def get_kline_data(self, symbol: str, timeframe: str, start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        try:
+            writer.write(json.dumps({"symbol": symbol, "timeframe": timeframe}).encode() + b"\n")
+            line = await reader.readline()
+            if not line:
+                raise ConnectionResetError("Upstream closed the connection")
+            return json.loads(line)
+        finally:
+            writer.close()
+    
+    async def subscribe_realtime_data(self, symbol: str, callback) -> None:
+        self.subscribe_attempts += 1
+        raise ConnectionResetError("Upstream closed the connection")
+
+@pytest_asyncio.fixture
+async def upstream():
+    upstream = FakeUpstream()
+    port = await upstream.start()
+    yield upstream, TcpProvider(port)
+    upstream.server.close()
+    await upstream.server.wait_closed()
+
+def _provider(inner, **overrides):
+    options = {
+        "limiter": AdaptiveLimiter(initial_limit=2, max_limit=4, max_queue=100),
+        "bucket": TokenBucket(rate=1000, burst=1000),
+        "breaker": CircuitBreaker(failure_threshold=3, reset_timeout=60),
+        "retry": RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.005),
+        "timeout": 1.0,
+        **overrides
+    }
+    return ResilientProvider(inner, **options)
+
+@pytest.mark.asyncio
+async def test_burst_is_bounded_by_concurrency_limit(upstream):
+    """Test a burst of chart loads never exceeds the concurrency limit upstream"""
+    server, inner = upstream
+    server.delay = 0.02
+    provider = _provider(inner)
+    
+    results = await asyncio.gather(*(provider.get_kline_data(f"{index:06d}", "1m") for index in range(20)))
+    
+    assert [result[0]["symbol"] for result in results] == [f"{index:06d}" for index in range(20)]
+    assert server.peak <= 4
+    stats = provider.stats()
+    assert stats["operations"]["get_kline_data"]["calls"] == 20
+    assert stats["operations"]["get_kline_data"]["latency_p50_ms"] >= 20
+    # Fast successes grow the limit
+    assert stats["concurrency_limit"] > 2
+
+@pytest.mark.asyncio
+async def test_dropped_connections_are_retried(upstream):
+    server, inner = upstream
+    server.drop_next = 2
+    provider = _provider(inner)
+    
+    result = await provider.get_kline_data("000001", "1m")
+    
+    assert result[0]["symbol"] == "000001"
+    assert server.requests == 3
+    metrics = provider.stats()["operations"]["get_kline_data"]
+    assert metrics["retries"] == 2 and metrics["errors"] == 2
+    # Halved once for both failures, down to the minimum, then grown by the success
+    assert provider.limiter.limit == 2.0
+
+@pytest.mark.asyncio
+async def test_timeouts_open_the_circuit(upstream):
+    """Test slow upstream calls time out and repeated failures fail fast"""
+    server, inner = upstream
+    server.delay = 0.5
+    provider = _provider(inner, timeout=0.05)
+    
+    with pytest.raises(UpstreamTimeoutError):
+        await provider.get_kline_data("000001", "1m")
+    assert provider.breaker.state == "open"
+    
+    requests = server.requests
+    with pytest.raises(CircuitOpenError):
+        await provider.get_kline_data("000001", "1m")
+    assert server.requests == requests
+    assert provider.stats()["operations"]["get_kline_data"]["timeouts"] == 3
+
+@pytest.mark.asyncio
+async def test_subscriptions_are_not_retried(upstream):
+    _, inner = upstream
+    provider = _provider(inner)
+    
+    with pytest.raises(ConnectionResetError):
+        await provider.subscribe_realtime_data("000001", lambda tick: None)
+    assert inner.subscribe_attempts == 1
+
+@pytest.mark.asyncio
+async def test_bad_requests_leave_the_circuit_alone(upstream):
+    """Test errors that say nothing about upstream health do not close or reset the circuit"""
+    class BadRequestProvider(TcpProvider):
+        async def get_kline_data(self, symbol, timeframe, start_time=None, end_time=None):
+            raise ValueError("Unknown timeframe")
+    
+    provider = _provider(BadRequestProvider(upstream[1].port), breaker=CircuitBreaker(failure_threshold=3, reset_timeout=0))
+    provider.breaker.record_failure()
+    provider.breaker.record_failure()
+    
+    with pytest.raises(ValueError):
+        await provider.get_kline_data("000001", "7m")
+    assert provider.breaker.failures == 2
+    
+    provider.breaker.record_failure()
+    with pytest.raises(ValueError):
+        await provider.get_kline_data("000001", "7m")
+    # The half-open trial ended without a verdict, so the next call may try again
+    assert provider.breaker.state == "half_open"
+    assert provider.stats()["operations"]["get_kline_data"]["errors"] == 2
+
+def test_limiter_backs_off_once_per_window():
+    """Test failures of calls that were in flight together cut the limit once"""
+    limiter = AdaptiveLimiter(initial_limit=16, max_limit=16, latency_target=60.0)
+    
+    for _ in range(8):
+        limiter.on_overload()
+    
+    assert limiter.limit == 8.0
+    limiter._backed_off_at -= 60.0
+    limiter.on_overload()
+    assert limiter.limit == 4.0
+
+@pytest.mark.asyncio
+async def test_limiter_rejects_when_queue_is_full():
+    limiter = AdaptiveLimiter(initial_limit=1, max_queue=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+    
+    with pytest.raises(LimiterRejectedError):
+        await limiter.acquire()
+    
+    limiter.release()
+    await waiter
+    assert limiter.in_flight == 1
+
+@pytest.mark.asyncio
+async def test_token_bucket_rate():
+    bucket = TokenBucket(rate=100, burst=2)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    
+    for _ in range(4):
+        await bucket.acquire()
+    
+    # Two calls fit the burst, the next two wait about 10 ms each
+    assert loop.time() - started >= 0.015
+
+def test_circuit_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    
+    breaker.allow()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    
+    breaker.record_success()
+    assert breaker.state == "closed"
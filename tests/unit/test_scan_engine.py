@@ -0,0 +1,143 @@
+import pytest
+import pytest_asyncio
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from backend.app.database import ShardRouter
+from backend.app.services.analytics import resample_into
+from backend.app.services.data_cache import DataCacheService
+from backend.app.services.scan_engine import DuckDBScanEngine, ScanEngineError
+
+SYMBOLS = ["000001", "000002", "600000", "600036"]
+
+def _bars(count, start=datetime(2023, 12, 1, 9, 30), base=100.0):
+    return [
+        {
+            "time": (start + timedelta(minutes=i)).isoformat(),
+            "open": base + i,
+            "high": base + i + 2,
+            "low": base + i - 1,
+            "close": base + i + 1,
+            "volume": 100 + i
+        }
+        for i in range(count)
+    ]
+
+@pytest_asyncio.fixture
+async def service(tmp_path):
+    """Service on two shard files, with 30 1m bars per symbol"""
+    shards = ShardRouter.from_config(2, f"sqlite:///{tmp_path}/cache.db")
+    shards.create_all()
+    service = DataCacheService(shards)
+    for index, symbol in enumerate(SYMBOLS):
+        await service._cache_kline_data(symbol, "1m", _bars(30, base=100.0 * (index + 1)))
+    yield service
+    service.duckdb_scan_engine.disable("test finished")
+    shards.drop_all()
+    for shard_engine in shards.engines:
+        shard_engine.dispose()
+
+def _duckdb_engine(service):
+    pytest.importorskip("duckdb")
+    if not service.duckdb_scan_engine.available:
+        pytest.skip(f"DuckDB scan engine unavailable: {service.duckdb_scan_engine.unavailable_reason}")
+    return service.duckdb_scan_engine
+
+def test_estimate_scan_rows(service):
+    assert service.estimate_scan_rows(SYMBOLS, "1m") == 120
+    assert service.estimate_scan_rows(["000001"], "1m", datetime(2023, 12, 1, 9, 30), datetime(2023, 12, 1, 9, 44, 30)) == 15
+    assert service.estimate_scan_rows(["000001"], "1m", datetime(2023, 12, 2)) == 0
+    assert service.estimate_scan_rows(["000001", "999999"], "5m") == 0
+
+def test_choose_scan_engine(service):
+    service.scan_engine_min_rows = 100
+    service.duckdb_scan_engine.disable("not installed")
+    assert service.choose_scan_engine(SYMBOLS, "1m").name == "sqlite"
+    
+    service.duckdb_scan_engine = DuckDBScanEngine(service.shards)
+    service.duckdb_scan_engine._connect = lambda: pytest.fail("Choosing an engine must not connect")
+    assert service.choose_scan_engine(SYMBOLS, "1m").name == "duckdb"
+    assert service.choose_scan_engine(SYMBOLS[:3], "1m").name == "sqlite"
+    
+    service.scan_engine_mode = "duckdb"
+    assert service.choose_scan_engine(SYMBOLS[:1], "1m").name == "duckdb"
+    service.scan_engine_mode = "sqlite"
+    assert service.choose_scan_engine(SYMBOLS, "1m").name == "sqlite"
+
+def test_sqlite_scan(service):
+    series = service.scan_kline_data(SYMBOLS, "1m", datetime(2023, 12, 1, 9, 40), datetime(2023, 12, 1, 9, 49))
+    assert list(series) == SYMBOLS
+    assert [len(batch) for batch in series.values()] == [10] * 4
+    assert series["600000"].closes.tolist() == [300.0 + i + 1 for i in range(10, 20)]
+    assert series["600000"][0]["time"] == "2023-12-01T09:40:00"
+    assert service.scan_kline_data(["999999"], "1m")["999999"].to_dicts() == []
+
+def test_sqlite_resample_matches_analytics(service):
+    series = service.resample_kline_data(SYMBOLS, "1m", timedelta(minutes=15))
+    batch = series["000002"]
+    assert len(batch) == 2
+    assert batch.to_dicts()[0] == {
+        "time": "2023-12-01T09:30:00", "open": 200.0, "high": 216.0, "low": 199.0, "close": 215.0, "volume": sum(range(100, 115))
+    }
+    
+    source = service.scan_kline_data(["000002"], "1m")["000002"]
+    out = [[0.0] * len(source) for _ in range(6)]
+    count = resample_into([[t / 1000 for t in source.times], source.opens, source.highs, source.lows, source.closes, source.volumes], 900, out)
+    assert out[4][:count] == batch.closes.tolist()
+
+def test_duckdb_scan_matches_sqlite(service):
+    engine = _duckdb_engine(service)
+    start, end = datetime(2023, 12, 1, 9, 35), datetime(2023, 12, 1, 9, 52)
+    
+    assert service.scan_kline_data(SYMBOLS, "1m", start, end, engine) == service.scan_kline_data(SYMBOLS, "1m", start, end, service.sqlite_scan_engine)
+    for bucket in (timedelta(minutes=5), timedelta(hours=1)):
+        duckdb_series = service.resample_kline_data(SYMBOLS, "1m", bucket, start, end, engine)
+        sqlite_series = service.resample_kline_data(SYMBOLS, "1m", bucket, start, end, service.sqlite_scan_engine)
+        assert {symbol: batch.to_dicts() for symbol, batch in duckdb_series.items()} == {
+            symbol: batch.to_dicts() for symbol, batch in sqlite_series.items()
+        }
+
+@pytest.mark.asyncio
+async def test_duckdb_scan_sees_new_writes(service):
+    engine = _duckdb_engine(service)
+    assert len(service.scan_kline_data(["000001"], "1m", engine=engine)["000001"]) == 30
+    
+    await service._cache_kline_data("000001", "1m", _bars(5, start=datetime(2023, 12, 1, 10, 0)))
+    assert len(service.scan_kline_data(["000001"], "1m", engine=engine)["000001"]) == 35
+
+def test_failed_duckdb_scan_falls_back_to_sqlite(service):
+    engine = DuckDBScanEngine(service.shards, retry_seconds=60)
+    
+    def fail(*args):
+        raise ScanEngineError("attach failed")
+    
+    engine.resample = fail
+    service.duckdb_scan_engine = engine
+    used, series = service.resample_kline_data_with_engine(SYMBOLS, "1m", timedelta(minutes=5), engine=engine)
+    assert used is service.sqlite_scan_engine
+    assert len(series["000001"]) == 6
+    
+    # Suspended for the retry period, then connected again
+    assert engine.unavailable_reason == "attach failed"
+    assert not engine.available
+    engine._retry_at = time.monotonic()
+    if not engine.available:
+        assert engine.unavailable_reason != "attach failed"
+
+def test_duckdb_connection_failure_falls_back_to_sqlite(service):
+    """Test a DuckDB engine chosen before connecting falls back without losing why it is unavailable"""
+    engine = DuckDBScanEngine(service.shards, retry_seconds=60)
+    service.duckdb_scan_engine = engine
+    service.scan_engine_mode = "duckdb"
+    
+    with patch("backend.app.services.scan_engine._import_duckdb", return_value=None):
+        chosen = service.choose_scan_engine(SYMBOLS, "1m")
+        used, series = service.resample_kline_data_with_engine(SYMBOLS, "1m", timedelta(minutes=5), engine=chosen)
+    
+    assert chosen is engine
+    assert used is service.sqlite_scan_engine
+    assert len(series["000001"]) == 6
+    # Not installed is permanent, not a suspension
+    assert engine.unavailable_reason == "duckdb is not installed"
+    assert not engine.ready
@@ -0,0 +1,132 @@
+import json
+import os
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.models.values import Tick
+from backend.app.services.alerts import AlertIndex, alert_index
+from backend.app.services.data_cache import DataCacheService
+from backend.app.services.snapshot import (
+    HEADER,
+    SnapshotError,
+    SnapshotManager,
+    decode_snapshot,
+    encode_snapshot,
+    write_atomic,
+)
+
+def test_encode_decode_snapshot():
+    created_at = datetime(2023, 12, 1, 15, 5)
+    data = encode_snapshot({"alerts": {"alerts": []}}, clean=True, created_at=created_at)
+    assert decode_snapshot(data) == ({"alerts": {"alerts": []}}, True, created_at)
+    
+    with pytest.raises(SnapshotError, match="checksum"):
+        decode_snapshot(data[:-1] + bytes([data[-1] ^ 1]))
+    with pytest.raises(SnapshotError, match="Truncated"):
+        decode_snapshot(data[:HEADER.size - 1])
+    with pytest.raises(SnapshotError, match="version"):
+        decode_snapshot(data[:4] + (99).to_bytes(2, "little") + data[6:])
+
+def test_write_atomic_replaces_file(tmp_path):
+    path = str(tmp_path / "nested" / "state.snap")
+    write_atomic(path, b"old")
+    write_atomic(path, b"new")
+    
+    assert open(path, "rb").read() == b"new"
+    assert os.listdir(tmp_path / "nested") == ["state.snap"]
+
+def test_data_cache_state_round_trip():
+    cache = DataCacheService()
+    cache.record_tick(Tick("000001", 10.5, 100, datetime.now()))
+    cache.apply_change({
+        "type": "bars",
+        "symbol": "600000",
+        "timeframe": "1m",
+        "version": cache._next_version(),
+        "timestamps": [datetime(2023, 12, 1, 9, 30).isoformat()],
+        "close": [datetime(2023, 12, 1, 9, 30).isoformat(), 8.25]
+    })
+    cache.record_access("600000", "1m")
+    cache.record_access("600000", "1m")
+    state = json.loads(json.dumps(cache.snapshot_state()))
+    version = cache.get_cache_version("600000", "1m")
+    
+    restored = DataCacheService()
+    restored.restore_state(state, clean=True)
+    assert restored.get_cache_version("600000", "1m") == version
+    # Clients holding the restored version get an empty delta instead of a reload
+    assert restored.change_index.changed_since(("600000", "1m"), version) == []
+    assert restored.is_cache_fresh("600000", "1m")
+    assert restored.get_latest_price("000001") == 10.5
+    assert restored.get_latest_price("600000") == 8.25
+    assert restored.get_access_count("600000", "1m") == 2
+    assert restored.get_last_access("600000", "1m") > 0
+    assert restored._next_version() > version
+    
+    # After a crash, versions may be behind the database and are not restored
+    after_crash = DataCacheService()
+    after_crash.restore_state(state, clean=False)
+    assert after_crash.get_cache_version("600000", "1m") != version
+    assert after_crash.is_cache_fresh("600000", "1m")
+
+@pytest.mark.asyncio
+async def test_alert_state_round_trip():
+    alerts = AlertIndex()
+    level = alerts.add("000001", 10.0)
+    move = alerts.add_measured_move("000001", stop=9.0, entry=9.5)
+    await alerts.on_tick(Tick("000001", 9.8, 100, datetime.now()))
+    state = json.loads(json.dumps(alerts.snapshot_state()))
+    
+    restored = AlertIndex()
+    restored.restore_state(state, clean=False)
+    assert restored.active() == alerts.active()
+    assert restored.add("000001", 12.0)["id"] > max(alert["id"] for alert in alerts.active())
+    assert restored.add_measured_move("000001", stop=9.0, entry=9.5)["measurement_id"] > move["measurement_id"]
+    
+    # The price crossed 10.0 while the process was down
+    events = []
+    
+    async def listener(triggered):
+        events.extend(triggered)
+    
+    restored.add_listener(listener)
+    await restored.on_tick(Tick("000001", 10.1, 100, datetime.now()))
+    assert level["id"] in [event["id"] for event in events]
+
+def test_snapshot_manager_save_and_restore(tmp_path):
+    path = str(tmp_path / "state.snap")
+    loaded = []
+    manager = SnapshotManager(path, interval=0)
+    manager.register("counter", lambda: {"value": 3}, lambda state, clean: loaded.append((state, clean)))
+    
+    assert manager.restore()["reason"] == "no snapshot"
+    
+    assert manager.save(clean=True) > HEADER.size
+    report = manager.restore()
+    assert report["restored"] is True
+    assert report["sections"] == ["counter"]
+    assert loaded == [({"value": 3}, True)]
+    
+    with open(path, "r+b") as snapshot_file:
+        snapshot_file.seek(HEADER.size)
+        snapshot_file.write(b"\0")
+    assert manager.restore()["restored"] is False
+    assert len(loaded) == 1
+
+def test_restart_restores_alerts(snapshot_path):
+    with TestClient(app) as client:
+        alert = client.post("/api/alerts?symbol=000001&price=123.0").json()
+    assert os.path.exists(snapshot_path)
+    
+    alert_index.remove(alert["id"])
+    with TestClient(app) as client:
+        report = client.get("/health/startup").json()
+        assert alert_index.get(alert["id"]) == alert
+    
+    assert report["snapshot"]["restored"] is True
+    assert report["snapshot"]["clean"] is True
+    assert {"data_cache", "alerts"} <= set(report["snapshot"]["sections"])
+    assert "snapshot_restore" in report["phases_ms"]
+    alert_index.remove(alert["id"])
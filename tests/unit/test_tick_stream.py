@@ -0,0 +1,98 @@
+import json
+import pytest
+from datetime import datetime
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+from unittest.mock import AsyncMock, patch
+
+from backend.app.main import app
+from backend.app.models.values import Tick
+from backend.app.services.tick_stream import (
+    TickBatcher,
+    TickSubscription,
+    decode_frame,
+    encode_block,
+    encode_frame,
+    tick_batcher,
+)
+
+def _ticks(symbol, count, start=100.0):
+    return [
+        Tick(symbol, round(start + (index % 7 - 3) * 0.01, 2), 100 + index, datetime(2023, 12, 1, 9, 30, index // 10, index % 10 * 100000))
+        for index in range(count)
+    ]
+
+def test_frame_round_trip():
+    """Test ticks survive delta encoding, including falling prices and times"""
+    first = _ticks("000001", 50)
+    second = [
+        Tick("600000", 9.5, 0, datetime(2023, 12, 1, 9, 30, 1)),
+        Tick("600000", 9.01, 7, datetime(2023, 12, 1, 9, 30, 0, 500000))
+    ]
+    
+    frame = encode_frame([encode_block("000001", first), encode_block("600000", second)])
+    assert [Tick.from_dict(tick) for tick in decode_frame(frame)] == first + second
+    
+    with pytest.raises(ValueError):
+        decode_frame(frame[:-1])
+
+def test_frame_is_much_smaller_than_json():
+    ticks = _ticks("000001", 100)
+    json_bytes = sum(len(json.dumps(tick.to_dict())) for tick in ticks)
+    assert len(encode_frame([encode_block("000001", ticks)])) * 10 < json_bytes
+
+@pytest.mark.asyncio
+async def test_batcher_encodes_each_symbol_once_per_window():
+    batcher = TickBatcher(window=60)
+    binary_clients = [TickSubscription({"000001", "600000"}, binary=True) for _ in range(50)]
+    json_client = TickSubscription({"000001"})
+    other = TickSubscription({"000002"}, binary=True)
+    for subscription in binary_clients + [json_client, other]:
+        batcher.add(subscription)
+    
+    for tick in _ticks("000001", 5) + _ticks("600000", 3) + _ticks("300750", 2):
+        await batcher.on_tick(tick)
+    batcher.flush()
+    
+    # One binary block per symbol and one JSON block, however many clients
+    assert batcher.blocks_encoded == 3
+    assert batcher.frames_sent == 51
+    assert len(decode_frame(binary_clients[0].queue.get_nowait())) == 8
+    message = json.loads(json_client.queue.get_nowait())
+    assert message["type"] == "ticks" and len(message["ticks"]) == 5
+    assert other.queue.empty()
+    
+    for subscription in binary_clients + [json_client, other]:
+        batcher.remove(subscription)
+    assert batcher._task is None
+
+def test_slow_client_drops_oldest_frames():
+    subscription = TickSubscription({"000001"})
+    for index in range(subscription.queue.maxsize + 2):
+        subscription.offer(str(index))
+    assert subscription.dropped == 2
+    assert subscription.queue.get_nowait() == "2"
+
+def test_tick_stream_endpoint():
+    client = TestClient(app)
+    
+    with patch('backend.app.api.market_data.realtime_hub') as mock_hub:
+        mock_hub.subscribe = AsyncMock()
+        mock_hub.unsubscribe = AsyncMock()
+        with client.websocket_connect("/api/market-data/ticks?symbols=TEST01&format=binary") as websocket:
+            for tick in _ticks("TEST01", 3):
+                websocket.portal.call(tick_batcher.on_tick, tick)
+            ticks = decode_frame(websocket.receive_bytes())
+            assert [tick["volume"] for tick in ticks] == [100, 101, 102]
+        
+        mock_hub.subscribe.assert_called_once_with("TEST01")
+        mock_hub.unsubscribe.assert_called_once_with("TEST01")
+        
+        # Malformed symbol lists are refused before subscribing
+        for symbols in ("TEST01,bad;symbol", ",", ",".join(f"S{index}" for index in range(51))):
+            with pytest.raises(WebSocketDisconnect):
+                with client.websocket_connect(f"/api/market-data/ticks?symbols={symbols}"):
+                    pass
+        mock_hub.subscribe.assert_called_once()
+    
+    assert tick_batcher.subscriber_count == 0
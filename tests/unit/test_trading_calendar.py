@@ -0,0 +1,98 @@
+import pytest
+from datetime import date, datetime, time
+from fastapi.testclient import TestClient
+
+from backend.app.main import app
+from backend.app.database import create_tables, drop_tables
+from backend.app.services.data_cache import data_cache_service
+from backend.app.services.trading_calendar import (
+    CN_EQUITY,
+    CN_EXCHANGE_HOLIDAYS,
+    TradingCalendar,
+    calendar_for,
+)
+
+# 2023-12-01 is a Friday
+FRIDAY = datetime(2023, 12, 1)
+
+@pytest.fixture(scope="function")
+def setup_test_db():
+    """Set up test database"""
+    create_tables()
+    yield
+    drop_tables()
+
+def test_equity_sessions():
+    assert CN_EQUITY.is_open(FRIDAY.replace(hour=10))
+    assert not CN_EQUITY.is_open(FRIDAY.replace(hour=12))
+    assert not CN_EQUITY.is_open(datetime(2023, 12, 2, 10))
+    assert len(list(CN_EQUITY.bars(FRIDAY, FRIDAY.replace(hour=23), "1m"))) == 240
+    assert len(list(CN_EQUITY.bars(FRIDAY, FRIDAY.replace(hour=23), "15m"))) == 16
+    
+    # Lunch break, weekend
+    assert CN_EQUITY.first_bar_at_or_after(FRIDAY.replace(hour=11, minute=45), "1m") == FRIDAY.replace(hour=13)
+    assert CN_EQUITY.first_bar_at_or_after(FRIDAY.replace(hour=15), "5m") == datetime(2023, 12, 4, 9, 30)
+    assert CN_EQUITY.last_bar_at_or_before(datetime(2023, 12, 3, 20), "1m") == FRIDAY.replace(hour=14, minute=59)
+    assert CN_EQUITY.last_bar_at_or_before(FRIDAY.replace(hour=10, minute=7), "5m") == FRIDAY.replace(hour=10, minute=5)
+    assert CN_EQUITY.last_bar_at_or_before(datetime(2023, 12, 3, 20), "1d") == FRIDAY
+    
+    assert CN_EQUITY.has_session_between(FRIDAY.replace(hour=14), datetime(2023, 12, 2, 10))
+    assert not CN_EQUITY.has_session_between(FRIDAY.replace(hour=15, minute=5), datetime(2023, 12, 4, 9, 0))
+
+def test_holidays_and_night_sessions():
+    calendar = TradingCalendar(
+        "test",
+        [(time(9, 0), time(10, 15)), (time(10, 30), time(11, 30)), (time(13, 30), time(15, 0))],
+        night_session=(time(21, 0), time(2, 30)),
+        holidays=[date(2023, 12, 4)]
+    )
+    
+    # Thursday's night session runs past midnight into Friday
+    assert calendar.is_open(FRIDAY.replace(hour=1))
+    assert not calendar.is_open(FRIDAY.replace(hour=10, minute=20))
+    # No night session before the Monday holiday, and none on it
+    assert calendar.day_intervals(FRIDAY.date())[-1][1] == FRIDAY.replace(hour=15)
+    assert calendar.day_intervals(date(2023, 12, 4)) == []
+    assert calendar.first_bar_at_or_after(FRIDAY.replace(hour=15), "1m") == datetime(2023, 12, 5, 9, 0)
+    assert calendar.first_bar_at_or_after(FRIDAY.replace(hour=15), "1d") == datetime(2023, 12, 5)
+    
+    assert calendar_for("000001") is CN_EQUITY
+    assert calendar_for("au2406").night_session == (time(21, 0), time(2, 30))
+    assert calendar_for("rb2405").night_session == (time(21, 0), time(23, 0))
+    assert calendar_for("jd2405").night_session is None
+    assert calendar_for("IF2406").sessions == CN_EQUITY.sessions
+
+def test_default_exchange_holidays():
+    # National Day 2026: closed from Thursday 1 October to Wednesday 7 October
+    assert not CN_EQUITY.is_trading_day(date(2026, 10, 1))
+    assert CN_EQUITY.first_bar_at_or_after(datetime(2026, 9, 30, 15), "1d") == datetime(2026, 10, 8)
+    # No night session on the evening before the holiday
+    assert calendar_for("rb2610").day_intervals(date(2026, 9, 30))[-1][1] == datetime(2026, 9, 30, 15)
+    assert all(day.weekday() < 5 for days in CN_EXCHANGE_HOLIDAYS.values() for day in days)
+
+def test_find_gaps_skips_closed_periods():
+    timestamps = list(CN_EQUITY.bars(FRIDAY, FRIDAY.replace(hour=23), "1m"))
+    
+    assert CN_EQUITY.find_gaps(timestamps, FRIDAY, datetime(2023, 12, 4, 23), "1m") == [
+        (datetime(2023, 12, 4, 9, 30), datetime(2023, 12, 4, 14, 59))
+    ]
+    
+    del timestamps[40]
+    assert CN_EQUITY.find_gaps(timestamps, FRIDAY, FRIDAY.replace(hour=23), "1m") == [
+        (FRIDAY.replace(hour=10, minute=10), FRIDAY.replace(hour=10, minute=10))
+    ]
+
+@pytest.mark.asyncio
+async def test_cache_gaps_endpoint(setup_test_db):
+    await data_cache_service._cache_kline_data("000001", "15m", [
+        {"time": FRIDAY.replace(hour=9, minute=30).isoformat(), "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1},
+        {"time": FRIDAY.replace(hour=14, minute=45).isoformat(), "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1}
+    ])
+    
+    client = TestClient(app)
+    response = client.get("/api/market-data/cache/gaps/000001?timeframe=15m&start_time=2023-12-01T00:00:00&end_time=2023-12-03T00:00:00")
+    assert response.status_code == 200
+    assert response.json()["calendar"] == "cn_equity"
+    assert response.json()["gaps"] == [{"start": "2023-12-01T09:45:00", "end": "2023-12-01T14:30:00"}]
+    
+    assert client.get("/api/market-data/cache/gaps/000001?timeframe=2m&start_time=2023-12-01T00:00:00&end_time=2023-12-02T00:00:00").status_code == 400
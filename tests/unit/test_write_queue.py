@@ -0,0 +1,76 @@
+import pytest
+import asyncio
+
+from backend.app.services.write_queue import WriteQueue
+
+@pytest.mark.asyncio
+async def test_items_are_written_in_batches():
+    batches = []
+    
+    async def writer(batch):
+        batches.append(batch)
+    
+    queue = WriteQueue(writer, batch_size=3, flush_interval=0.05)
+    queue.start()
+    for i in range(7):
+        queue.put({"n": i})
+    
+    await asyncio.sleep(0.2)
+    
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert queue.written == 7
+    assert queue.depth == 0
+    await queue.drain()
+
+@pytest.mark.asyncio
+async def test_drain_writes_pending_items():
+    written = []
+    
+    async def writer(batch):
+        written.extend(batch)
+    
+    queue = WriteQueue(writer, batch_size=100, flush_interval=10)
+    queue.start()
+    for i in range(5):
+        queue.put({"n": i})
+    await asyncio.sleep(0.01)
+    
+    await queue.drain()
+    
+    assert [item["n"] for item in written] == [0, 1, 2, 3, 4]
+    assert not queue.is_running
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_oldest():
+    written = []
+    
+    async def writer(batch):
+        written.extend(batch)
+    
+    queue = WriteQueue(writer, max_pending=2)
+    for i in range(3):
+        queue.put({"n": i})
+    
+    await queue.flush()
+    
+    assert queue.dropped == 1
+    assert [item["n"] for item in written] == [1, 2]
+
+@pytest.mark.asyncio
+async def test_writer_errors_do_not_stop_the_queue():
+    calls = []
+    
+    async def writer(batch):
+        calls.append(batch)
+        if len(calls) == 1:
+            raise RuntimeError("database locked")
+    
+    queue = WriteQueue(writer, batch_size=1, flush_interval=0.01)
+    queue.start()
+    queue.put({"n": 1})
+    queue.put({"n": 2})
+    await asyncio.sleep(0.1)
+    
+    assert len(calls) == 2
+    assert queue.written == 1
+    await queue.drain()